@@ -1,13 +1,42 @@
 """Extract names of accommodations/properties mentioned in a blog post using an LLM.
     Just a placeholder for demonstration, not actually implemented yet"""
 
-from typing import List, Dict
+import re
+from typing import Callable, List, Dict, Optional, Tuple
 
+from .backend import Backend
 
 
-class AccommodationExtractor:
+# Bump whenever the extraction prompt changes so cached results are invalidated
+PROMPT_VERSION = "1"
+
+
+def map_mentions(properties: List[Dict], to_original: Callable[[int, int], Optional[Tuple[int, int]]]) -> List[Dict]:
+    """
+    Translate the 'mentions' offsets of extraction results into another text's coordinates.
+
+    Args:
+        properties: Extraction results, possibly with 'mentions' offsets
+        to_original: Maps a (start, end) offset to the other text, None if it has no equivalent
+
+    Returns:
+        Copies of the results with mapped offsets, unmappable mentions are dropped
+    """
+    mapped = []
+    for prop in properties:
+        if "mentions" in prop:
+            prop = dict(prop)
+            prop["mentions"] = [list(span) for span in (to_original(start, end) for start, end in prop["mentions"])
+                                if span is not None]
+        mapped.append(prop)
+    return mapped
+
+
+class AccommodationExtractor(Backend):
     """Extracts names of accommodations/properties mentioned in a blog post"""
     
+    prompt_version = PROMPT_VERSION
+    
     def __init__(self):
         """
         Initialize the property extractor.
@@ -22,7 +51,10 @@ class AccommodationExtractor:
             text: The blog post text to analyze.
             
         Returns:
-            List of dictionaries with 'name' and 'location' keys.
+            List of dictionaries with 'name' and 'location' keys. A result may
+            also have 'mentions', a list of [start, end] character offsets of
+            the property's mentions in `text`, the link processor then links
+            those mentions without searching for the name.
         """
         # Demo implementation in the future this willcall an LLM
         # For this demo it return the properties mentioned in the sample blog post
@@ -31,6 +63,9 @@ class AccommodationExtractor:
             {"name": "Harvey's Point Hotel", "location": "Donegal, Ireland"},
             {"name": "Slieve League B&B", "location": "Donegal, Ireland"},
         ]
+        for prop in mock_properties:
+            pattern = r'\b' + re.escape(prop["name"]) + r'\b'
+            prop["mentions"] = [[m.start(), m.end()] for m in re.finditer(pattern, text, flags=re.IGNORECASE)]
     
         return mock_properties
     
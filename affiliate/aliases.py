@@ -0,0 +1,251 @@
+"""Index of normalised property-name variants, so "Harveys Point" is linked for "Harvey's Point Hotel"."""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+
+# A word, including apostrophes and ampersands inside it ("Harvey's", "B&B"),
+# underscores are part of a word as they are for \b
+TOKEN_PATTERN = re.compile(r"\w+(?:['\u2018\u2019\u02bc&]\w+)*")
+JOINERS = re.compile(r"['\u2018\u2019\u02bc&]")
+# A trailing possessive, "Hotel's" is also a mention of "Hotel"
+POSSESSIVE = re.compile(r"['\u2019\u02bc][sS]$")
+# What may separate the words of one name in the text: spaces, a single line
+# break, a hyphen, slash or ampersand, or a period with no space after it
+# ("St.John"), but not markdown emphasis or the end of a sentence
+GAP_PATTERN = re.compile(r"[^\S\n]*[-/&]?[^\S\n]*\n?[^\S\n]*|\.")
+# A period and space may only follow an abbreviation ("St. Anne's"): these, and
+# the words followed by a period in the indexed names ("Mr. Smith Hotel")
+ABBREVIATIONS = {"st", "mt", "ft", "dr"}
+ABBREVIATION_GAP = re.compile(r"\.[^\S\n]*\n?[^\S\n]*")
+# The word before a mention, checked against the leading article of the name
+ARTICLE_BEFORE = re.compile(r"(?<![\w'\u2018\u2019\u02bc&])(the|an|a)[^\S\n]+\Z", flags=re.IGNORECASE)
+
+ARTICLES = {"the", "a", "an"}
+# Generic words dropped from the start or end of a name for its variant key
+GENERIC_WORDS = {
+    "hotel", "hotels", "motel", "aparthotel", "hostel", "inn", "lodge", "guesthouse", "bb", "apartments",
+    "resort", "suites", "villa", "villas", "cottage", "cottages", "chalet", "campsite", "spa",
+}
+
+Key = Tuple[str, ...]
+# A word of the text: normalised word, start, end and the normalised word
+# without its possessive ending, None if it has none
+Word = Tuple[str, int, int, Optional[str]]
+
+
+def normalize_token(token: str) -> str:
+    """Case-fold a word and strip accents, compatibility forms, apostrophes and ampersands."""
+    if token.isascii():
+        return JOINERS.sub("", token.lower())
+    decomposed = unicodedata.normalize("NFKD", token)
+    return JOINERS.sub("", "".join(c for c in decomposed if not unicodedata.combining(c)).casefold())
+
+
+def tokenize(text: str) -> Iterator[Tuple[str, int, int]]:
+    """Yield the normalised words of a text with their start and end offsets."""
+    for match in TOKEN_PATTERN.finditer(text):
+        yield normalize_token(match.group()), match.start(), match.end()
+
+
+def normalize_key(name: str) -> Key:
+    """
+    Normalise a property name into its lookup key.
+
+    Words are normalised with normalize_token and a leading article is
+    dropped, unless only generic words would be left ("The Hotel").
+
+    Args:
+        name: Property name or alias
+
+    Returns:
+        Tuple of normalised words, empty if the name has none
+    """
+    words = [word for word, _, _ in tokenize(name)]
+    if len(words) > 1 and words[0] in ARTICLES and any(word not in GENERIC_WORDS for word in words[1:]):
+        words = words[1:]
+    return tuple(words)
+
+
+def leading_article(name: str) -> Optional[str]:
+    """Return the normalised article normalize_key drops from the start of a name, None if it drops none."""
+    words = [word for word, _, _ in tokenize(name)]
+    return words[0] if len(words) > len(normalize_key(name)) else None
+
+
+def article_start(text: str, start: int, article: Optional[str]) -> int:
+    """Return the start of a mention, moved back over the word before it if that is the name's `article`."""
+    if article is not None:
+        before = ARTICLE_BEFORE.search(text, max(0, start - 16), start)
+        if before and before.group(1).lower() == article:
+            return before.start()
+    return start
+
+
+def variant_key(key: Key) -> Optional[Key]:
+    """
+    Drop the generic words from the start and end of a key ("Central Hotel" -> "central").
+
+    Returns:
+        The shorter key, or None if nothing was dropped or fewer than two words
+        are left, since a single word such as "Central" is too common to link
+    """
+    start, end = 0, len(key)
+    while start < end and key[start] in GENERIC_WORDS:
+        start += 1
+    while end > start and key[end - 1] in GENERIC_WORDS:
+        end -= 1
+    if end - start == len(key) or end - start < 2:
+        return None
+    return key[start:end]
+
+
+def property_keys(prop: Dict[str, Any]) -> Set[Key]:
+    """All the keys of a property: its name, its 'aliases' and their variants."""
+    keys = {normalize_key(name) for name in [prop.get("name", "")] + list(prop.get("aliases") or ())}
+    keys |= {variant for variant in map(variant_key, keys) if variant}
+    keys.discard(())
+    return keys
+
+
+class AliasIndex:
+    """
+    Maps the normalised keys of property names, aliases and variants to the properties.
+
+    The name and any 'aliases' of a property are indexed as they are. Their
+    variants without generic words are indexed too, unless the variant is
+    already a key or is shared by several properties, in which case it could
+    not tell them apart. A name's leading article is not part of its key, but
+    is included in a mention that has it ("the Merrion" for "The Merrion").
+    """
+
+    def __init__(self, accommodations: List[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            accommodations: Accommodations with a 'name' and optionally 'aliases', a list of other names;
+                the first property wins for duplicate keys
+        """
+        self.keys: Dict[Key, Dict[str, Any]] = {}
+        # Leading article dropped from the name of a key
+        self.articles: Dict[Key, str] = {}
+        self.abbreviations = set(ABBREVIATIONS)
+        variants: Dict[Key, Dict[str, Any]] = {}
+        ambiguous: Set[Key] = set()
+        for prop in accommodations:
+            for name in [prop.get("name", "")] + list(prop.get("aliases") or ()):
+                key = normalize_key(name)
+                # Words the name itself follows with a period may be followed by one in the text
+                words = list(TOKEN_PATTERN.finditer(name))
+                self.abbreviations.update(normalize_token(word.group()) for word in words[:-1]
+                                          if name.startswith(".", word.end()))
+                if key:
+                    self.keys.setdefault(key, prop)
+                variant = variant_key(key)
+                article = leading_article(name)
+                if article:
+                    for articled in (key, variant):
+                        if articled:
+                            self.articles.setdefault(articled, article)
+                if variant:
+                    if variants.setdefault(variant, prop) is not prop:
+                        ambiguous.add(variant)
+        # Keys that are only a variant, a name or alias overlapping them is preferred
+        self.variants = {variant for variant in variants if variant not in ambiguous and variant not in self.keys}
+        for variant in self.variants:
+            self.keys[variant] = variants[variant]
+        self.max_words = max((len(key) for key in self.keys), default=0)
+        self.first_words = {key[0] for key in self.keys}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _match(self, text: str, window: List[Word], position: int) -> Optional[Tuple[Key, int, int]]:
+        """
+        Return the longest key made of the joined words of the window starting at `position`.
+
+        The last word of a key may be matched without its possessive ending,
+        so "Central Hotel's" is a mention of "Central Hotel".
+
+        Returns:
+            Tuple of the key, its number of words and the end offset of the mention, or None
+        """
+        first = window[position]
+        if first[0] not in self.first_words and first[3] not in self.first_words:
+            return None
+        joined = position + 1
+        while joined < len(window) and joined - position < self.max_words and \
+                self._joined(text, window[joined - 1], window[joined]):
+            joined += 1
+        for end in range(joined, position, -1):
+            words = tuple(word for word, _, _, _ in window[position:end - 1])
+            last = window[end - 1]
+            if words + (last[0],) in self.keys:
+                return words + (last[0],), end - position, last[2]
+            if last[3] is not None and words + (last[3],) in self.keys:
+                return words + (last[3],), end - position, last[2] - 2
+        return None
+
+    def _joined(self, text: str, previous: Word, word: Word) -> bool:
+        """Return True if two words of the text may be part of one name."""
+        if GAP_PATTERN.fullmatch(text, previous[2], word[1]):
+            return True
+        return previous[0] in self.abbreviations and \
+            ABBREVIATION_GAP.fullmatch(text, previous[2], word[1]) is not None
+
+    def _is_name(self, match: Optional[Tuple[Key, int, int]]) -> bool:
+        return match is not None and match[0] not in self.variants
+
+    def scan(self, text: str) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Find the mentions of the indexed names in one left-to-right pass over the words of a text.
+
+        At each word, the longest run of up to max_words joined words that is a
+        key is the match, and the scan resumes after it. A variant is skipped if
+        a name or alias starts inside it. Each lookup is a dict access, so the
+        scan is linear in the text however many names and aliases are indexed.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Iterator of (start, end, property) for each match, in document order
+        """
+        if not self.keys:
+            return
+        # Words that may start a match and those after them, with room for a
+        # match and the keys starting inside it
+        window: List[Word] = []
+        size = 2 * self.max_words
+        normalized: Dict[str, Tuple[str, Optional[str]]] = {}
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            forms = normalized.get(token)
+            if forms is None:
+                bare = normalize_token(token[:-2]) if POSSESSIVE.search(token) else None
+                forms = normalized[token] = (normalize_token(token), bare)
+            word, bare = forms
+            if window or word in self.first_words or bare in self.first_words:
+                window.append((word, match.start(), match.end(), bare))
+                if len(window) == size:
+                    yield from self._advance(text, window, size)
+        yield from self._advance(text, window, 0)
+
+    def _advance(self, text: str, window: List[Word], size: int):
+        """Consume matches and unmatched words from the front of the window until it is shorter than `size`."""
+        while window and len(window) >= size:
+            match = self._match(text, window, 0)
+            if match is not None and match[0] in self.variants and \
+                    any(self._is_name(self._match(text, window, position)) for position in range(1, match[1])):
+                match = None
+            if match is None:
+                del window[0]
+            else:
+                key, length, end = match
+                yield article_start(text, window[0][1], self.articles.get(key)), end, self.keys[key]
+                del window[:length]
+            # Words that cannot start a match are not kept at the front
+            while window and window[0][0] not in self.first_words and window[0][3] not in self.first_words:
+                del window[0]
@@ -0,0 +1,77 @@
+"""The interface of extractor backends, with sync, async and batch entry points."""
+
+from typing import Any, Dict, List, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class ExtractorBackend(Protocol):
+    """
+    What the tool expects of an extractor backend.
+
+    Results are lists of dictionaries with 'name' and 'location' keys and
+    optionally 'mentions' offsets, see AccommodationExtractor. prompt_version
+    is part of the extraction cache key.
+    """
+
+    prompt_version: str
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        ...
+
+    def extract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        ...
+
+    async def aextract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        ...
+
+    async def aextract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        ...
+
+
+class Backend:
+    """
+    Base class of extractor backends, deriving the batch and async methods from extract_accommodations.
+
+    The async defaults run extract_accommodations in a thread, several at a time
+    for a batch. Backends that are not thread-safe or can do better, e.g. by
+    batching on the model or awaiting a socket, override them.
+    """
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def extract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Extract several texts, returning one result list per text in input order."""
+        return [self.extract_accommodations(text) for text in texts]
+
+    async def aextract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        """Extract a text without blocking the event loop."""
+        # asyncio is imported on first use, it would double the startup time of a mock CLI run
+        import asyncio
+        return await asyncio.to_thread(self.extract_accommodations, text)
+
+    async def aextract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Extract several texts concurrently, returning one result list per text in input order."""
+        import asyncio
+        return list(await asyncio.gather(*(self.aextract_accommodations(text) for text in texts)))
+
+
+def extract_batch(extractor: Any, texts: List[str]) -> List[List[Dict[str, Any]]]:
+    """
+    Extract several texts with any extractor, using its extract_batch method if it has one.
+
+    Args:
+        extractor: Backend, or a wrapper with only extract_accommodations
+        texts: Texts to analyze
+
+    Returns:
+        One result list per text, in input order
+    """
+    if hasattr(extractor, "extract_batch"):
+        return extractor.extract_batch(texts)
+    return [extractor.extract_accommodations(text) for text in texts]
+
+
+def is_async(extractor: Any) -> bool:
+    """Return True if the extractor can be awaited directly rather than run in a thread."""
+    return hasattr(extractor, "aextract_accommodations")
@@ -0,0 +1,395 @@
+"""Batch processing of a whole site of blog posts across a process pool."""
+
+import glob
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import Config
+from .link import LinkProcessor
+from .metrics import Metrics, MetricsWriter, NULL_METRICS, extractor_counters
+
+
+MARKDOWN_SUFFIXES = {".md", ".markdown"}
+
+# Per-process state, built once by _init_worker and reused for every post
+_worker: Dict[str, Any] = {}
+
+
+def iter_posts(source: Optional[str] = None, manifest: Optional[str] = None,
+               output_suffix: str = "_linked") -> Iterator[Path]:
+    """
+    Yield the blog post paths to process.
+
+    Args:
+        source: A markdown file, a directory (searched recursively) or a glob pattern
+        manifest: Path to a text file listing one blog post path per line
+        output_suffix: Suffix of generated files, these are skipped
+
+    Returns:
+        Iterator of blog post paths
+    """
+    if manifest:
+        base = Path(manifest).parent
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    path = Path(line)
+                    yield path if path.is_absolute() else base / path
+    if not source:
+        return
+
+    path = Path(source)
+    if path.is_dir():
+        candidates: Iterable[Path] = sorted(path.rglob("*"))
+    elif glob.has_magic(source):
+        candidates = (Path(p) for p in sorted(glob.iglob(source, recursive=True)))
+    else:
+        yield path
+        return
+
+    for candidate in candidates:
+        if (candidate.suffix.lower() in MARKDOWN_SUFFIXES and candidate.is_file()
+                and not candidate.stem.endswith(output_suffix)):
+            yield candidate
+
+
+def is_batch_source(source: Optional[str]) -> bool:
+    """Return True if the source names more than a single blog post."""
+    return bool(source) and (Path(source).is_dir() or glob.has_magic(source))
+
+
+def build_config(config_file: Optional[str] = None, overrides: Optional[Dict[str, Any]] = None) -> Config:
+    """
+    Load configuration and apply command-line overrides.
+
+    Args:
+        config_file: Path to YAML config file
+        overrides: Mapping of dot notation keys to values, None values are ignored
+
+    Returns:
+        Configuration
+    """
+    config = Config(config_file)
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            config.set(key, value)
+    return config
+
+
+def build_extractor(config: Config):
+    """
+    Build the extractor backend selected by 'llm.type', wrapped in the extraction cache unless disabled.
+    With 'llm.prefilter' only candidate paragraphs are sent to the backend and with
+    'cache.incremental' results are cached per paragraph instead of per post,
+    or per window of kept paragraphs when both are set.
+    The cache key includes the backend and its model, for the daemon backend
+    the model the server reports it runs.
+
+    Args:
+        config: Configuration
+
+    Returns:
+        Object with an extract_accommodations(text) method
+
+    Raises:
+        ConnectionError: If the cache is enabled and the extraction server cannot be reached
+    """
+    from .llm import create_extractor
+    backend = extractor = create_extractor(config)
+    candidate_filter = None
+    if config.get("llm.prefilter", False):
+        from .prefilter import CandidateFilter, PrefilteredExtractor
+        candidate_filter = CandidateFilter(context=config.get("llm.prefilter_context", 0))
+        extractor = PrefilteredExtractor(extractor, candidate_filter)
+    if not config.get("cache.enabled", True):
+        return extractor
+
+    from .cache import CachedExtractor, ExtractionCache
+    cache = ExtractionCache(
+        config.get("cache.path"),
+        max_size_mb=config.get("cache.max_size_mb", 100),
+        max_age_days=config.get("cache.max_age_days", 30),
+    )
+    # The backend is part of the key, a daemon or cascade run never reuses the mock's results
+    model = f"{config.get('llm.type', 'mock')}/{config.get('llm.model', 'mock')}"
+    # Quantized models give slightly different results, keep their cache entries apart
+    if config.get("llm.precision", "fp32") != "fp32":
+        model = f"{model}:{config.get('llm.precision')}"
+    # A server knows its own model and precision better than the local config,
+    # also when it is the cascade's fallback
+    server = backend if hasattr(backend, "server_model") else getattr(backend, "extractor", None)
+    if hasattr(server, "server_model"):
+        model = f"{config.get('llm.type')}/{server.server_model()}"
+    refresh = config.get("cache.refresh", False)
+    if config.get("cache.incremental", False):
+        from .incremental import IncrementalExtractor
+        # Filter the whole post before it is split into blocks, a paragraph filtered
+        # on its own would lose its heading and the context around it
+        return IncrementalExtractor(backend, cache, model=model, refresh=refresh, candidate_filter=candidate_filter)
+    return CachedExtractor(extractor, cache, model=model, refresh=refresh)
+
+
+def output_path_for(blog_path: Path, config: Config, output_dir: Optional[str] = None) -> Path:
+    """Determine the output file path for a blog post."""
+    directory = Path(output_dir) if output_dir else blog_path.parent
+    suffix = config.get("output.suffix", "_linked")
+    return directory / f"{blog_path.stem}{suffix}.md"
+
+
+def write_atomic(path: Path, content: str) -> None:
+    """
+    Write a file so readers only ever see the old or the complete new content.
+
+    The content is written to a temporary file in the same directory, which then
+    replaces the target in one rename.
+
+    Args:
+        path: File to write
+        content: Text to write
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per process and thread, the name is neither markdown nor a post to watchers
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def process_post(blog_path: Path, config: Config, extractor: Any, processor: LinkProcessor,
+                 output_dir: Optional[str] = None, metrics=NULL_METRICS,
+                 manifest_entry: Optional[Dict[str, Any]] = None) -> Tuple[Path, int]:
+    """
+    Read a blog post, extract properties, add affiliate links and write the output.
+
+    Args:
+        blog_path: Path to the markdown blog post
+        config: Configuration
+        extractor: Any object with an extract_accommodations(text) method
+        processor: Link processor
+        output_dir: Output directory (default: same as input)
+        metrics: Metrics collector, timing each stage (default: disabled)
+        manifest_entry: If a dictionary is given, it is filled with the post's site manifest entry
+
+    Returns:
+        Tuple of output path and number of properties found
+    """
+    with metrics.stage("read"):
+        with open(blog_path, 'r', encoding='utf-8') as f:
+            blog_content = f.read()
+            bytes_read = os.fstat(f.fileno()).st_size
+
+    before = extractor_counters(extractor) if metrics.enabled else {}
+    with metrics.stage("extract"):
+        properties = extractor.extract_accommodations(blog_content)
+    if metrics.enabled:
+        metrics.add_deltas(before, extractor_counters(extractor))
+
+    with metrics.stage("link"):
+        processed_content, links = processor.link_markdown(blog_content, properties) if properties else (blog_content, [])
+
+    with metrics.stage("write"):
+        output_path = output_path_for(blog_path, config, output_dir)
+        write_atomic(output_path, processed_content)
+
+    if metrics.enabled:
+        metrics.add("bytes_read", bytes_read)
+        metrics.add("bytes_written", len(processed_content.encode('utf-8')))
+        metrics.add("properties", len(properties))
+        metrics.add("links_inserted", len(links))
+    if manifest_entry is not None:
+        from .manifest import make_entry
+        manifest_entry.update(make_entry(blog_path, blog_content, output_path, properties, links))
+    return output_path, len(properties)
+
+
+def _init_worker(config_file: Optional[str], overrides: Optional[Dict[str, Any]]) -> None:
+    """
+    Build the configuration, extractor and link processor once per worker.
+
+    A failure is kept and reported with every post, raising here would break the pool.
+    """
+    _worker.pop("setup_error", None)
+    try:
+        config = build_config(config_file, overrides)
+        _worker["config"] = config
+        _worker["extractor"] = build_extractor(config)
+        _worker["processor"] = LinkProcessor(config.get("affiliate.id", "12345"))
+    except Exception as e:
+        _worker["setup_error"] = f"{type(e).__name__}: {e}"
+
+
+def _process_in_worker(blog_path: Path, output_dir: Optional[str], collect_metrics: bool = False,
+                       record_manifest: bool = False) -> Dict[str, Any]:
+    """Process one post with the worker's shared state, reporting errors instead of raising."""
+    metrics = Metrics() if collect_metrics else NULL_METRICS
+    result: Dict[str, Any] = {"path": blog_path, "error": None, "properties": 0, "cache_hit": None,
+                              "manifest": {} if record_manifest else None}
+    if "setup_error" in _worker:
+        result["setup_error"] = result["error"] = _worker["setup_error"]
+        result["metrics"] = metrics.to_dict()
+        return result
+    extractor = _worker["extractor"]
+    try:
+        _, result["properties"] = process_post(blog_path, _worker["config"], extractor,
+                                               _worker["processor"], output_dir, metrics, result["manifest"])
+        result["cache_hit"] = getattr(extractor, "last_hit", None)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["metrics"] = metrics.to_dict()
+    return result
+
+
+class BatchSummary:
+    """Outcome of a batch run."""
+
+    def __init__(self):
+        self.succeeded = 0
+        self.properties = 0
+        self.failures: List[Tuple[Path, str]] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.elapsed = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.succeeded + len(self.failures)
+
+    @property
+    def throughput(self) -> float:
+        """Posts processed per second."""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """Add the result of one post, as returned by _process_in_worker."""
+        if result["cache_hit"] is not None:
+            if result["cache_hit"]:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        if result["error"]:
+            self.failures.append((result["path"], result["error"]))
+        else:
+            self.succeeded += 1
+            self.properties += result["properties"]
+
+    def format(self) -> str:
+        lines = [
+            f"Processed {self.total} posts in {self.elapsed:.2f}s ({self.throughput:.1f} posts/s)",
+            f"  Succeeded: {self.succeeded} ({self.properties} properties found)",
+        ]
+        if self.cache_hits or self.cache_misses:
+            lines.append(f"  Cache: {self.cache_hits} hits, {self.cache_misses} misses")
+        if self.changed:
+            lines.append(f"  Edited since the manifest was written, linked again: {self.changed}")
+        if self.unchanged:
+            lines.append(f"  Saved without changes, skipped: {self.unchanged}")
+        lines.append(f"  Failed: {len(self.failures)}")
+        lines.extend(f"    - {path}: {error}" for path, error in self.failures)
+        return "\n".join(lines)
+
+
+def run_batch(paths: Iterable[Path], config_file: Optional[str] = None,
+              overrides: Optional[Dict[str, Any]] = None, workers: Optional[int] = None,
+              output_dir: Optional[str] = None, metrics_writer: Optional[MetricsWriter] = None,
+              manifest=None) -> BatchSummary:
+    """
+    Process many blog posts, spreading them across a process pool.
+
+    Args:
+        paths: Blog post paths
+        config_file: Path to YAML config file, loaded once per worker
+        overrides: Configuration overrides, see build_config
+        workers: Number of worker processes (default: CPU count), 1 runs in-process
+        output_dir: Output directory (default: same as each input)
+        metrics_writer: If given, per-post stage timings and counters are collected and written to it
+        manifest: If given, a SiteManifest the entry of every successful post is recorded in
+
+    Returns:
+        Summary of successes, failures and throughput
+
+    Raises:
+        ValueError: If the configuration or backend is invalid
+        RuntimeError: If the workers could not build their extractor
+    """
+    from .llm import check_backend
+    # Fail before starting the workers rather than in each of them
+    check_backend(build_config(config_file, overrides))
+    summary = BatchSummary()
+    workers = workers or os.cpu_count() or 1
+    collect_metrics = metrics_writer is not None
+    record_manifest = manifest is not None
+    start = time.perf_counter()
+
+    def record(result: Dict[str, Any]) -> None:
+        if "setup_error" in result:
+            raise RuntimeError(f"Could not set up the extractor: {result['setup_error']}")
+        summary.record(result)
+        if result["error"]:
+            return
+        if collect_metrics:
+            metrics_writer.write_post(result["path"], result["metrics"])
+        if record_manifest:
+            manifest.record(result["manifest"])
+
+    if workers == 1:
+        _init_worker(config_file, overrides)
+        for blog_path in paths:
+            record(_process_in_worker(blog_path, output_dir, collect_metrics, record_manifest))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(config_file, overrides)) as executor:
+            paths = list(paths)
+            chunksize = max(1, len(paths) // (workers * 4))
+            results = executor.map(_process_in_worker, paths, [output_dir] * len(paths),
+                                   [collect_metrics] * len(paths), [record_manifest] * len(paths),
+                                   chunksize=chunksize)
+            for result in results:
+                record(result)
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def run_relink(manifest, config: Config, output_dir: Optional[str] = None) -> BatchSummary:
+    """
+    Rebuild the linked output of every post in a site manifest with the current affiliate settings.
+
+    No extraction is done, the stored properties and link offsets are reused.
+
+    Args:
+        manifest: SiteManifest to re-link, entries of edited posts are updated in place
+        config: Configuration, 'affiliate.id' and 'output.suffix' are used
+        output_dir: Output directory (default: the output path recorded for each post)
+
+    Returns:
+        Summary of successes, failures and throughput
+    """
+    from .manifest import relink_post
+
+    summary = BatchSummary()
+    processor = LinkProcessor(config.get("affiliate.id", "12345"))
+    start = time.perf_counter()
+    for entry in list(manifest.posts.values()):
+        source = manifest.resolve(entry["source"])
+        result: Dict[str, Any] = {"path": source, "error": None, "properties": len(entry["properties"]),
+                                  "cache_hit": None}
+        output_path = output_path_for(source, config, output_dir) if output_dir else None
+        try:
+            if not relink_post(manifest, entry, processor, output_path):
+                summary.changed += 1
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        summary.record(result)
+    summary.elapsed = time.perf_counter() - start
+    return summary
@@ -0,0 +1,155 @@
+"""Content-addressed disk cache for accommodation extraction results."""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "ai-blogging-assistant" / "extractions.sqlite"
+
+
+class ExtractionCache:
+    """SQLite backed cache of extraction results with size and age based eviction."""
+
+    def __init__(self, path: str = None, max_size_mb: float = 100, max_age_days: float = 30):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Path to the SQLite database file
+            max_size_mb: Evict least recently used entries when the cache grows past this size
+            max_age_days: Evict entries older than this
+        """
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Several batch workers may share the cache file, so wait on locks rather than fail
+        self.connection = sqlite3.connect(str(self.path), timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions (accessed)")
+        self.connection.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(text: str, model: str, prompt_version: str) -> str:
+        """
+        Build the cache key from the post text, the model name and the prompt template version.
+
+        Args:
+            text: The blog post text
+            model: LLM model name (e.g., config 'llm.model')
+            prompt_version: Version of the prompt template used for extraction
+
+        Returns:
+            Hex digest identifying the extraction
+        """
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{text_hash}\0{model}\0{prompt_version}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """Return the cached extraction for a key, or None on a miss."""
+        row = self.connection.execute("SELECT value FROM extractions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: List[Dict[str, str]]) -> None:
+        """Store an extraction result."""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extractions (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, payload, len(payload.encode("utf-8")), now, now),
+        )
+        self.connection.commit()
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used entries until under the size limit.
+
+        Returns:
+            Number of entries removed
+        """
+        removed = self.connection.execute(
+            "DELETE FROM extractions WHERE created < ?", (time.time() - self.max_age,)
+        ).rowcount
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            stale = []
+            for key, size in self.connection.execute("SELECT key, size FROM extractions ORDER BY accessed"):
+                if excess <= 0:
+                    break
+                stale.append((key,))
+                excess -= size
+            self.connection.executemany("DELETE FROM extractions WHERE key = ?", stale)
+            removed += len(stale)
+        self.connection.commit()
+        return removed
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CachedExtractor:
+    """Wraps an extractor so results are looked up in an ExtractionCache first."""
+
+    def __init__(self, extractor, cache: ExtractionCache, model: str = "mock", refresh: bool = False):
+        """
+        Initialize the cached extractor.
+
+        Args:
+            extractor: Any object with an extract_accommodations(text) method
+            cache: Extraction cache
+            model: LLM model name, part of the cache key
+            refresh: Ignore existing entries and overwrite them with fresh results
+        """
+        self.extractor = extractor
+        self.cache = cache
+        self.model = model
+        self.refresh = refresh
+        self.prompt_version = getattr(extractor, "prompt_version", "1")
+        self.last_hit = False
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, str]]:
+        """
+        Extract accommodation properties from text, using the cache when possible.
+
+        Args:
+            text: The blog post text to analyze.
+
+        Returns:
+            List of dictionaries with 'name' and 'location' keys.
+        """
+        key = self.cache.make_key(text, self.model, self.prompt_version)
+        cached = None if self.refresh else self.cache.get(key)
+        if self.refresh:
+            self.cache.misses += 1
+        self.last_hit = cached is not None
+        if cached is not None:
+            return cached
+
+        properties = self.extractor.extract_accommodations(text)
+        self.cache.put(key, properties)
+        return properties
@@ -0,0 +1,209 @@
+"""Two-tier extraction: a small token-classification model first, the generative LLM only for ambiguous sentences.
+
+Usage:
+  python -m affiliate.cascade --labels tests/fixtures/labelled_paragraphs.json
+  python -m affiliate.cascade --labels tests/fixtures/labelled_paragraphs.json --tagger-model dslim/bert-base-NER --config affiliate/config
+"""
+
+import argparse
+import json
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+from .accommodation_extractor import PROMPT_VERSION, map_mentions
+from .incremental import merge_properties
+from .markdown import paragraph_spans
+from .prefilter import FilterResult, KEYWORD_PATTERN, is_candidate
+
+
+DEFAULT_TAGGER_MODEL = "dslim/bert-base-NER"
+DEFAULT_THRESHOLD = 0.9
+
+# Labels of a model fine-tuned for accommodation, accepted on score alone
+ACCOMMODATION_LABELS = {"ACCOMMODATION", "HOTEL", "LODGING"}
+# Generic NER labels, accepted only if the entity contains an accommodation word
+ENTITY_LABELS = {"ORG", "FAC", "LOC", "MISC"}
+LOCATION_LABELS = {"LOC", "GPE"}
+# Taggers often include a sentence-initial article in the entity
+LEADING_ARTICLE = re.compile(r"(?:the|a|an)\s+", flags=re.IGNORECASE)
+
+# A sentence ends at . ! or ? followed by whitespace, sentences never cross a blank line
+SENTENCE_PATTERN = re.compile(r"\S[\s\S]*?(?:[.!?](?=\s)|$)")
+
+# Returns one list of entities per input text, as the transformers token-classification pipeline
+# does with aggregation: {"entity_group", "score", "word", "start", "end"}
+Tagger = Callable[[List[str]], List[List[Dict[str, Any]]]]
+
+
+def load_tagger(model_name: str = DEFAULT_TAGGER_MODEL, device: int = -1, batch_size: int = 16) -> Tagger:
+    """
+    Load a transformers token-classification pipeline as a tagger.
+
+    Args:
+        model_name: Hugging Face model name of a token-classification (NER) model
+        device: -1 for CPU, or a GPU id
+        batch_size: Sentences tagged per forward pass
+
+    Returns:
+        Tagger taking a list of sentences
+    """
+    from transformers import pipeline
+    tagger = pipeline("token-classification", model=model_name, aggregation_strategy="simple", device=device)
+    return lambda sentences: tagger(sentences, batch_size=batch_size)
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    Split text into sentences.
+
+    Returns:
+        (start, end) character offsets of each sentence
+    """
+    return [(start + match.start(), start + match.end())
+            for start, end in paragraph_spans(text)
+            for match in SENTENCE_PATTERN.finditer(text[start:end])]
+
+
+def _label(entity: Dict[str, Any]) -> str:
+    label = entity.get("entity_group") or entity.get("entity", "")
+    return re.sub(r"^[BI]-", "", label).upper()
+
+
+class CascadeExtractor:
+    """Accepts high-confidence tagger entities directly and sends only ambiguous sentences to the LLM."""
+
+    def __init__(self, tagger: Tagger, extractor, threshold: float = DEFAULT_THRESHOLD, tagger_name: str = "tagger"):
+        """
+        Initialize the cascade.
+
+        Args:
+            tagger: Token-classification tagger, see load_tagger
+            extractor: Generative extractor for the ambiguous sentences, any object with
+                an extract_accommodations(text) method
+            threshold: Minimum entity score accepted without the LLM
+            tagger_name: Tagger model name, part of the cache key
+        """
+        self.tagger = tagger
+        self.extractor = extractor
+        self.threshold = threshold
+        # Results depend on the tagger and threshold as well as the LLM prompt
+        inner_version = getattr(extractor, "prompt_version", PROMPT_VERSION)
+        self.prompt_version = f"{inner_version}+{tagger_name}@{threshold}"
+        self.tagger_sentences = 0
+        self.llm_sentences = 0
+        self.skipped_sentences = 0
+
+    def tier_fractions(self) -> Dict[str, float]:
+        """Share of the sentences seen so far handled by the tagger, sent to the LLM, or skipped."""
+        total = self.tagger_sentences + self.llm_sentences + self.skipped_sentences
+        if not total:
+            return {"tagger": 0.0, "llm": 0.0, "skipped": 0.0}
+        return {"tagger": self.tagger_sentences / total, "llm": self.llm_sentences / total,
+                "skipped": self.skipped_sentences / total}
+
+    def _accept(self, entity: Dict[str, Any], sentence: str) -> bool:
+        if entity.get("score", 0.0) < self.threshold:
+            return False
+        label = _label(entity)
+        if label in ACCOMMODATION_LABELS:
+            return True
+        return label in ENTITY_LABELS and bool(KEYWORD_PATTERN.search(sentence[entity["start"]:entity["end"]]))
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Extract accommodation properties from text, using the LLM only where the tagger is unsure.
+
+        Args:
+            text: The blog post text to analyze.
+
+        Returns:
+            List of dictionaries with 'name', 'location' and 'mentions' keys.
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            return []
+        entities = self.tagger([text[start:end] for start, end in sentences])
+
+        results = []
+        ambiguous = []
+        for (start, end), sentence_entities in zip(sentences, entities):
+            sentence = text[start:end]
+            accepted = [e for e in sentence_entities if self._accept(e, sentence)]
+            locations = [sentence[e["start"]:e["end"]] for e in sentence_entities
+                         if _label(e) in LOCATION_LABELS and e not in accepted and e.get("score", 0.0) >= self.threshold]
+            for entity in accepted:
+                name_start, name_end = entity["start"], entity["end"]
+                article = LEADING_ARTICLE.match(sentence, name_start, name_end)
+                if article:
+                    name_start = article.end()
+                results.append([{
+                    "name": sentence[name_start:name_end],
+                    "location": ", ".join(locations),
+                    "mentions": [[start + name_start, start + name_end]],
+                }])
+
+            # Anything that still looks like a stay once the accepted names are masked goes to the LLM
+            masked = sentence
+            for entity in accepted:
+                masked = masked[:entity["start"]] + " " * (entity["end"] - entity["start"]) + masked[entity["end"]:]
+            if is_candidate(masked):
+                ambiguous.append((start, end))
+            elif accepted:
+                self.tagger_sentences += 1
+            else:
+                self.skipped_sentences += 1
+
+        self.llm_sentences += len(ambiguous)
+        if ambiguous:
+            kept = FilterResult("\n\n".join(text[start:end] for start, end in ambiguous), ambiguous, 0, 0)
+            results.append(map_mentions(self.extractor.extract_accommodations(kept.text), kept.to_original))
+        return merge_properties(results)
+
+
+def evaluate_extractor(extractor, labelled: List[Dict]) -> Dict[str, float]:
+    """
+    Measure an extractor against labelled paragraphs.
+
+    Args:
+        extractor: Any object with an extract_accommodations(text) method
+        labelled: List of {"text": paragraph, "properties": [names mentioned]} entries
+
+    Returns:
+        Dictionary with 'precision' and 'recall' of the extracted names (case-insensitive)
+    """
+    true_positives = predicted = expected = 0
+    for entry in labelled:
+        found = {p["name"].strip().lower() for p in extractor.extract_accommodations(entry["text"])}
+        labels = {name.lower() for name in entry.get("properties", [])}
+        true_positives += len(found & labels)
+        predicted += len(found)
+        expected += len(labels)
+    return {
+        "precision": true_positives / predicted if predicted else 1.0,
+        "recall": true_positives / expected if expected else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the tagger/LLM cascade against labelled paragraphs.")
+    parser.add_argument("--labels", required=True, help="JSON file of labelled paragraphs")
+    parser.add_argument("--tagger-model", default=DEFAULT_TAGGER_MODEL, help="Token-classification model")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum accepted entity score")
+    parser.add_argument("--config", help="Config file, llm.fallback_type selects the LLM for ambiguous sentences")
+    args = parser.parse_args()
+
+    from .config import Config
+    from .llm import create_extractor
+    config = Config(args.config)
+    cascade = CascadeExtractor(load_tagger(args.tagger_model), create_extractor(config, config.get("llm.fallback_type")),
+                               args.threshold, args.tagger_model)
+    with open(args.labels, 'r', encoding='utf-8') as f:
+        scores = evaluate_extractor(cascade, json.load(f))
+    fractions = cascade.tier_fractions()
+    print(f"Precision: {scores['precision']:.1%}, recall: {scores['recall']:.1%}")
+    print(f"Sentences handled by the tagger: {fractions['tagger']:.1%}, sent to the LLM: {fractions['llm']:.1%}, "
+          f"skipped: {fractions['skipped']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
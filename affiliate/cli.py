@@ -4,9 +4,8 @@ import argparse
 import sys
 from pathlib import Path
 
-from .config import Config
-from .accommodation_extractor import AccommodationExtractor
-from .link import LinkProcessor
+# Processing modules are imported after argument parsing so `--help` and
+# argument errors return without loading them, see tests for the startup budget.
 
 
 def main():
@@ -19,12 +18,46 @@ Examples:
   python -m src.cli examples/donegal_blog.md
   python -m src.cli examples/donegal_blog.md --config config/default_config.yaml
   python -m src.cli examples/donegal_blog.md --affiliate-id 54321
+  python -m src.cli examples/ --workers 4
+  python -m src.cli "posts/**/*.md" --output-dir linked/
+  python -m src.cli --manifest posts.txt
+  python -m src.cli posts/ --pipeline --extract-concurrency 8
+  python -m src.cli examples/ --site-manifest site.json
+  python -m src.cli --relink --site-manifest site.json --affiliate-id 54321
+  python -m src.cli content/ --watch
         """
     )
     
     parser.add_argument(
         "blog_post",
-        help="Path to the markdown blog post file"
+        nargs="?",
+        help="Path to the markdown blog post file, a directory of posts or a glob pattern"
+    )
+    
+    parser.add_argument(
+        "--manifest",
+        help="Path to a text file listing one blog post per line (batch mode)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of worker processes in batch mode (default: CPU count)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="In batch mode, overlap reading, extraction, linking and writing in one asyncio pipeline"
+    )
+    
+    parser.add_argument(
+        "--extract-concurrency",
+        type=int,
+        help="Posts extracted at the same time in pipeline mode (default: 4)",
+        default=None
     )
     
     parser.add_argument(
@@ -51,36 +84,158 @@ Examples:
         default=None
     )
     
+    parser.add_argument(
+        "--llm-type",
+        help="Extractor backend: mock, daemon, cascade or simulated (default: mock)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--llm-server",
+        help="Extraction server address for the daemon backend, host:port or unix:/path",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--llm-precision",
+        choices=["fp32", "bf16", "int8"],
+        help="Weight precision of the extraction model, part of the cache key (default: fp32)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Only send paragraphs that may mention accommodation to the LLM"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the extraction cache"
+    )
+    
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Ignore cached extractions and overwrite them with fresh results"
+    )
+    
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Extract per paragraph, only sending new or edited paragraphs to the LLM"
+    )
+    
+    parser.add_argument(
+        "--site-manifest",
+        help="Site manifest JSON file recording each post's properties and link offsets",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--relink",
+        action="store_true",
+        help="Rebuild every output in the site manifest with the current affiliate settings, without the LLM"
+    )
+    
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-link posts in the directory whenever they are saved"
+    )
+    
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="In watch mode, poll the directory instead of using inotify"
+    )
+    
+    parser.add_argument(
+        "--metrics",
+        help="Write per-stage timings and counters to this file (JSON lines, or Prometheus textfile for .prom)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--metrics-format",
+        choices=["jsonl", "prometheus"],
+        help="Metrics file format (default: from the --metrics file extension)",
+        default=None
+    )
+    
     args = parser.parse_args()
     
+    if not args.blog_post and not args.manifest and not args.relink:
+        parser.error("provide a blog post, directory or glob, or --manifest")
+    
+    from .batch import build_config, build_extractor, is_batch_source, output_path_for, write_atomic
+    from .link import LinkProcessor
+    from .metrics import Metrics, NULL_METRICS, extractor_counters
+    
+    overrides = {
+        "affiliate.id": args.affiliate_id,
+        "llm.model": args.llm_model,
+        "llm.type": args.llm_type,
+        "llm.server": args.llm_server,
+        "llm.precision": args.llm_precision,
+        "llm.prefilter": True if args.prefilter else None,
+        "cache.enabled": False if args.no_cache else None,
+        "cache.refresh": True if args.refresh_cache else None,
+        "cache.incremental": True if args.incremental else None,
+        "output.manifest": args.site_manifest,
+        "watch.polling": True if args.poll else None,
+        "pipeline.extract_concurrency": args.extract_concurrency,
+    }
+    
+    if args.watch:
+        run_watch_mode(args, overrides)
+        return
+    
+    if args.relink:
+        run_relink_mode(args, overrides)
+        return
+    
+    if args.manifest or is_batch_source(args.blog_post):
+        run_batch_mode(args, overrides)
+        return
+    
     # Validate input file
     blog_path = Path(args.blog_post)
     if not blog_path.exists():
         print(f"Error: Blog post file not found: {args.blog_post}", file=sys.stderr)
         sys.exit(1)
     
+    metrics = Metrics() if args.metrics else NULL_METRICS
+    
     try:
-        # Load configuration
-        config = Config(args.config)
-        
-        # Override with command-line arguments
-        if args.affiliate_id:
-            config.config["affiliate"]["id"] = args.affiliate_id
-        if args.llm_model:
-            config.config["llm"]["model"] = args.llm_model
+        # Load configuration, overridden with command-line arguments
+        config = build_config(args.config, overrides)
         
         # Read blog post
-        with open(blog_path, 'r', encoding='utf-8') as f:
-            blog_content = f.read()
+        with metrics.stage("read"):
+            with open(blog_path, 'r', encoding='utf-8') as f:
+                blog_content = f.read()
+        metrics.add("bytes_read", blog_path.stat().st_size)
         
         print(f"Reading in: {blog_path}")
         
         # Extract properties using LLM
-        extractor = AccommodationExtractor()
-        properties = extractor.extract_accommodations(blog_content)
+        extractor = build_extractor(config)
+        before = extractor_counters(extractor) if metrics.enabled else {}
+        with metrics.stage("extract"):
+            properties = extractor.extract_accommodations(blog_content)
+        if metrics.enabled:
+            metrics.add_deltas(before, extractor_counters(extractor))
+            metrics.add("properties", len(properties))
+        if getattr(extractor, "last_hit", False):
+            print("Loaded extracted properties from cache.")
+        report_prefilter(extractor)
+        report_cascade(extractor)
         
         if not properties:
             print("No accommodation properties found in the blog post.")
+            write_metrics(args, blog_path, metrics)
             sys.exit(0)
         
         print(f"Found {len(properties)} properties mentioned in the blog post.")
@@ -91,18 +246,26 @@ Examples:
         # Process markdown and add links
         processor = LinkProcessor(config.get("affiliate.id", "12345"))
         print("Got affiliate id")
-        processed_content = processor.process_markdown(blog_content, properties)
+        with metrics.stage("link"):
+            processed_content, links = processor.link_markdown(blog_content, properties)
+        metrics.add("links_inserted", len(links))
         print("Processed markdown content with affiliate links. ")
         
         # Determine output file path
-        output_dir = Path(args.output_dir) if args.output_dir else blog_path.parent
-        suffix = config.get("output.suffix", "_linked")
-        output_filename = f"{blog_path.stem}{suffix}.md"
-        output_path = output_dir / output_filename
+        output_path = output_path_for(blog_path, config, args.output_dir)
         
         # Write processed content
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(processed_content)
+        with metrics.stage("write"):
+            write_atomic(output_path, processed_content)
+        if metrics.enabled:
+            metrics.add("bytes_written", len(processed_content.encode('utf-8')))
+        write_metrics(args, blog_path, metrics)
+        
+        if config.get("output.manifest"):
+            from .manifest import SiteManifest, make_entry
+            manifest = SiteManifest(config.get("output.manifest"))
+            manifest.record(make_entry(blog_path, blog_content, output_path, properties, links))
+            manifest.save()
         
         print(f"Successfully processed blog post")
         print(f"Output saved to: {output_path}")
@@ -112,5 +275,157 @@ Examples:
         sys.exit(1)
 
 
+def write_metrics(args, blog_path, metrics):
+    """Write the metrics of a single post run if --metrics was given."""
+    if not args.metrics:
+        return
+    from .metrics import MetricsWriter
+    writer = MetricsWriter(args.metrics, args.metrics_format)
+    writer.write_post(blog_path, metrics.to_dict())
+    writer.close()
+
+
+def report_prefilter(extractor):
+    """Print how many tokens the candidate prefilter kept away from the LLM."""
+    # The prefilter may be wrapped by the cache, look through the wrappers for it
+    while extractor is not None and not hasattr(extractor, "dropped_tokens"):
+        extractor = getattr(extractor, "extractor", None)
+    if extractor is not None and extractor.input_tokens:
+        print(f"Prefilter dropped {extractor.dropped_tokens} of {extractor.input_tokens} tokens.")
+
+
+def report_cascade(extractor):
+    """Print the share of sentences handled by each tier of the extraction cascade."""
+    while extractor is not None and not hasattr(extractor, "tier_fractions"):
+        extractor = getattr(extractor, "extractor", None)
+    if extractor is not None:
+        fractions = extractor.tier_fractions()
+        print(f"Cascade: {fractions['tagger']:.0%} of sentences handled by the tagger, "
+              f"{fractions['llm']:.0%} sent to the LLM, {fractions['skipped']:.0%} skipped.")
+
+
+def run_batch_mode(args, overrides):
+    """Process every post in a directory, glob or manifest across a process pool or the asyncio pipeline."""
+    from .batch import build_config, iter_posts, run_batch
+    from .llm import check_backend
+    from .metrics import MetricsWriter
+    
+    try:
+        config = build_config(args.config, overrides)
+        check_backend(config)
+        paths = iter_posts(args.blog_post, args.manifest, config.get("output.suffix", "_linked"))
+        if not args.pipeline:
+            paths = list(paths)
+        manifest = None
+        if config.get("output.manifest"):
+            from .manifest import SiteManifest
+            manifest = SiteManifest(config.get("output.manifest"))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.pipeline:
+        # Paths are not counted up front, posts start flowing through the pipeline straight away
+        print("Processing blog posts...")
+    elif not paths:
+        print("No blog posts found to process.")
+        sys.exit(0)
+    else:
+        print(f"Processing {len(paths)} blog posts...")
+    metrics_writer = MetricsWriter(args.metrics, args.metrics_format) if args.metrics else None
+    try:
+        if args.pipeline:
+            from .pipeline import run_pipeline
+            summary = run_pipeline(paths, args.config, overrides, None, args.output_dir, metrics_writer, manifest)
+        else:
+            summary = run_batch(paths, args.config, overrides, args.workers, args.output_dir, metrics_writer, manifest)
+    except Exception as e:
+        # Errors in single posts are in the summary, anything raised is a setup failure
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if metrics_writer:
+            metrics_writer.close()
+        if manifest:
+            manifest.save()
+    print(summary.format())
+    if args.metrics:
+        print(f"Metrics written to: {args.metrics}")
+    if manifest:
+        print(f"Site manifest written to: {manifest.path}")
+    
+    if summary.failures:
+        sys.exit(1)
+
+
+def run_relink_mode(args, overrides):
+    """Rebuild every linked output recorded in the site manifest, without extraction."""
+    from .batch import build_config, run_relink
+    from .manifest import SiteManifest
+    
+    try:
+        config = build_config(args.config, overrides)
+        if not config.get("output.manifest"):
+            raise ValueError("--relink needs a site manifest, pass --site-manifest or set output.manifest")
+        manifest = SiteManifest(config.get("output.manifest"))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    print(f"Re-linking {len(manifest)} blog posts...")
+    try:
+        summary = run_relink(manifest, config, args.output_dir)
+    finally:
+        manifest.save()
+    print(summary.format())
+    
+    if summary.failures:
+        sys.exit(1)
+
+
+def run_watch_mode(args, overrides):
+    """Re-link posts in a directory as they are saved, until interrupted."""
+    from .batch import build_config
+    from .llm import check_backend
+    from .metrics import MetricsWriter
+    from .watch import PostWatcher
+    
+    if not args.blog_post or not Path(args.blog_post).is_dir():
+        print("Error: --watch needs a directory of blog posts", file=sys.stderr)
+        sys.exit(1)
+    
+    try:
+        config = build_config(args.config, overrides)
+        check_backend(config)
+        manifest = None
+        if config.get("output.manifest"):
+            from .manifest import SiteManifest
+            manifest = SiteManifest(config.get("output.manifest"))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    metrics_writer = MetricsWriter(args.metrics, args.metrics_format) if args.metrics else None
+    watcher = PostWatcher(args.blog_post, args.config, overrides, args.workers, args.output_dir,
+                          manifest=manifest, metrics_writer=metrics_writer)
+    print(f"Watching {args.blog_post} for changes ({watcher.source.name}), press Ctrl+C to stop.")
+    if watcher.ready:
+        print(f"Linking {len(watcher.ready)} posts without an up-to-date output...")
+    try:
+        while True:
+            for result in watcher.step():
+                if result["error"]:
+                    print(f"  Failed {result['path']}: {result['error']}")
+                else:
+                    print(f"  Linked {result['path']} ({result['properties']} properties)")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        summary = watcher.close()
+        if metrics_writer:
+            metrics_writer.close()
+    print(summary.format())
+
+
 if __name__ == "__main__":
     main()
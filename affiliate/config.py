@@ -1,7 +1,6 @@
 """Configuration management for the affiliate link tool."""
 
 import os
-import yaml
 from typing import Dict, Any
 from pathlib import Path
 
@@ -31,33 +30,56 @@ class Config:
         # Start with defaults
         config = {
             "affiliate": {"id": "12345"},
-            "llm": {"model": "mock", "type": "mock"},
-            "output": {"suffix": "_linked"}
+            "llm": {"model": "mock", "type": "mock", "server": "127.0.0.1:8765", "precision": "fp32", "threads": None,
+                    "prefilter": False, "prefilter_context": 0, "fallback_type": "daemon",
+                    "tagger_model": "dslim/bert-base-NER", "tagger_threshold": 0.9,
+                    "simulated": {"token_latency_ms": 20, "prefill_latency_ms": 0.5, "jitter": 0.2,
+                                  "failure_rate": 0.0, "seed": None}},
+            "output": {"suffix": "_linked", "manifest": None},
+            "cache": {"enabled": True, "path": None, "max_size_mb": 100, "max_age_days": 30, "refresh": False,
+                      "incremental": False},
+            "watch": {"debounce": 0.5, "polling": False, "poll_interval": 1.0},
+            "pipeline": {"extract_concurrency": 4, "queue_size": 32}
         }
         
         # Try to load from config file
         if config_file and Path(config_file).exists():
-            with open(config_file, 'r') as f:
-                file_config = yaml.safe_load(f)
-                if file_config:
-                    config = self._deep_merge(config, file_config)
+            file_config = self._read_yaml(config_file)
+            if file_config:
+                config = self._deep_merge(config, file_config)
         elif not config_file:
             # Try default config location
             default_config_path = Path(__file__).parent.parent / "config" / "default_config.yaml"
             if default_config_path.exists():
-                with open(default_config_path, 'r') as f:
-                    file_config = yaml.safe_load(f)
-                    if file_config:
-                        config = self._deep_merge(config, file_config)
+                file_config = self._read_yaml(default_config_path)
+                if file_config:
+                    config = self._deep_merge(config, file_config)
         
         # Override with environment variables
         if os.getenv("AFFILIATE_ID"):
             config["affiliate"]["id"] = os.getenv("AFFILIATE_ID")
         if os.getenv("LLM_MODEL"):
             config["llm"]["model"] = os.getenv("LLM_MODEL")
+        if os.getenv("AFFILIATE_CACHE_PATH"):
+            config["cache"]["path"] = os.getenv("AFFILIATE_CACHE_PATH")
         
         return config
     
+    def _read_yaml(self, path) -> Any:
+        """
+        Parse a YAML file. PyYAML is only imported when there is a file to read,
+        keeping CLI startup fast for the common no-config case.
+        
+        Args:
+            path: Path to the YAML file
+            
+        Returns:
+            Parsed YAML content
+        """
+        import yaml
+        with open(path, 'r') as f:
+            return yaml.safe_load(f)
+    
     def _deep_merge(self, base: Dict, override: Dict) -> Dict:
         """
         Deep merge override dictionary into base dictionary.
@@ -97,6 +119,22 @@ class Config:
                 return default
         return value if value is not None else default
     
+    def set(self, key: str, value: Any) -> None:
+        """
+        Set configuration value using dot notation.
+        
+        Args:
+            key: Configuration key (e.g., 'affiliate.id')
+            value: Value to set
+        """
+        keys = key.split(".")
+        section = self.config
+        for k in keys[:-1]:
+            if not isinstance(section.get(k), dict):
+                section[k] = {}
+            section = section[k]
+        section[keys[-1]] = value
+    
     def to_dict(self) -> Dict[str, Any]:
         """Get full configuration as dictionary."""
         return self.config
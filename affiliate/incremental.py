@@ -0,0 +1,126 @@
+"""Paragraph-level incremental extraction, only new or edited paragraphs go to the LLM."""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .accommodation_extractor import map_mentions
+from .cache import ExtractionCache
+from .markdown import paragraph_spans
+from .prefilter import CandidateFilter, estimate_tokens
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Split a blog post into paragraph blocks on blank lines.
+
+    Args:
+        text: The blog post text
+
+    Returns:
+        Non-empty blocks with surrounding whitespace stripped, so re-flowing
+        blank lines does not change a block's hash
+    """
+    return [text[start:end] for start, end in paragraph_spans(text)]
+
+
+def merge_properties(results: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    """
+    Merge per-block results into one list in document order.
+
+    Properties are de-duplicated by name (case-insensitive). A property found
+    without a location takes the location from a later mention if there is one.
+    The 'mentions' offsets of duplicates are combined.
+
+    Args:
+        results: Extraction results for each block
+
+    Returns:
+        List of dictionaries with 'name' and 'location' keys
+    """
+    merged: Dict[str, Dict[str, str]] = {}
+    for properties in results:
+        for prop in properties:
+            key = prop.get("name", "").strip().lower()
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = dict(prop)
+                continue
+            if not merged[key].get("location") and prop.get("location"):
+                merged[key]["location"] = prop["location"]
+            if prop.get("mentions"):
+                merged[key]["mentions"] = merged[key].get("mentions", []) + prop["mentions"]
+    return list(merged.values())
+
+
+class IncrementalExtractor:
+    """
+    Extracts each paragraph separately, reusing stored results for unchanged paragraphs.
+
+    With a candidate filter the whole post is filtered first, and each window
+    of kept paragraphs (see CandidateFilter.select_windows) is extracted and
+    stored as one block, so a candidate keeps its heading and neighbours.
+    """
+
+    def __init__(self, extractor, cache: ExtractionCache, model: str = "mock", refresh: bool = False,
+                 candidate_filter: Optional[CandidateFilter] = None):
+        """
+        Initialize the incremental extractor.
+
+        Args:
+            extractor: Any object with an extract_accommodations(text) method
+            cache: Extraction cache used to store the results of each block
+            model: LLM model name, part of the cache key
+            refresh: Re-extract every block and overwrite the stored results
+            candidate_filter: Prefilter applied to the whole post before it is split into blocks
+        """
+        self.extractor = extractor
+        self.cache = cache
+        self.model = model
+        self.refresh = refresh
+        self.candidate_filter = candidate_filter
+        self.prompt_version = getattr(extractor, "prompt_version", "1")
+        if candidate_filter is not None:
+            self.prompt_version += f"+{candidate_filter.version}"
+            # Same counters as PrefilteredExtractor, only present when filtering
+            self.input_tokens = 0
+            self.dropped_tokens = 0
+        self.blocks_reused = 0
+        self.blocks_extracted = 0
+        self.last_hit = False
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, str]]:
+        """
+        Extract accommodation properties from text, only sending changed paragraphs to the extractor.
+
+        Args:
+            text: The blog post text to analyze.
+
+        Returns:
+            List of dictionaries with 'name' and 'location' keys.
+        """
+        results = []
+        extracted = 0
+        for block, to_original in self._blocks(text):
+            key = self.cache.make_key(block, self.model, self.prompt_version)
+            properties = None if self.refresh else self.cache.get(key)
+            if properties is None:
+                properties = self.extractor.extract_accommodations(block)
+                self.cache.put(key, properties)
+                extracted += 1
+            # Stored offsets are relative to the block, so they stay valid when the block moves
+            results.append(map_mentions(properties, to_original))
+
+        self.blocks_extracted += extracted
+        self.blocks_reused += len(results) - extracted
+        self.last_hit = extracted == 0
+        return merge_properties(results)
+
+    def _blocks(self, text: str) -> List[Tuple[str, Callable[[int, int], Optional[Tuple[int, int]]]]]:
+        """Return the blocks of a text, each with the function mapping its offsets back to the text."""
+        if self.candidate_filter is None:
+            return [(text[start:end], lambda s, e, start=start: (s + start, e + start))
+                    for start, end in paragraph_spans(text)]
+        windows = self.candidate_filter.select_windows(text)
+        self.input_tokens += estimate_tokens(text)
+        self.dropped_tokens += max(0, estimate_tokens(text) - sum(window.kept_tokens for window in windows))
+        return [(window.text, window.to_original) for window in windows]
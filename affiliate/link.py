@@ -1,9 +1,19 @@
 """Generate a booking.com affiliate link and insert it into the blog post."""
 
-import re
-from typing import List, Dict
+from typing import Any, List, Dict, NamedTuple, Optional, Tuple
 from urllib.parse import quote
 
+from .aliases import AliasIndex, article_start, leading_article, normalize_key, property_keys
+from .markdown import SpanIndex, protected_spans
+
+
+class LinkSpan(NamedTuple):
+    """A mention of a property in the markdown that should become a hyperlink."""
+    start: int
+    end: int
+    name: str
+    location: str
+
 
 class LinkProcessor:
     """Generates affiliate links and processes markdown to add hyperlinks."""
@@ -43,47 +53,155 @@ class LinkProcessor:
         Edit the markdown blog post to add hyperlinks to property names in the format:
         [Property Name](affiliate_url) .
         
-        Finds the first mention of each property name (case-insensitive,
-        handling variations like "The Hotel X" vs "Hotel X") and wraps it with a
+        Finds the first mention of each property name and wraps it with a
         markdown hyperlink to the affiliate URL that includes location and country.
+        Names are matched ignoring case, accents, punctuation and a leading article,
+        so "the Harveys Point Hotel" matches "Harvey's Point Hotel", and without
+        generic words like "Hotel" if at least two words are left ("Harvey's Point").
+        Other names listed in a property's 'aliases' are matched too.
+        Mentions in front matter, headings, code, existing links and images, HTML
+        and URLs are skipped. If the extractor reported 'mentions' offsets for a property, the first
+        of those is linked directly instead.
         
         Args:
             markdown_content: The markdown blog post content
-            accomodations: List of dictionaries of accomodations with 'name' and 'location' keys
+            accomodations: List of dictionaries of accomodations with 'name' and 'location' keys,
+                and optionally 'aliases' and 'mentions' offsets
             
         Returns:
             Modified markdown with hyperlinks added
         """
-        result = markdown_content
+        return self.link_markdown(markdown_content, accommodations)[0]
+
+    def link_markdown(self, markdown_content: str, accommodations: List[Dict[str, str]]) -> Tuple[str, List[LinkSpan]]:
+        """
+        Add hyperlinks like process_markdown, also returning the links that were inserted.
+
+        Args:
+            markdown_content: The markdown blog post content
+            accommodations: List of dictionaries of accommodations with 'name' and 'location' keys
+
+        Returns:
+            Tuple of the modified markdown and the link spans, offsets refer to the original markdown
+        """
+        spans = self.find_links(markdown_content, accommodations)
+        return self.apply_links(markdown_content, spans), spans
+
+    def find_links(self, markdown_content: str, accommodations: List[Dict[str, str]]) -> List[LinkSpan]:
+        """
+        Find the first mention of each property outside the protected markdown regions.
+
+        Properties that carry 'mentions' offsets from the extractor are linked
+        at their first valid offset without searching the document. The rest are
+        found in a single left-to-right scan: the normalised keys of their names,
+        aliases and variants are indexed in an AliasIndex, the words of the
+        document are looked up in it, and the scan stops as soon as every
+        property has been found.
+
+        Args:
+            markdown_content: The markdown blog post content
+            accommodations: List of dictionaries of accommodations with 'name' and 'location' keys
+
+        Returns:
+            List of link spans in document order
+        """
+        # Map lower-cased names to their property, first entry wins for duplicates
+        properties: Dict[str, Dict[str, str]] = {}
+        for prop in accommodations:
+            prop_name = prop.get("name", "")
+            if prop_name and prop_name.lower() not in properties:
+                properties[prop_name.lower()] = prop
+
+        if not properties:
+            return []
+
+        protected = SpanIndex(protected_spans(markdown_content))
+        spans = self.spans_from_mentions(markdown_content, list(properties.values()), protected)
+        linked = {span.name.lower() for span in spans}
+        if len(linked) == len(properties):
+            return spans
+
+        remaining = {key: prop for key, prop in properties.items() if key not in linked}
+        index = AliasIndex(list(remaining.values()))
+        # Already linked mentions are skipped so a searched name never overlaps them
+        taken = SpanIndex((span.start, span.end) for span in spans)
         # Keep track of processed property names to avoid duplicates, only want to link first mention.
         processed_properties = set()
-        
+        for start, end, prop in index.scan(markdown_content):
+            key = prop["name"].lower()
+            if key in processed_properties:
+                continue
+            if protected.overlaps(start, end) or taken.overlaps(start, end):
+                continue
+            spans.append(LinkSpan(start, end, prop["name"], prop.get("location", "")))
+            processed_properties.add(key)
+            if len(processed_properties) == len(remaining):
+                break
+        return sorted(spans)
+
+    def spans_from_mentions(self, markdown_content: str, accommodations: List[Dict[str, Any]],
+                            protected: Optional[SpanIndex] = None) -> List[LinkSpan]:
+        """
+        Build link spans from the mention offsets reported by the extractor, without searching.
+
+        A mention is only used if the text at its offsets normalises to a key of
+        the property (see AliasIndex), so stale offsets are ignored, and is outside the
+        protected markdown regions. Overlapping mentions resolve like the
+        search: the leftmost wins, then the longest. The article of a name is
+        included in the link if the text has it.
+
+        Args:
+            markdown_content: The markdown blog post content
+            accommodations: Accommodations with optional 'mentions', a list of [start, end] offsets
+            protected: Index of the protected regions, built from the content if not given
+
+        Returns:
+            Link spans in document order, at most one per property
+        """
+        if protected is None:
+            protected = SpanIndex(protected_spans(markdown_content))
+        candidates = []
         for prop in accommodations:
-            prop_name = prop.get("name", "")
-            prop_location = prop.get("location", "")
-            
-            # Skip if we've already processed this property
-            if prop_name.lower() in processed_properties:
+            name = prop.get("name", "")
+            keys = property_keys(prop) if prop.get("mentions") else set()
+            articles = {normalize_key(other): leading_article(other)
+                        for other in [name] + list(prop.get("aliases") or ())} if keys else {}
+            for mention in prop.get("mentions") or ():
+                start, end = mention
+                if 0 <= start < end <= len(markdown_content) and not protected.overlaps(start, end):
+                    key = normalize_key(markdown_content[start:end])
+                    if key in keys:
+                        start = article_start(markdown_content, start, articles.get(key))
+                        candidates.append((start, -end, name, prop.get("location", "")))
+
+        spans = []
+        linked = set()
+        position = 0
+        for start, negative_end, name, location in sorted(candidates):
+            if start < position or name.lower() in linked:
                 continue
-            
-            # Generate the affiliate URL with location included
-            url = self.generate_affiliate_url(prop_name, prop_location)
-            
-            # Find and replace the first mention of the property
-            # Use word boundary and case-insensitive search
-            # Pattern handles variations like "The Hotel X", "Hotel X", etc.
-            pattern = r'\b' + re.escape(prop_name) + r'\b'
-            
-            # Use a flag to replace only the first occurrence
-            count = 0
-            def replace_func(match_obj):
-                nonlocal count
-                if count == 0:
-                    count += 1
-                    return f"[{match_obj.group()}]({url})"
-                return match_obj.group()
-            
-            result = re.sub(pattern, replace_func, result, flags=re.IGNORECASE)
-            processed_properties.add(prop_name.lower())
-        
-        return result
+            spans.append(LinkSpan(start, -negative_end, name, location))
+            linked.add(name.lower())
+            position = -negative_end
+        return spans
+
+    def apply_links(self, markdown_content: str, spans: List[LinkSpan]) -> str:
+        """
+        Wrap each span with a markdown hyperlink, building the output in one pass.
+
+        Args:
+            markdown_content: The markdown blog post content
+            spans: Non-overlapping link spans
+
+        Returns:
+            Modified markdown with hyperlinks added
+        """
+        parts = []
+        position = 0
+        for span in sorted(spans):
+            url = self.generate_affiliate_url(span.name, span.location)
+            parts.append(markdown_content[position:span.start])
+            parts.append(f"[{markdown_content[span.start:span.end]}]({url})")
+            position = span.end
+        parts.append(markdown_content[position:])
+        return "".join(parts)
@@ -1 +1,242 @@
-# Placeholder, not implemented yet, LLM will be used to identify properties mentioned in a text
\ No newline at end of file
+"""LLM extractor backends used to identify properties mentioned in a text."""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from .accommodation_extractor import AccommodationExtractor, PROMPT_VERSION
+from .backend import Backend
+
+
+DEFAULT_SERVER_ADDRESS = "127.0.0.1:8765"
+
+# Backend factories by 'llm.type', each taking the configuration
+BACKENDS: Dict[str, Callable[[Any], Any]] = {}
+
+
+def register_backend(llm_type: str) -> Callable:
+    """
+    Register a backend factory under an 'llm.type' name.
+
+    Args:
+        llm_type: Name selecting the backend in the configuration
+
+    Returns:
+        Decorator for a function taking the configuration and returning the backend
+    """
+    def register(factory: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        BACKENDS[llm_type] = factory
+        return factory
+    return register
+
+
+def to_property(item: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Convert an LLM result with 'name', 'place' and 'country' into the
+    'name' and 'location' format used by the link processor, keeping any
+    'mentions' offsets.
+    """
+    location = ", ".join(str(item[k]).strip() for k in ("place", "country") if item.get(k))
+    prop = {"name": str(item.get("name", "")).strip(), "location": location}
+    if item.get("mentions"):
+        prop["mentions"] = [[int(start), int(end)] for start, end in item["mentions"]]
+    return prop
+
+
+class DaemonExtractor(Backend):
+    """
+    Extracts properties by calling a resident extraction server (notebooks/extraction_server.py).
+
+    The sync methods share one connection and are not thread-safe. The async
+    methods open a connection per request, so concurrent requests reach the
+    server together and are micro-batched there.
+    """
+
+    # The server's prompt and model are not the mock's, so their results are cached apart
+    prompt_version = f"{PROMPT_VERSION}+daemon"
+
+    def __init__(self, address: str = DEFAULT_SERVER_ADDRESS, timeout: float = 600):
+        """
+        Initialize the client. The connection is opened on first use and reused.
+
+        Args:
+            address: Server address, "host:port" or "unix:/path/to/socket"
+            timeout: Seconds to wait for a response
+        """
+        self.address = address
+        self.timeout = timeout
+        self._socket: Optional[Any] = None
+        self._reader = None
+        # Model the server runs, asked for by server_model
+        self.model: Optional[str] = None
+        # Cumulative token usage reported by the server
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.generation_retries = 0
+
+    def _connect(self) -> None:
+        import socket
+        if self.address.startswith("unix:"):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            target: Any = self.address[len("unix:"):]
+        else:
+            host, _, port = self.address.rpartition(":")
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            target = (host or "127.0.0.1", int(port))
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(target)
+        except OSError as e:
+            sock.close()
+            raise ConnectionError(f"Could not connect to extraction server at {self.address}: {e}") from e
+        self._socket = sock
+        self._reader = sock.makefile("rb")
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = self._reader = None
+
+    def _request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self._socket is None:
+            self._connect()
+        try:
+            self._socket.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            line = self._reader.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError(f"Extraction server at {self.address} closed the connection")
+        return json.loads(line)
+
+    async def _arequest(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import asyncio
+        if self.address.startswith("unix:"):
+            connection = asyncio.open_unix_connection(self.address[len("unix:"):])
+        else:
+            host, _, port = self.address.rpartition(":")
+            connection = asyncio.open_connection(host or "127.0.0.1", int(port))
+        try:
+            reader, writer = await asyncio.wait_for(connection, self.timeout)
+        except OSError as e:
+            raise ConnectionError(f"Could not connect to extraction server at {self.address}: {e}") from e
+        try:
+            writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+        finally:
+            writer.close()
+        if not line:
+            raise ConnectionError(f"Extraction server at {self.address} closed the connection")
+        return json.loads(line)
+
+    def server_model(self) -> str:
+        """
+        Ask the server which model it runs, so results can be cached per server model.
+
+        Once asked, a response from another model (the server was restarted
+        with a different model or precision) is an error rather than a result
+        cached under the old model.
+
+        Returns:
+            Model name, with the precision appended if not fp32 (e.g. "google/gemma-3-4b-it:int8")
+        """
+        if self.model is None:
+            response = self._request({"info": True})
+            if "error" in response:
+                raise RuntimeError(f"Extraction server error: {response['error']}")
+            self.model = response["model"]
+        return self.model
+
+    def _parse_response(self, response: Dict[str, Any]) -> List[Dict[str, str]]:
+        if "error" in response:
+            raise RuntimeError(f"Extraction server error: {response['error']}")
+        model = response.get("model")
+        if self.model is not None and model is not None and model != self.model:
+            raise RuntimeError(f"Extraction server now runs {model} instead of {self.model}, run again to use it")
+        usage = response.get("usage", {})
+        self.prompt_tokens += usage.get("prompt_tokens", 0)
+        self.completion_tokens += usage.get("completion_tokens", 0)
+        self.generation_retries += usage.get("retries", 0)
+        return [to_property(item) for item in response.get("accommodations", []) if item.get("name")]
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, str]]:
+        """
+        Extract accommodation properties from text using the extraction server.
+
+        Args:
+            text: The blog post text to analyze.
+
+        Returns:
+            List of dictionaries with 'name' and 'location' keys.
+        """
+        return self._parse_response(self._request({"text": text}))
+
+    async def aextract_accommodations(self, text: str) -> List[Dict[str, str]]:
+        """Extract accommodation properties from text using the extraction server, without blocking."""
+        return self._parse_response(await self._arequest({"text": text}))
+
+
+@register_backend("mock")
+def _create_mock(config) -> Any:
+    return AccommodationExtractor()
+
+
+@register_backend("daemon")
+def _create_daemon(config) -> Any:
+    return DaemonExtractor(config.get("llm.server", DEFAULT_SERVER_ADDRESS), timeout=config.get("llm.timeout", 600))
+
+
+@register_backend("cascade")
+def _create_cascade(config) -> Any:
+    from .cascade import CascadeExtractor, load_tagger
+    fallback_type = config.get("llm.fallback_type", "daemon")
+    tagger_model = config.get("llm.tagger_model")
+    return CascadeExtractor(load_tagger(tagger_model), create_extractor(config, fallback_type),
+                            threshold=config.get("llm.tagger_threshold"), tagger_name=tagger_model)
+
+
+@register_backend("simulated")
+def _create_simulated(config) -> Any:
+    from .simulated import create_simulated_backend
+    return create_simulated_backend(config)
+
+
+def check_backend(config, llm_type: Optional[str] = None) -> None:
+    """
+    Check that the backend selected in the configuration exists, without building it.
+
+    Args:
+        config: Configuration
+        llm_type: Backend to check instead of 'llm.type'
+
+    Raises:
+        ValueError: If the backend, or the fallback of the cascade, is unknown
+    """
+    llm_type = llm_type or config.get("llm.type", "mock")
+    if llm_type not in BACKENDS:
+        raise ValueError(f"Unknown llm.type: {llm_type} (expected one of {', '.join(sorted(BACKENDS))})")
+    if llm_type == "cascade":
+        fallback_type = config.get("llm.fallback_type", "daemon")
+        if fallback_type == "cascade":
+            raise ValueError("llm.fallback_type cannot be cascade")
+        check_backend(config, fallback_type)
+
+
+def create_extractor(config, llm_type: Optional[str] = None) -> Any:
+    """
+    Create the extractor backend selected by 'llm.type' in the configuration.
+
+    Args:
+        config: Configuration
+        llm_type: Backend to create instead of 'llm.type'
+
+    Returns:
+        Object with an extract_accommodations(text) method, the backends derived
+        from Backend also have the batch and async methods of ExtractorBackend
+    """
+    llm_type = llm_type or config.get("llm.type", "mock")
+    check_backend(config, llm_type)
+    return BACKENDS[llm_type](config)
@@ -0,0 +1,116 @@
+"""Site manifest of extracted properties and link offsets, so a site can be re-linked without the LLM."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .batch import write_atomic
+from .link import LinkProcessor, LinkSpan
+
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of a post's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_entry(blog_path: Path, blog_content: str, output_path: Path, properties: List[Dict[str, Any]],
+               links: List[LinkSpan]) -> Dict[str, Any]:
+    """
+    Build the manifest entry of one processed post.
+
+    Args:
+        blog_path: Path to the markdown blog post
+        blog_content: The post text that was linked
+        output_path: Path the linked post was written to
+        properties: Extracted properties
+        links: Link spans inserted, offsets refer to blog_content
+
+    Returns:
+        Manifest entry
+    """
+    return {
+        "source": str(blog_path),
+        "output": str(output_path),
+        "sha256": content_hash(blog_content),
+        "properties": [{"name": p.get("name", ""), "location": p.get("location", "")} for p in properties],
+        "links": [list(span) for span in links],
+    }
+
+
+class SiteManifest:
+    """One entry per post: content hash, extracted properties and link offsets, stored as JSON."""
+
+    def __init__(self, path: str):
+        """
+        Load the manifest, starting an empty one if the file does not exist.
+
+        Args:
+            path: Path of the manifest JSON file
+        """
+        self.path = Path(path)
+        self.base = self.path.parent
+        self.posts: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"Unsupported site manifest version: {data.get('version')}")
+            self.posts = data["posts"]
+
+    def _relative(self, path: str) -> str:
+        # Paths are stored relative to the manifest so the site can be moved with it
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.base))
+
+    def resolve(self, path: str) -> Path:
+        """Return a path stored in the manifest as a usable path."""
+        return self.base / path
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Add or replace the entry of one post, as built by make_entry."""
+        entry = dict(entry, source=self._relative(entry["source"]), output=self._relative(entry["output"]))
+        self.posts[entry["source"]] = entry
+
+    def save(self) -> None:
+        """Write the manifest, replacing the old file only once the new one is complete."""
+        write_atomic(self.path, json.dumps({"version": MANIFEST_VERSION, "posts": self.posts}))
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+
+def relink_post(manifest: SiteManifest, entry: Dict[str, Any], processor: LinkProcessor,
+                output_path: Optional[Path] = None) -> bool:
+    """
+    Rebuild the linked output of one post from its manifest entry, without extraction.
+
+    If the post was edited since it was recorded, the stored link offsets no longer
+    apply, so the stored properties are linked again and the entry is updated.
+
+    Args:
+        manifest: Site manifest the entry belongs to
+        entry: Manifest entry of the post
+        processor: Link processor with the current affiliate settings
+        output_path: Where to write the output (default: the recorded output path)
+
+    Returns:
+        True if the stored offsets were used, False if the post had changed
+    """
+    source = manifest.resolve(entry["source"])
+    with open(source, 'r', encoding='utf-8') as f:
+        blog_content = f.read()
+
+    unchanged = content_hash(blog_content) == entry["sha256"]
+    if unchanged:
+        links = [LinkSpan(*link) for link in entry["links"]]
+    else:
+        links = processor.find_links(blog_content, entry["properties"])
+        manifest.record(make_entry(source, blog_content, output_path or manifest.resolve(entry["output"]),
+                                   entry["properties"], links))
+
+    write_atomic(output_path or manifest.resolve(entry["output"]), processor.apply_links(blog_content, links))
+    return unchanged
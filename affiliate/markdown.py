@@ -0,0 +1,172 @@
+"""Find the regions of a markdown post where affiliate links must not be inserted."""
+
+import re
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
+
+
+# Block constructs are recognised line by line
+FENCE_PATTERN = re.compile(r" {0,3}(`{3,}|~{3,})")
+HEADING_PATTERN = re.compile(r" {0,3}#{1,6}(?:[ \t]|$)")
+FRONT_MATTER_END = ("---", "...")
+BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+# Inline constructs, one alternation so each run of text lines is scanned once.
+# The leading lookahead skips positions no construct can start at. HTML
+# comments and links only match their opening tag here, their end is found
+# by _scan_inline.
+INLINE_PATTERN = re.compile(
+    r"(?=[`!\[<h]|^)(?:"
+    r"(?<!`)(?P<code>`+)(?!`)(?:(?!\n[ \t]*\n)[\s\S])*?(?<!`)(?P=code)(?!`)"  # code span
+    r"|!?\[(?:[^\[\]\n]|\[[^\[\]\n]*\])*\](?:\([^()\n]*(?:\([^()\n]*\)[^()\n]*)*\)|\[[^\]\n]*\])"  # link, image, reference
+    r"|^ {0,3}\[[^\]\n]+\]:.*$"  # link reference definition
+    r"|(?P<comment><!--)"  # HTML comment
+    r"|(?P<anchor><a\b[^<>]*>)"  # HTML link, including its text
+    r"|</?[A-Za-z][^<>\n]*>"  # HTML tag or autolink
+    r"|\bhttps?://[^\s<>()\[\]]+)",  # bare URL
+    flags=re.MULTILINE,
+)
+COMMENT_END = re.compile(r"-->")
+ANCHOR_END = re.compile(r"</a\s*>")
+
+
+def paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Split text into paragraph blocks on blank lines.
+
+    Args:
+        text: The blog post text
+
+    Returns:
+        (start, end) offsets of the non-empty blocks, excluding surrounding whitespace
+    """
+    spans = []
+    position = 0
+    for separator in list(BLOCK_SEPARATOR.finditer(text)) + [None]:
+        end = separator.start() if separator else len(text)
+        block = text[position:end]
+        if block.strip():
+            spans.append((position + len(block) - len(block.lstrip()), position + len(block.rstrip())))
+        if separator:
+            position = separator.end()
+    return spans
+
+
+def protected_spans(markdown_content: str) -> List[Tuple[int, int]]:
+    """
+    Tokenize a markdown post in one pass and return the regions links must not touch.
+
+    Protected regions are front matter, fenced code blocks, headings, inline
+    code, existing links and images (including alt text), reference
+    definitions, HTML tags and comments, and bare URLs.
+
+    Args:
+        markdown_content: The markdown blog post content
+
+    Returns:
+        (start, end) offsets of the protected regions in document order
+    """
+    spans: List[Tuple[int, int]] = []
+    lines = markdown_content.splitlines(keepends=True)
+    position = 0
+    index = 0
+
+    # YAML front matter only counts at the very start of the post
+    if lines and lines[0].rstrip() == "---":
+        for end_index in range(1, len(lines)):
+            if lines[end_index].rstrip() in FRONT_MATTER_END:
+                end = sum(len(line) for line in lines[:end_index + 1])
+                spans.append((0, end))
+                position, index = end, end_index + 1
+                break
+
+    text_start = position
+    fence = None
+    block_start = 0
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.rstrip("\r\n")
+        if fence:
+            # Closing fence uses the same character, at least as long as the opener
+            if stripped.strip().startswith(fence) and not stripped.strip().strip(fence[0]):
+                spans.append((block_start, position + len(line)))
+                fence = None
+                text_start = position + len(line)
+        else:
+            match = FENCE_PATTERN.match(stripped)
+            if match:
+                _scan_inline(markdown_content, text_start, position, spans)
+                fence = match.group(1)
+                block_start = position
+            elif HEADING_PATTERN.match(stripped):
+                _scan_inline(markdown_content, text_start, position, spans)
+                spans.append((position, position + len(stripped)))
+                text_start = position + len(line)
+        position += len(line)
+        index += 1
+
+    if fence:
+        # An unclosed fence runs to the end of the post
+        spans.append((block_start, len(markdown_content)))
+    else:
+        _scan_inline(markdown_content, text_start, len(markdown_content), spans)
+    return spans
+
+
+def _scan_inline(markdown_content: str, start: int, end: int, spans: List[Tuple[int, int]]) -> None:
+    """
+    Append the inline protected regions between start and end.
+
+    An HTML comment or link runs to its closing tag. Once no closing tag of a
+    kind is left, later openers of that kind are not searched again, so an
+    unclosed comment is not protected and an unclosed link only protects its
+    tag, and the scan stays linear.
+    """
+    unclosed = set()
+    position = start
+    while position < end:
+        match = INLINE_PATTERN.search(markdown_content, position, end)
+        if match is None:
+            break
+        region_end = match.end()
+        closer = COMMENT_END if match.group("comment") else ANCHOR_END if match.group("anchor") else None
+        if closer is not None and closer not in unclosed:
+            closing = closer.search(markdown_content, region_end, end)
+            if closing is None:
+                unclosed.add(closer)
+            else:
+                region_end = closing.end()
+        position = region_end
+        if closer is COMMENT_END and region_end == match.end():
+            continue
+        spans.append((match.start(), region_end))
+
+
+class SpanIndex:
+    """Sorted interval index answering "does this range overlap any region?" in O(log n)."""
+
+    def __init__(self, spans: Iterable[Tuple[int, int]]):
+        """
+        Build the index.
+
+        Args:
+            spans: (start, end) regions in any order, overlapping regions are merged
+        """
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        for start, end in sorted(spans):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Return True if [start, end) overlaps any indexed region."""
+        i = bisect_right(self.starts, start)
+        if i and self.ends[i - 1] > start:
+            return True
+        return i < len(self.starts) and self.starts[i] < end
+
+    def __len__(self) -> int:
+        return len(self.starts)
@@ -0,0 +1,187 @@
+"""Per-stage timing and counters for the affiliate pipeline, written as JSON lines or a Prometheus textfile."""
+
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional
+
+
+# Cumulative counters exposed by extractors and the wrappers around them
+EXTRACTOR_COUNTERS = {
+    "prompt_tokens": "llm_prompt_tokens",
+    "completion_tokens": "llm_completion_tokens",
+    "generation_retries": "llm_generation_retries",
+    "dropped_tokens": "prefilter_dropped_tokens",
+    "blocks_reused": "blocks_reused",
+    "blocks_extracted": "blocks_extracted",
+    "tagger_sentences": "cascade_tagger_sentences",
+    "llm_sentences": "cascade_llm_sentences",
+}
+
+
+def extractor_counters(extractor: Any) -> Dict[str, int]:
+    """
+    Collect the cumulative counters of an extractor and every extractor it wraps.
+
+    Args:
+        extractor: Extractor, possibly wrapped by the cache, prefilter, etc.
+
+    Returns:
+        Dictionary of metric name to value
+    """
+    counters: Dict[str, int] = {}
+    while extractor is not None:
+        for attribute, name in EXTRACTOR_COUNTERS.items():
+            if hasattr(extractor, attribute):
+                counters[name] = counters.get(name, 0) + getattr(extractor, attribute)
+        cache = getattr(extractor, "cache", None)
+        if cache is not None:
+            counters["cache_hits"] = cache.hits
+            counters["cache_misses"] = cache.misses
+        extractor = getattr(extractor, "extractor", None)
+    return counters
+
+
+class Metrics:
+    """
+    Collects wall and CPU time per stage and counters for one post.
+
+    CPU time is that of the thread running the stage, so stages of other posts
+    running in other threads at the same time are not counted. Threads the
+    stage itself starts are not counted either.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str, cpu: bool = True) -> Iterator[None]:
+        """
+        Time the enclosed block as pipeline stage `name`.
+
+        Args:
+            name: Stage name
+            cpu: Measure the CPU time too, False for a block that awaits, since
+                the event loop runs other work on the same thread meanwhile
+        """
+        wall, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            totals["wall_s"] += time.perf_counter() - wall
+            if cpu:
+                totals["cpu_s"] += time.thread_time() - cpu_start
+
+    def add(self, name: str, value: int = 1) -> None:
+        """Increase counter `name` by `value`."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_deltas(self, before: Dict[str, int], after: Dict[str, int]) -> None:
+        """Add the change between two extractor_counters snapshots."""
+        for name, value in after.items():
+            if value != before.get(name, 0):
+                self.add(name, value - before.get(name, 0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"stages": self.stages, "counters": self.counters}
+
+
+class NullMetrics:
+    """Disabled metrics, every call is a no-op."""
+
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name: str, cpu: bool = True):
+        return self._context
+
+    def add(self, name: str, value: int = 1) -> None:
+        pass
+
+    def add_deltas(self, before: Dict[str, int], after: Dict[str, int]) -> None:
+        pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {}
+
+
+NULL_METRICS = NullMetrics()
+
+
+class MetricsWriter:
+    """Writes per-post metrics as JSON lines, or run totals as a Prometheus textfile."""
+
+    def __init__(self, path: str, format: Optional[str] = None):
+        """
+        Initialize the writer.
+
+        Args:
+            path: Output file path
+            format: "jsonl" or "prometheus", by default inferred from the file extension (.prom)
+        """
+        self.path = path
+        self.format = format or ("prometheus" if path.endswith(".prom") else "jsonl")
+        if self.format not in ("jsonl", "prometheus"):
+            raise ValueError(f"Unknown metrics format: {self.format}")
+        self.posts = 0
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self._file = open(path, 'a', encoding='utf-8') if self.format == "jsonl" else None
+
+    def write_post(self, path: str, record: Dict[str, Any]) -> None:
+        """Record the metrics of one processed post."""
+        self.posts += 1
+        for stage, totals in record.get("stages", {}).items():
+            aggregate = self.stages.setdefault(stage, {"wall_s": 0.0, "cpu_s": 0.0})
+            aggregate["wall_s"] += totals["wall_s"]
+            aggregate["cpu_s"] += totals["cpu_s"]
+        for name, value in record.get("counters", {}).items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self._file:
+            line = {"type": "post", "timestamp": time.time(), "path": str(path), **record}
+            self._file.write(json.dumps(line) + "\n")
+
+    def close(self) -> None:
+        """Write the run totals and close the file."""
+        if self._file:
+            summary = {"type": "summary", "timestamp": time.time(), "posts": self.posts,
+                       "stages": self.stages, "counters": self.counters}
+            self._file.write(json.dumps(summary) + "\n")
+            self._file.close()
+            self._file = None
+        elif self.format == "prometheus":
+            self._write_prometheus()
+
+    def _write_prometheus(self) -> None:
+        lines = [
+            "# HELP affiliate_posts_total Blog posts processed.",
+            "# TYPE affiliate_posts_total counter",
+            f"affiliate_posts_total {self.posts}",
+            "# HELP affiliate_stage_seconds_total Wall time spent in each pipeline stage.",
+            "# TYPE affiliate_stage_seconds_total counter",
+        ]
+        lines += [f'affiliate_stage_seconds_total{{stage="{stage}"}} {totals["wall_s"]:.6f}'
+                  for stage, totals in sorted(self.stages.items())]
+        lines += [
+            "# HELP affiliate_stage_cpu_seconds_total CPU time spent in each pipeline stage.",
+            "# TYPE affiliate_stage_cpu_seconds_total counter",
+        ]
+        lines += [f'affiliate_stage_cpu_seconds_total{{stage="{stage}"}} {totals["cpu_s"]:.6f}'
+                  for stage, totals in sorted(self.stages.items())]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE affiliate_{name}_total counter", f"affiliate_{name}_total {value}"]
+        lookups = self.counters.get("cache_hits", 0) + self.counters.get("cache_misses", 0)
+        if lookups:
+            lines += ["# TYPE affiliate_cache_hit_ratio gauge",
+                      f"affiliate_cache_hit_ratio {self.counters.get('cache_hits', 0) / lookups:.4f}"]
+
+        # Write then rename so the textfile collector never reads a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,227 @@
+"""Asyncio pipeline overlapping the reading, extraction, linking and writing of many posts."""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .backend import is_async
+from .batch import BatchSummary, build_config, build_extractor, output_path_for, write_atomic
+from .config import Config
+from .link import LinkProcessor
+from .metrics import Metrics, NULL_METRICS, extractor_counters
+
+
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_EXTRACT_CONCURRENCY = 4
+
+
+async def run_pipeline_async(paths: Iterable[Path], config: Config, output_dir: Optional[str] = None,
+                             extract_concurrency: int = DEFAULT_EXTRACT_CONCURRENCY,
+                             queue_size: int = DEFAULT_QUEUE_SIZE, metrics_writer=None, manifest=None,
+                             extractor_factory: Optional[Callable[[], Any]] = None) -> BatchSummary:
+    """
+    Process many blog posts through four concurrent stages connected by bounded queues.
+
+    A reader stage reads posts from disk, `extract_concurrency` extraction tasks
+    await the backend's async method (or run the extractor in a thread pool if it
+    has none), a linking stage inserts the links and a writer stage writes the
+    outputs. When a stage falls behind, the queue in front of it fills up and the
+    stages before it wait, so at most about three queues and the extraction slots
+    worth of posts are held in memory, however many paths there are. Paths are
+    consumed lazily.
+
+    Args:
+        paths: Blog post paths, any iterable, e.g. the iter_posts generator
+        config: Configuration
+        output_dir: Output directory (default: same as each input)
+        extract_concurrency: Number of posts extracted at the same time
+        queue_size: Capacity of each queue between stages
+        metrics_writer: If given, per-post stage timings and counters are written to it
+        manifest: If given, a SiteManifest the entry of every successful post is recorded in
+        extractor_factory: Builds an extractor for each extraction thread, or one shared extractor if it
+            has async methods (default: build_extractor(config))
+
+    Returns:
+        Summary of successes, failures and throughput
+
+    Raises:
+        RuntimeError: If the extractor could not be built, before any post is read
+    """
+    summary = BatchSummary()
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    processor = LinkProcessor(config.get("affiliate.id", "12345"))
+    extractor_factory = extractor_factory or (lambda: build_extractor(config))
+    collect_metrics = metrics_writer is not None
+
+    read_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(queue_size)
+    link_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(queue_size)
+    write_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(queue_size)
+    io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="affiliate-io")
+    extract_executor = ThreadPoolExecutor(max_workers=extract_concurrency, thread_name_prefix="affiliate-extract")
+    # Extractors hold a cache connection or server socket, so each extraction thread gets its own
+    local = threading.local()
+
+    def finish(post: Dict[str, Any], error: Optional[Exception] = None) -> None:
+        if error is not None:
+            post["error"] = f"{type(error).__name__}: {error}"
+        post["metrics"] = post["metrics"].to_dict()
+        summary.record(post)
+        if post["error"]:
+            return
+        if collect_metrics:
+            metrics_writer.write_post(post["path"], post["metrics"])
+        if manifest is not None:
+            from .manifest import make_entry
+            manifest.record(make_entry(post["path"], post["content"], post["output"], post["found"], post["links"]))
+
+    def read(post: Dict[str, Any]) -> None:
+        with post["metrics"].stage("read"):
+            with open(post["path"], 'r', encoding='utf-8') as f:
+                post["content"] = f.read()
+                post["metrics"].add("bytes_read", os.fstat(f.fileno()).st_size)
+
+    def thread_extractor() -> Any:
+        if not hasattr(local, "extractor"):
+            local.extractor = extractor_factory()
+        return local.extractor
+
+    def extracted(post: Dict[str, Any], extractor: Any, before: Dict[str, int]) -> None:
+        if post["metrics"].enabled:
+            post["metrics"].add_deltas(before, extractor_counters(extractor))
+            post["metrics"].add("properties", len(post["found"]))
+        post["properties"] = len(post["found"])
+        post["cache_hit"] = getattr(extractor, "last_hit", None)
+
+    def extract(post: Dict[str, Any]) -> None:
+        extractor = thread_extractor()
+        before = extractor_counters(extractor) if post["metrics"].enabled else {}
+        with post["metrics"].stage("extract"):
+            post["found"] = extractor.extract_accommodations(post["content"])
+        extracted(post, extractor, before)
+
+    async def extract_async(post: Dict[str, Any], extractor: Any) -> None:
+        # The extractor is shared, so its counter deltas include the posts extracted concurrently
+        before = extractor_counters(extractor) if post["metrics"].enabled else {}
+        with post["metrics"].stage("extract", cpu=False):
+            post["found"] = await extractor.aextract_accommodations(post["content"])
+        extracted(post, extractor, before)
+
+    def write(post: Dict[str, Any]) -> None:
+        with post["metrics"].stage("write"):
+            post["output"] = output_path_for(post["path"], config, output_dir)
+            write_atomic(post["output"], post["linked"])
+        post["metrics"].add("bytes_written", len(post["linked"].encode('utf-8')))
+
+    async def read_stage() -> None:
+        for path in paths:
+            post = {"path": path, "error": None, "properties": 0, "cache_hit": None,
+                    "metrics": Metrics() if collect_metrics else NULL_METRICS}
+            try:
+                await loop.run_in_executor(io_executor, read, post)
+            except Exception as e:
+                finish(post, e)
+                continue
+            await read_queue.put(post)
+        for _ in range(extract_concurrency):
+            await read_queue.put(None)
+
+    async def extract_stage(async_extractor: Optional[Any]) -> None:
+        while True:
+            post = await read_queue.get()
+            if post is None:
+                break
+            try:
+                if async_extractor is not None:
+                    await extract_async(post, async_extractor)
+                else:
+                    await loop.run_in_executor(extract_executor, extract, post)
+            except Exception as e:
+                finish(post, e)
+                continue
+            await link_queue.put(post)
+        await link_queue.put(None)
+
+    async def link_stage() -> None:
+        # Stops once every extraction task has finished
+        remaining = extract_concurrency
+        while remaining:
+            post = await link_queue.get()
+            if post is None:
+                remaining -= 1
+                continue
+            try:
+                with post["metrics"].stage("link"):
+                    post["linked"], post["links"] = (processor.link_markdown(post["content"], post["found"])
+                                                     if post["found"] else (post["content"], []))
+                post["metrics"].add("links_inserted", len(post["links"]))
+            except Exception as e:
+                finish(post, e)
+                continue
+            await write_queue.put(post)
+        await write_queue.put(None)
+
+    async def write_stage() -> None:
+        while True:
+            post = await write_queue.get()
+            if post is None:
+                break
+            try:
+                await loop.run_in_executor(io_executor, write, post)
+            except Exception as e:
+                finish(post, e)
+                continue
+            finish(post)
+
+    try:
+        # A backend with async methods (not wrapped by the cache) is awaited directly and shared
+        # by the extraction tasks, any other extractor runs in the extraction threads
+        try:
+            extractor = await loop.run_in_executor(extract_executor, thread_extractor)
+        except Exception as e:
+            raise RuntimeError(f"Could not set up the extractor: {type(e).__name__}: {e}") from e
+        async_extractor = extractor if is_async(extractor) else None
+        await asyncio.gather(read_stage(), *(extract_stage(async_extractor) for _ in range(extract_concurrency)),
+                             link_stage(), write_stage())
+    finally:
+        io_executor.shutdown(wait=True)
+        extract_executor.shutdown(wait=True)
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def run_pipeline(paths: Iterable[Path], config_file: Optional[str] = None,
+                 overrides: Optional[Dict[str, Any]] = None, extract_concurrency: Optional[int] = None,
+                 output_dir: Optional[str] = None, metrics_writer=None, manifest=None,
+                 queue_size: Optional[int] = None) -> BatchSummary:
+    """
+    Process many blog posts with the asyncio pipeline, see run_pipeline_async.
+
+    Args:
+        paths: Blog post paths, consumed lazily
+        config_file: Path to YAML config file
+        overrides: Configuration overrides, see build_config
+        extract_concurrency: Posts extracted at the same time (default: 'pipeline.extract_concurrency')
+        output_dir: Output directory (default: same as each input)
+        metrics_writer: If given, per-post stage timings and counters are written to it
+        manifest: If given, a SiteManifest the entry of every successful post is recorded in
+        queue_size: Capacity of each queue between stages (default: 'pipeline.queue_size')
+
+    Returns:
+        Summary of successes, failures and throughput
+
+    Raises:
+        ValueError: If the configuration or backend is invalid
+        RuntimeError: If the extractor could not be built
+    """
+    from .llm import check_backend
+    config = build_config(config_file, overrides)
+    check_backend(config)
+    extract_concurrency = extract_concurrency or config.get("pipeline.extract_concurrency", DEFAULT_EXTRACT_CONCURRENCY)
+    queue_size = queue_size or config.get("pipeline.queue_size", DEFAULT_QUEUE_SIZE)
+    return asyncio.run(run_pipeline_async(paths, config, output_dir, extract_concurrency, queue_size,
+                                          metrics_writer, manifest))
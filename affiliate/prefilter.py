@@ -0,0 +1,254 @@
+"""Cheap candidate prefilter that drops paragraphs with no accommodation mentions before the LLM call.
+
+Usage:
+  python -m affiliate.prefilter examples/donegal_blog.md
+  python -m affiliate.prefilter --labels tests/fixtures/labelled_paragraphs.json
+"""
+
+import argparse
+import json
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from .accommodation_extractor import map_mentions
+from .markdown import paragraph_spans
+
+
+# Generic accommodation words, matched case-insensitively
+KEYWORD_PATTERN = re.compile(
+    r"\b(?:hotels?|motels?|aparthotels?|hostels?|inns?|lodges?|guest\s?houses?|b\s?&\s?bs?"
+    r"|bed\s+(?:and|&)\s+breakfasts?|apartments?|villas?|resorts?|campsites?|campgrounds?"
+    r"|glamping|cottages?|chalets?|suites|airbnb|accomm?odations?)\b",
+    flags=re.IGNORECASE,
+)
+
+# A proper noun right after a phrase about staying somewhere, e.g. "stayed at the Merrion"
+STAY_PATTERN = re.compile(
+    r"\b(?:[Ss]tay(?:ed|ing|s)?|[Ss]lept|[Bb]ooked|[Cc]heck(?:ed|ing)?\s+in|[Nn]ights?)"
+    r"\s+(?:at|in|into)\s+(?:the\s+)?[A-Z][\w'’-]+"
+)
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (words and punctuation), close enough to compare before/after filtering."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def is_candidate(block: str) -> bool:
+    """Return True if a paragraph may mention an accommodation."""
+    return bool(KEYWORD_PATTERN.search(block) or STAY_PATTERN.search(block))
+
+
+class FilterResult:
+    """The text to send to the LLM and how much of the input was dropped."""
+
+    def __init__(self, text: str, spans: List[Tuple[int, int]], input_tokens: int, kept_tokens: int):
+        self.text = text
+        self.spans = spans
+        self.input_tokens = input_tokens
+        self.kept_tokens = kept_tokens
+
+    @property
+    def dropped_tokens(self) -> int:
+        return self.input_tokens - self.kept_tokens
+
+    def to_original(self, start: int, end: int) -> Optional[Tuple[int, int]]:
+        """
+        Map an offset range in the kept text back to the original text.
+
+        Returns:
+            The range in the original text, or None if it crosses the join between two kept blocks
+        """
+        kept_start = 0
+        for block_start, block_end in self.spans:
+            kept_end = kept_start + block_end - block_start
+            if start < kept_end:
+                if start < kept_start or end > kept_end:
+                    return None
+                return start - kept_start + block_start, end - kept_start + block_start
+            kept_start = kept_end + 2  # blocks are joined by a blank line
+        return None
+
+
+class CandidateFilter:
+    """Keeps only candidate paragraphs, plus a little context, for the LLM."""
+
+    def __init__(self, context: int = 0, keep_headings: bool = True):
+        """
+        Initialize the filter.
+
+        Args:
+            context: Number of neighbouring paragraphs kept either side of each candidate
+            keep_headings: Keep the nearest heading above each candidate, it often names the place
+        """
+        self.context = context
+        self.keep_headings = keep_headings
+
+    @property
+    def version(self) -> str:
+        """Identifies the filter settings in cache keys, the model sees different text for each."""
+        version = f"prefilter@{self.context}"
+        if not self.keep_headings:
+            version += "-headings"
+        return version
+
+    def _select_blocks(self, text: str) -> Tuple[List[Tuple[int, int]], List[int], Set[int], List[Optional[int]]]:
+        """Return the paragraphs of a text, the indices of the kept and candidate ones and the heading above each."""
+        blocks = paragraph_spans(text)
+        keep = set()
+        candidates = set()
+        headings: List[Optional[int]] = []
+        heading = None
+        for i, (start, end) in enumerate(blocks):
+            block = text[start:end]
+            if block.startswith("#") and "\n" not in block:
+                heading = i
+            headings.append(heading)
+            if not is_candidate(block):
+                continue
+            candidates.add(i)
+            keep.update(range(max(0, i - self.context), min(len(blocks), i + self.context + 1)))
+            if self.keep_headings and heading is not None:
+                keep.add(heading)
+        return blocks, sorted(keep), candidates, headings
+
+    def select(self, text: str) -> FilterResult:
+        """
+        Select the parts of a post to send to the LLM.
+
+        Args:
+            text: The blog post text
+
+        Returns:
+            FilterResult with the kept paragraphs joined by blank lines
+        """
+        blocks, kept, _, _ = self._select_blocks(text)
+        spans = [blocks[i] for i in kept]
+        kept_text = "\n\n".join(text[start:end] for start, end in spans)
+        return FilterResult(kept_text, spans, estimate_tokens(text), estimate_tokens(kept_text))
+
+    def select_windows(self, text: str) -> List[FilterResult]:
+        """
+        Select the same parts of a post as select, split into windows that can be sent to the LLM separately.
+
+        A window is a run of consecutive kept paragraphs with at least one
+        candidate, led by the kept heading above it, so each candidate keeps the
+        context select keeps for it.
+
+        Args:
+            text: The blog post text
+
+        Returns:
+            FilterResult of each window in document order, nothing is dropped within a window
+        """
+        blocks, kept, candidates, headings = self._select_blocks(text)
+        runs: List[List[int]] = []
+        for i in kept:
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+
+        windows = []
+        kept_set = set(kept)
+        for run in runs:
+            if candidates.isdisjoint(run):
+                # A heading kept for candidates further down, it leads their window
+                continue
+            heading = headings[run[0]]
+            if heading is not None and heading in kept_set and heading not in run:
+                run = [heading] + run
+            spans = [blocks[i] for i in run]
+            window_text = "\n\n".join(text[start:end] for start, end in spans)
+            tokens = estimate_tokens(window_text)
+            windows.append(FilterResult(window_text, spans, tokens, tokens))
+        return windows
+
+
+class PrefilteredExtractor:
+    """Wraps an extractor so only candidate paragraphs are sent to it."""
+
+    def __init__(self, extractor, candidate_filter: CandidateFilter = None):
+        """
+        Initialize the prefiltered extractor.
+
+        Args:
+            extractor: Any object with an extract_accommodations(text) method
+            candidate_filter: Filter to apply, defaults to CandidateFilter()
+        """
+        self.extractor = extractor
+        self.candidate_filter = candidate_filter or CandidateFilter()
+        # The model sees different text with the filter on, so its results are cached apart
+        self.prompt_version = f"{getattr(extractor, 'prompt_version', '1')}+{self.candidate_filter.version}"
+        self.input_tokens = 0
+        self.dropped_tokens = 0
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, str]]:
+        """
+        Extract accommodation properties from the candidate paragraphs of a text.
+
+        Args:
+            text: The blog post text to analyze.
+
+        Returns:
+            List of dictionaries with 'name' and 'location' keys.
+        """
+        result = self.candidate_filter.select(text)
+        self.input_tokens += result.input_tokens
+        self.dropped_tokens += result.dropped_tokens
+        if not result.text:
+            return []
+        return map_mentions(self.extractor.extract_accommodations(result.text), result.to_original)
+
+
+def evaluate_recall(candidate_filter: CandidateFilter, labelled: List[Dict]) -> Dict[str, float]:
+    """
+    Measure the filter against labelled paragraphs.
+
+    Args:
+        candidate_filter: Filter to evaluate
+        labelled: List of {"text": paragraph, "properties": [names mentioned]} entries
+
+    Returns:
+        Dictionary with 'recall' (share of labelled mentions kept) and 'drop_rate'
+        (share of input tokens dropped)
+    """
+    mentions = found = input_tokens = kept_tokens = 0
+    for entry in labelled:
+        result = candidate_filter.select(entry["text"])
+        input_tokens += result.input_tokens
+        kept_tokens += result.kept_tokens
+        for name in entry.get("properties", []):
+            mentions += 1
+            if name.lower() in result.text.lower():
+                found += 1
+    return {
+        "recall": found / mentions if mentions else 1.0,
+        "drop_rate": 1 - kept_tokens / input_tokens if input_tokens else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how many tokens the candidate prefilter drops.")
+    parser.add_argument("files", nargs="*", help="Blog posts to filter")
+    parser.add_argument("--labels", help="JSON file of labelled paragraphs to measure recall against")
+    parser.add_argument("--context", type=int, default=0, help="Neighbouring paragraphs kept around candidates")
+    args = parser.parse_args()
+
+    candidate_filter = CandidateFilter(context=args.context)
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = candidate_filter.select(f.read())
+        share = result.dropped_tokens / result.input_tokens if result.input_tokens else 0.0
+        print(f"{path}: dropped {result.dropped_tokens} of {result.input_tokens} tokens ({share:.0%})")
+
+    if args.labels:
+        with open(args.labels, 'r', encoding='utf-8') as f:
+            scores = evaluate_recall(candidate_filter, json.load(f))
+        print(f"Recall: {scores['recall']:.1%}, tokens dropped: {scores['drop_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
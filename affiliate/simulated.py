@@ -0,0 +1,171 @@
+"""Local stand-in for an LLM backend, with heuristic results and realistic, configurable latency.
+
+Lets batching, caching and concurrency be load-tested without a model:
+  python -m affiliate.cli examples/ --llm-type simulated --pipeline --no-cache
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .accommodation_extractor import PROMPT_VERSION
+from .backend import Backend
+from .prefilter import KEYWORD_PATTERN, STAY_PATTERN, estimate_tokens
+
+
+# Tokens of instructions a real prompt adds to every text
+PROMPT_OVERHEAD_TOKENS = 120
+
+CAPITALISED_WORD = r"[A-Z][\w'’&-]*"
+# Up to three capitalised words before an accommodation word, "Harvey's Point Hotel"
+NAME_BEFORE = re.compile(rf"(?:{CAPITALISED_WORD}[ \t]+){{1,3}}$")
+# Up to two after it, "Hotel Aurora"
+NAME_AFTER = re.compile(rf"(?:[ \t]+{CAPITALISED_WORD}){{1,2}}")
+LOCATION_AFTER = re.compile(rf",?\s+in\s+({CAPITALISED_WORD}(?:,?[ \t]+{CAPITALISED_WORD})?)")
+# Capitalised at the start of a sentence, not part of a name
+LEADING_WORDS = re.compile(r"^(?:(?:The|A|An|At|In|Then|We|Our|My|I|This|That|After|Next)\s+)+")
+
+
+def find_properties(text: str) -> List[Dict[str, Any]]:
+    """
+    Find accommodation names in text with simple heuristics.
+
+    A name is a run of capitalised words around an accommodation word ("Central
+    Hotel", "Hotel Aurora") or a capitalised word after a phrase about staying
+    ("stayed at the Merrion"). The location is taken from a following "in Place".
+
+    Returns:
+        List of dictionaries with 'name', 'location' and 'mentions' keys
+    """
+    found: Dict[str, Tuple[str, str]] = {}
+    spans = []
+    for match in KEYWORD_PATTERN.finditer(text):
+        keyword = match.group()
+        if not keyword[0].isupper():
+            continue
+        start, end = match.span()
+        before = NAME_BEFORE.search(text, max(0, start - 80), start)
+        # Only a singular word starts a name, "Hotel Aurora" but not "Accommodations I'd Recommend"
+        after = NAME_AFTER.match(text, end) if keyword[-1] not in "sS" else None
+        if before:
+            start = before.start()
+        if after:
+            end = after.end()
+        if before or after:
+            spans.append((start, end))
+    for match in STAY_PATTERN.finditer(text):
+        # The pattern ends with the proper noun, unless it starts a name found above
+        name = re.search(rf"{CAPITALISED_WORD}$", match.group())
+        start = match.start() + name.start()
+        if not any(span_start <= start < span_end for span_start, span_end in spans):
+            spans.append((start, match.end()))
+
+    for start, end in sorted(spans):
+        name = LEADING_WORDS.sub("", text[start:end])
+        if not name or KEYWORD_PATTERN.fullmatch(name):
+            continue
+        location = LOCATION_AFTER.match(text, end)
+        key = name.lower()
+        if key not in found or (location and not found[key][1]):
+            found[key] = (name, location.group(1) if location else "")
+
+    properties = []
+    for name, location in found.values():
+        pattern = r"\b" + re.escape(name) + r"(?![\w'’])"
+        mentions = [[m.start(), m.end()] for m in re.finditer(pattern, text)]
+        properties.append({"name": name, "location": location, "mentions": mentions})
+    return properties
+
+
+class SimulatedBackend(Backend):
+    """Stand-in LLM backend: heuristic extraction, delayed like a real model and failing at a set rate."""
+
+    prompt_version = f"{PROMPT_VERSION}+simulated"
+
+    def __init__(self, token_latency: float = 0.02, prefill_latency: float = 0.0005, jitter: float = 0.2,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            token_latency: Seconds per generated token
+            prefill_latency: Seconds per prompt token
+            jitter: Each delay is scaled by a random factor in [1 - jitter, 1 + jitter]
+            failure_rate: Probability that a request fails with a RuntimeError after its delay
+            seed: Seed of the jitter and failures, for repeatable runs
+        """
+        self.token_latency = token_latency
+        self.prefill_latency = prefill_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        # Cumulative token usage, as reported by a real server
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.failures = 0
+
+    def _respond(self, texts: List[str]) -> Tuple[List[List[Dict[str, Any]]], float]:
+        """Return the results of a batch and how long a model would take to generate them."""
+        results = [find_properties(text) for text in texts]
+        prompt_tokens = [PROMPT_OVERHEAD_TOKENS + estimate_tokens(text) for text in texts]
+        completion_tokens = [estimate_tokens(json.dumps(result)) for result in results]
+        self.prompt_tokens += sum(prompt_tokens)
+        self.completion_tokens += sum(completion_tokens)
+        self.requests += 1
+        # Prompts of a batch are prefilled together, then decoded in lockstep until the longest is done
+        delay = sum(prompt_tokens) * self.prefill_latency + max(completion_tokens) * self.token_latency
+        return results, delay * (1 + self.random.uniform(-self.jitter, self.jitter))
+
+    def _check_failure(self) -> None:
+        if self.random.random() < self.failure_rate:
+            self.failures += 1
+            raise RuntimeError("Simulated backend failure")
+
+    def extract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Extract accommodation properties from text, taking as long as a model would.
+
+        Args:
+            text: The blog post text to analyze.
+
+        Returns:
+            List of dictionaries with 'name', 'location' and 'mentions' keys.
+        """
+        return self.extract_batch([text])[0]
+
+    def extract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Extract several texts as one batched model call."""
+        if not texts:
+            return []
+        results, delay = self._respond(texts)
+        time.sleep(delay)
+        self._check_failure()
+        return results
+
+    async def aextract_accommodations(self, text: str) -> List[Dict[str, Any]]:
+        """Extract a text, waiting without holding a thread."""
+        return (await self.aextract_batch([text]))[0]
+
+    async def aextract_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Extract several texts as one batched model call, waiting without holding a thread."""
+        if not texts:
+            return []
+        results, delay = self._respond(texts)
+        await asyncio.sleep(delay)
+        self._check_failure()
+        return results
+
+
+def create_simulated_backend(config) -> SimulatedBackend:
+    """Create the stand-in backend from the 'llm.simulated' settings, latencies in milliseconds."""
+    return SimulatedBackend(
+        token_latency=config.get("llm.simulated.token_latency_ms", 20) / 1000,
+        prefill_latency=config.get("llm.simulated.prefill_latency_ms", 0.5) / 1000,
+        jitter=config.get("llm.simulated.jitter", 0.2),
+        failure_rate=config.get("llm.simulated.failure_rate", 0.0),
+        seed=config.get("llm.simulated.seed"),
+    )
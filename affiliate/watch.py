@@ -0,0 +1,292 @@
+"""Watch a content directory and re-link posts as they are saved."""
+
+import os
+import signal
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .batch import (MARKDOWN_SUFFIXES, BatchSummary, _init_worker, _process_in_worker, build_config, iter_posts,
+                    output_path_for)
+from .manifest import content_hash
+
+
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_POLL_INTERVAL = 1.0
+# How often finished posts are collected while others are still being processed
+RESULT_CHECK_INTERVAL = 0.1
+
+
+def _init_watch_worker(config_file: Optional[str], overrides: Optional[Dict[str, Any]]) -> None:
+    """Set up a worker that leaves Ctrl+C to the watcher, which shuts the pool down cleanly."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(config_file, overrides)
+
+
+class PollingSource:
+    """Reports changed files by comparing modification times and sizes between directory scans."""
+
+    name = "polling"
+
+    def __init__(self, directory: str, interval: float = DEFAULT_POLL_INTERVAL):
+        """
+        Initialize the source, taking the current state of the directory as unchanged.
+
+        Args:
+            directory: Directory to watch, including subdirectories
+            interval: Seconds between scans
+        """
+        self.directory = Path(directory)
+        self.interval = interval
+        self.stats = self._scan()
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        stats = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def poll(self, timeout: float) -> List[Path]:
+        """Wait up to timeout seconds and return the files created or modified since the last scan."""
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0.0))
+        self.next_scan = time.monotonic() + self.interval
+        stats = self._scan()
+        changed = [path for path, stat in stats.items() if self.stats.get(path) != stat]
+        self.stats = stats
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifySource:
+    """Reports files closed after writing or moved into the directory, using Linux inotify."""
+
+    name = "inotify"
+
+    def __init__(self, directory: str):
+        """
+        Start watching the directory and its subdirectories.
+
+        Args:
+            directory: Directory to watch
+
+        Raises:
+            ImportError: If inotify_simple is not installed
+            OSError: If inotify is not available or the watch limit is reached
+        """
+        from inotify_simple import INotify, flags
+        self.flags = flags
+        self.inotify = INotify()
+        self.mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+        self.directories: Dict[int, Path] = {}
+        for root, _, _ in os.walk(directory):
+            self._add(Path(root))
+
+    def _add(self, directory: Path) -> None:
+        self.directories[self.inotify.add_watch(str(directory), self.mask)] = directory
+
+    def poll(self, timeout: float) -> List[Path]:
+        """Wait up to timeout seconds and return the files written since the last call."""
+        changed = []
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            directory = self.directories.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = directory / event.name
+            if event.mask & self.flags.ISDIR:
+                # A new or moved-in directory is watched too, files already in it count as changed
+                for root, _, files in os.walk(path):
+                    self._add(Path(root))
+                    changed.extend(Path(root) / name for name in files)
+            elif event.mask & (self.flags.CLOSE_WRITE | self.flags.MOVED_TO):
+                # Files are reported once written, editors that save by renaming show up as MOVED_TO
+                changed.append(path)
+        return changed
+
+    def close(self) -> None:
+        self.inotify.close()
+
+
+def open_source(directory: str, polling: bool = False, interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    Watch a directory with inotify, falling back to polling where it is not available.
+
+    Args:
+        directory: Directory to watch
+        polling: Always poll, for network file systems where inotify sees no remote changes
+        interval: Seconds between scans when polling
+
+    Returns:
+        InotifySource or PollingSource
+    """
+    if not polling:
+        try:
+            return InotifySource(directory)
+        except (ImportError, OSError):
+            pass
+    return PollingSource(directory, interval)
+
+
+class Debouncer:
+    """Holds a path back until no change to it has been seen for `delay` seconds."""
+
+    def __init__(self, delay: float = DEFAULT_DEBOUNCE):
+        self.delay = delay
+        self.pending: Dict[Path, float] = {}
+
+    def add(self, path: Path, now: float) -> None:
+        """Record a change, pushing the path's deadline back."""
+        self.pending[path] = now + self.delay
+
+    def due(self, now: float) -> List[Path]:
+        """Remove and return the paths that have been quiet for the delay."""
+        ready = [path for path, deadline in self.pending.items() if deadline <= now]
+        for path in ready:
+            del self.pending[path]
+        return ready
+
+    def timeout(self, now: float, default: float) -> float:
+        """Seconds until the next path is due, at most default."""
+        return max(0.0, min([default] + [deadline - now for deadline in self.pending.values()]))
+
+
+class PostWatcher:
+    """
+    Re-links the posts of a directory when they are saved.
+
+    Changes are debounced, posts whose content is unchanged since they were last
+    linked are skipped, and the rest are processed in a process pool. At most one
+    post per worker is handed to the pool at a time, so the others wait here and a
+    post saved again while it is being processed is picked up once it finishes.
+    A slow extraction only occupies its own worker.
+    """
+
+    def __init__(self, directory: str, config_file: Optional[str] = None,
+                 overrides: Optional[Dict[str, Any]] = None, workers: Optional[int] = None,
+                 output_dir: Optional[str] = None, source=None, manifest=None, metrics_writer=None):
+        """
+        Initialize the watcher and queue the posts that have no up-to-date output.
+
+        Args:
+            directory: Directory of markdown posts
+            config_file: Path to YAML config file, loaded once per worker
+            overrides: Configuration overrides, see build_config
+            workers: Number of worker processes (default: CPU count)
+            output_dir: Output directory (default: same as each input)
+            source: Change source (default: open_source with the 'watch' config)
+            manifest: If given, a SiteManifest updated and saved after every linked post
+            metrics_writer: If given, per-post stage timings and counters are written to it
+        """
+        config = build_config(config_file, overrides)
+        self.config = config
+        self.output_dir = output_dir
+        self.suffix = config.get("output.suffix", "_linked")
+        self.source = source or open_source(directory, config.get("watch.polling", False),
+                                            config.get("watch.poll_interval", DEFAULT_POLL_INTERVAL))
+        self.debouncer = Debouncer(config.get("watch.debounce", DEFAULT_DEBOUNCE))
+        self.manifest = manifest
+        self.metrics_writer = metrics_writer
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_watch_worker,
+                                            initargs=(config_file, overrides))
+        self.summary = BatchSummary()
+        self.start = time.perf_counter()
+        # Content hash of each post as last linked
+        self.hashes: Dict[Path, str] = {}
+        # Posts waiting for a free worker, in the order they became due
+        self.ready: Dict[Path, None] = {}
+        self.in_flight: Dict[Path, Tuple[Future, str]] = {}
+
+        recorded = {os.path.abspath(manifest.resolve(entry["source"])): entry["sha256"]
+                    for entry in manifest.posts.values()} if manifest is not None else {}
+        for path in iter_posts(directory, output_suffix=self.suffix):
+            output_path = output_path_for(path, config, output_dir)
+            if os.path.abspath(path) in recorded:
+                self.hashes[path] = recorded[os.path.abspath(path)]
+            elif output_path.exists() and output_path.stat().st_mtime >= path.stat().st_mtime:
+                self.hashes[path] = content_hash(path.read_text(encoding='utf-8'))
+            else:
+                self.ready[path] = None
+
+    def is_post(self, path: Path) -> bool:
+        """Return True for markdown posts, not for generated outputs or temporary files."""
+        return path.suffix.lower() in MARKDOWN_SUFFIXES and not path.stem.endswith(self.suffix)
+
+    def step(self, timeout: float = DEFAULT_POLL_INTERVAL) -> List[Dict[str, Any]]:
+        """
+        Wait for changes up to timeout seconds, hand due posts to the pool and collect finished ones.
+
+        Returns:
+            Results of the posts finished since the last call, as returned by _process_in_worker
+        """
+        if self.in_flight:
+            timeout = min(timeout, RESULT_CHECK_INTERVAL)
+        for path in self.source.poll(self.debouncer.timeout(time.monotonic(), timeout)):
+            if self.is_post(path):
+                self.debouncer.add(path, time.monotonic())
+        for path in self.debouncer.due(time.monotonic()):
+            self.ready[path] = None
+        finished = self._collect()
+        self._submit()
+        return finished
+
+    def _submit(self) -> None:
+        for path in list(self.ready):
+            if len(self.in_flight) >= self.workers:
+                break
+            if path in self.in_flight:
+                continue
+            del self.ready[path]
+            try:
+                digest = content_hash(path.read_text(encoding='utf-8'))
+            except FileNotFoundError:
+                continue
+            if self.hashes.get(path) == digest:
+                self.summary.unchanged += 1
+                continue
+            future = self.executor.submit(_process_in_worker, path, self.output_dir,
+                                          self.metrics_writer is not None, self.manifest is not None)
+            self.in_flight[path] = (future, digest)
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        finished = []
+        for path, (future, digest) in list(self.in_flight.items()):
+            if not future.done():
+                continue
+            del self.in_flight[path]
+            if future.cancelled():
+                continue
+            result = future.result()
+            self.summary.record(result)
+            finished.append(result)
+            if result["error"]:
+                continue
+            self.hashes[path] = digest
+            if self.metrics_writer is not None:
+                self.metrics_writer.write_post(path, result["metrics"])
+            if self.manifest is not None:
+                self.manifest.record(result["manifest"])
+                self.manifest.save()
+        return finished
+
+    def close(self) -> BatchSummary:
+        """Stop watching, cancel posts not yet started and return the summary of the session."""
+        self.source.close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        # Posts that were already being processed are finished, keep their results
+        self._collect()
+        self.summary.elapsed = time.perf_counter() - self.start
+        return self.summary
@@ -0,0 +1,114 @@
+"""Load-test extraction strategies offline against the latency-simulating stand-in backend.
+
+Extracts a synthetic corpus with the simulated backend (affiliate/simulated.py)
+one post at a time, in batches, with concurrent async requests, through the
+asyncio pipeline, and from a warm extraction cache, and reports posts/sec for
+each. No model or server is needed.
+
+Usage:
+  python benchmarks/bench_backends.py
+  python benchmarks/bench_backends.py --posts 200 --token-latency-ms 20 --concurrency 16 --failure-rate 0.01
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from affiliate.batch import build_config
+from affiliate.cache import CachedExtractor, ExtractionCache
+from affiliate.pipeline import run_pipeline_async
+from affiliate.simulated import SimulatedBackend
+from corpus import generate_corpus
+
+
+def timed(func: Callable[[], int]) -> tuple:
+    start = time.perf_counter()
+    failures = func()
+    return time.perf_counter() - start, failures
+
+
+def sequential(backend: SimulatedBackend, texts: List[str]) -> int:
+    failures = 0
+    for text in texts:
+        try:
+            backend.extract_accommodations(text)
+        except RuntimeError:
+            failures += 1
+    return failures
+
+
+def batched(backend: SimulatedBackend, texts: List[str], batch_size: int) -> int:
+    failures = 0
+    for i in range(0, len(texts), batch_size):
+        try:
+            backend.extract_batch(texts[i:i + batch_size])
+        except RuntimeError:
+            failures += len(texts[i:i + batch_size])
+    return failures
+
+
+def concurrent(backend: SimulatedBackend, texts: List[str], concurrency: int) -> int:
+    async def run() -> int:
+        limit = asyncio.Semaphore(concurrency)
+
+        async def extract(text: str) -> bool:
+            async with limit:
+                try:
+                    await backend.aextract_accommodations(text)
+                    return False
+                except RuntimeError:
+                    return True
+
+        return sum(await asyncio.gather(*(extract(text) for text in texts)))
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction strategies against the simulated backend.")
+    parser.add_argument("--posts", type=int, default=50)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    parser.add_argument("--token-latency-ms", type=float, default=1)
+    parser.add_argument("--prefill-latency-ms", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    def backend() -> SimulatedBackend:
+        return SimulatedBackend(args.token_latency_ms / 1000, args.prefill_latency_ms / 1000, args.jitter,
+                                args.failure_rate, seed=0)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = generate_corpus(tmpdir, posts=args.posts, paragraphs=args.paragraphs)
+        texts = [path.read_text(encoding="utf-8") for path in paths]
+        config = build_config(overrides={"cache.enabled": False})
+
+        runs = [
+            ("sequential", lambda: sequential(backend(), texts)),
+            (f"batched x{args.batch_size}", lambda: batched(backend(), texts, args.batch_size)),
+            (f"async x{args.concurrency}", lambda: concurrent(backend(), texts, args.concurrency)),
+            (f"pipeline x{args.concurrency}", lambda: len(asyncio.run(run_pipeline_async(
+                paths, config, extract_concurrency=args.concurrency, extractor_factory=backend)).failures)),
+        ]
+        cache = ExtractionCache(str(Path(tmpdir) / "cache.sqlite"))
+        cached = CachedExtractor(backend(), cache, model="simulated")
+        sequential(cached, texts)
+        runs.append(("warm cache", lambda: sequential(cached, texts)))
+
+        print(f"{'strategy':>14} {'seconds':>8} {'posts/s':>8} {'failed':>7}")
+        for name, run in runs:
+            elapsed, failures = timed(run)
+            print(f"{name:>14} {elapsed:>8.2f} {len(texts) / elapsed:>8.1f} {failures:>7}")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
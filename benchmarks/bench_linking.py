@@ -0,0 +1,76 @@
+"""Benchmark the single-pass linker against the original per-property regex loop.
+
+Usage:
+  python benchmarks/bench_linking.py
+  python benchmarks/bench_linking.py --properties 10 40 80 160 --paragraphs 400
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+from typing import Dict, List
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from affiliate.link import LinkProcessor
+from corpus import generate_post
+
+
+def legacy_process_markdown(processor: LinkProcessor, markdown_content: str,
+                            accommodations: List[Dict[str, str]]) -> str:
+    """The original implementation: one full re.sub over the document per property."""
+    result = markdown_content
+    processed_properties = set()
+    for prop in accommodations:
+        prop_name = prop.get("name", "")
+        prop_location = prop.get("location", "")
+        if prop_name.lower() in processed_properties:
+            continue
+        url = processor.generate_affiliate_url(prop_name, prop_location)
+        pattern = r'\b' + re.escape(prop_name) + r'\b'
+        count = 0
+
+        def replace_func(match_obj):
+            nonlocal count
+            if count == 0:
+                count += 1
+                return f"[{match_obj.group()}]({url})"
+            return match_obj.group()
+
+        result = re.sub(pattern, replace_func, result, flags=re.IGNORECASE)
+        processed_properties.add(prop_name.lower())
+    return result
+
+
+def linked_urls(markdown_content: str) -> List[str]:
+    return sorted(re.findall(r"\]\((https://booking\.com/[^)]+)\)", markdown_content))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LinkProcessor.process_markdown scaling.")
+    parser.add_argument("--properties", type=int, nargs="+", default=[5, 20, 80, 160])
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    processor = LinkProcessor("12345")
+    print(f"{'properties':>10} {'doc chars':>10} {'legacy ms':>10} {'single ms':>10} {'speedup':>8}")
+    for num_properties in args.properties:
+        post, properties = generate_post(seed=0, paragraphs=args.paragraphs, properties=num_properties)
+        # Name variants may be linked at an earlier mention, but the same properties are linked
+        assert linked_urls(processor.process_markdown(post, properties)) == \
+            linked_urls(legacy_process_markdown(processor, post, properties))
+
+        legacy = min(timeit.repeat(lambda: legacy_process_markdown(processor, post, properties),
+                                   number=1, repeat=args.repeat))
+        single = min(timeit.repeat(lambda: processor.process_markdown(post, properties),
+                                   number=1, repeat=args.repeat))
+        print(f"{num_properties:>10} {len(post):>10} {legacy * 1000:>10.2f} {single * 1000:>10.2f} "
+              f"{legacy / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare the fp32, bf16 and int8 CPU backends of notebooks/llm_extractor.py.
+
+Each precision runs in its own subprocess so peak RSS is measured separately.
+For every precision the example posts are extracted and the tokens/sec,
+peak RSS and agreement with the fp32 results (Jaccard similarity of the
+extracted property names, averaged over posts) are reported.
+
+Needs torch, transformers and langchain installed.
+
+Usage:
+  python benchmarks/bench_quantization.py
+  python benchmarks/bench_quantization.py --model google/gemma-3-4b-it --threads 8 --output quant.json
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).parent.parent
+PRECISIONS = ["fp32", "bf16", "int8"]
+
+
+def run_precision(args: argparse.Namespace) -> Dict[str, Any]:
+    """Load the pipeline in one precision and extract every post, in this process."""
+    sys.path.insert(0, str(REPO_ROOT / "notebooks"))
+    from llm_extractor import build_pipeline, extract_accommodations_batch
+
+    start = time.perf_counter()
+    llm = build_pipeline(model_name=args.model, max_new_tokens=args.max_tokens, batch_size=args.batch_size,
+                         precision=args.child, threads=args.threads)
+    load_s = time.perf_counter() - start
+
+    texts = [Path(path).read_text(encoding="utf-8") for path in args.posts]
+    usage: List[Dict[str, int]] = []
+    start = time.perf_counter()
+    results = extract_accommodations_batch(llm, texts, usage=usage)
+    extract_s = time.perf_counter() - start
+
+    completion_tokens = sum(u["completion_tokens"] for u in usage)
+    return {
+        "precision": args.child,
+        "load_s": load_s,
+        "extract_s": extract_s,
+        "prompt_tokens": sum(u["prompt_tokens"] for u in usage),
+        "completion_tokens": completion_tokens,
+        "tokens_per_s": completion_tokens / extract_s if extract_s else 0.0,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "names": [sorted({item["name"].strip().lower() for item in result}) for result in results],
+    }
+
+
+def agreement(names: List[List[str]], reference: List[List[str]]) -> float:
+    """Mean Jaccard similarity of the extracted names per post."""
+    scores = []
+    for found, expected in zip(names, reference):
+        union = set(found) | set(expected)
+        scores.append(len(set(found) & set(expected)) / len(union) if union else 1.0)
+    return sum(scores) / len(scores) if scores else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized CPU extraction backends.")
+    parser.add_argument("--model", default="google/gemma-3-4b-it", help="Hugging Face model name")
+    parser.add_argument("--posts", nargs="+", default=[str(p) for p in sorted((REPO_ROOT / "examples").glob("*.md"))
+                                                      if not p.stem.endswith("_linked")])
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=PRECISIONS)
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--output", "-o", default=None, help="Write the results as JSON")
+    parser.add_argument("--child", choices=PRECISIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_precision(args)))
+        return
+
+    results = []
+    for precision in args.precisions:
+        command = [sys.executable, __file__, "--child", precision, "--model", args.model,
+                   "--max-tokens", str(args.max_tokens), "--batch-size", str(args.batch_size), "--posts", *args.posts]
+        if args.threads:
+            command += ["--threads", str(args.threads)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    reference = next((r["names"] for r in results if r["precision"] == "fp32"), None)
+    print(f"{'precision':>9} {'load s':>8} {'tokens/s':>9} {'peak RSS MB':>12} {'agreement':>10}")
+    for result in results:
+        result["agreement"] = agreement(result["names"], reference) if reference is not None else None
+        shown = f"{result['agreement']:.1%}" if result["agreement"] is not None else "n/a"
+        print(f"{result['precision']:>9} {result['load_s']:>8.1f} {result['tokens_per_s']:>9.1f} "
+              f"{result['peak_rss_mb']:>12.0f} {shown:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"model": args.model, "posts": args.posts, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
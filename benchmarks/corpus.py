@@ -0,0 +1,136 @@
+"""Seeded generator of synthetic markdown travel posts for benchmarks.
+
+Usage:
+  python benchmarks/corpus.py /tmp/corpus --posts 500 --paragraphs 40 --properties 20
+"""
+
+import argparse
+import random
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+WORDS = (
+    "the a walk along coast cliffs town harbour morning evening dinner pub music "
+    "drive road view lake castle park trail village beach breakfast rain sunshine "
+    "we our after before through with from over views local friendly wild quiet"
+).split()
+NAME_WORDS = (
+    "Central Harbour Abbey Castle Lough Atlantic Seaview Bay Glen Cliff Rose Oak "
+    "Mountain Riverside Kings Queens Old Mill Station Grand Park Ocean Heather"
+).split()
+SUFFIXES = ["Hotel", "B&B", "Guesthouse", "Lodge", "Inn", "Hostel", "Apartments"]
+PLACES = ["Donegal, Ireland", "Galway, Ireland", "Kerry, Ireland", "Sligo, Ireland", "Mayo, Ireland"]
+
+
+def make_properties(rng: random.Random, count: int) -> List[Dict[str, str]]:
+    """Create `count` distinct property names with locations."""
+    properties = []
+    names = set()
+    for i in range(count):
+        name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {rng.choice(SUFFIXES)}"
+        if name.lower() in names:
+            # Numbered names are always unique
+            name = f"{rng.choice(NAME_WORDS)} {i} {rng.choice(SUFFIXES)}"
+        names.add(name.lower())
+        properties.append({"name": name, "location": rng.choice(PLACES)})
+    return properties
+
+
+def generate_post(seed: int = 0, paragraphs: int = 20, words_per_paragraph: int = 60, properties: int = 5,
+                  mentions_per_property: float = 3.0, code_blocks: int = 0,
+                  existing_links: int = 0) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Generate one synthetic markdown travel post.
+
+    Args:
+        seed: Random seed, the same arguments and seed always give the same post
+        paragraphs: Number of body paragraphs (post length)
+        words_per_paragraph: Words in each paragraph
+        properties: Number of distinct properties mentioned
+        mentions_per_property: Average number of times each property is mentioned
+        code_blocks: Number of fenced code blocks, these also contain property names
+        existing_links: Number of existing markdown links in the text
+
+    Returns:
+        Tuple of the markdown post and the properties it mentions
+    """
+    rng = random.Random(seed)
+    props = make_properties(rng, properties)
+    mentions = [p["name"] for p in props for _ in range(max(1, round(rng.expovariate(1 / mentions_per_property))))]
+    rng.shuffle(mentions)
+
+    blocks = [f"# A Trip Around {rng.choice(PLACES).split(',')[0]}"]
+    per_paragraph = len(mentions) / paragraphs if paragraphs else 0
+    carried = 0.0
+    for i in range(paragraphs):
+        if i and i % 5 == 0:
+            blocks.append(f"## {rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(WORDS)}")
+        words = [rng.choice(WORDS) for _ in range(words_per_paragraph)]
+        carried += per_paragraph
+        while carried >= 1 and mentions:
+            words.insert(rng.randrange(len(words) + 1), mentions.pop())
+            carried -= 1
+        words[0] = words[0][:1].upper() + words[0][1:]
+        blocks.append(" ".join(words) + ".")
+    # Any mentions left over by rounding go in the last paragraph
+    if mentions and paragraphs:
+        blocks[-1] += " " + " ".join(mentions)
+
+    body_indexes = list(range(1, len(blocks)))
+    for _ in range(code_blocks):
+        name = rng.choice(props)["name"] if props else "Example Hotel"
+        blocks.insert(rng.choice(body_indexes), f"```\nbook(\"{name}\")\n```")
+    for _ in range(existing_links):
+        i = rng.choice(body_indexes)
+        blocks[i] += f" See [{rng.choice(WORDS)} guide](https://example.com/{rng.randrange(10000)})."
+
+    return "\n\n".join(blocks) + "\n", props
+
+
+def generate_corpus(directory: str, posts: int = 100, seed: int = 0, **post_options) -> List[Path]:
+    """
+    Write `posts` synthetic posts into a directory.
+
+    Args:
+        directory: Output directory, created if missing
+        posts: Number of posts
+        seed: Base random seed, post i uses seed + i
+        post_options: Passed on to generate_post
+
+    Returns:
+        Paths of the written posts
+    """
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(posts):
+        post, _ = generate_post(seed=seed + i, **post_options)
+        path = out / f"post_{i:05d}.md"
+        path.write_text(post, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic markdown travel blog corpus.")
+    parser.add_argument("directory", help="Output directory")
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--words-per-paragraph", type=int, default=60)
+    parser.add_argument("--properties", type=int, default=5)
+    parser.add_argument("--mentions-per-property", type=float, default=3.0)
+    parser.add_argument("--code-blocks", type=int, default=0)
+    parser.add_argument("--existing-links", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.directory, args.posts, args.seed, paragraphs=args.paragraphs,
+                            words_per_paragraph=args.words_per_paragraph, properties=args.properties,
+                            mentions_per_property=args.mentions_per_property, code_blocks=args.code_blocks,
+                            existing_links=args.existing_links)
+    print(f"Wrote {len(paths)} posts to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Benchmark suite for the affiliate link tool.
+
+Times link insertion, affiliate URL generation, configuration loading and the
+full CLI pipeline with the mock extractor on a seeded synthetic corpus. Records
+peak memory and writes machine-readable JSON so results can be compared between
+releases.
+
+Usage:
+  python benchmarks/run_benchmarks.py
+  python benchmarks/run_benchmarks.py --output results.json --quick
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add repo root to path
+REPO_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from affiliate.config import Config
+from affiliate.link import LinkProcessor
+from corpus import generate_corpus, generate_post
+
+
+def measure(name: str, func: Callable[[], Any], repeat: int = 5, number: int = 1, **params) -> Dict[str, Any]:
+    """
+    Time a function and record its peak traced memory.
+
+    Args:
+        name: Benchmark name
+        func: Function to benchmark
+        repeat: Number of timed rounds
+        number: Calls per round
+        params: Benchmark parameters, stored with the result
+
+    Returns:
+        Result dictionary with per-call timings in seconds and peak memory in bytes
+    """
+    func()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "name": name,
+        "params": params,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "max_s": max(timings),
+        "peak_memory_bytes": peak,
+    }
+    print(f"{name:<32} {json.dumps(params):<70} median {result['median_s'] * 1000:9.3f}ms  "
+          f"peak {peak / 1024:9.1f}KiB")
+    return result
+
+
+def bench_process_markdown(quick: bool) -> List[Dict[str, Any]]:
+    processor = LinkProcessor("12345")
+    results = []
+    lengths = [20, 200] if quick else [20, 200, 1000]
+    property_counts = [5, 80] if quick else [5, 20, 80, 160]
+    for paragraphs in lengths:
+        for properties in property_counts:
+            post, props = generate_post(seed=1, paragraphs=paragraphs, properties=properties,
+                                        mentions_per_property=3, code_blocks=paragraphs // 20,
+                                        existing_links=paragraphs // 10)
+            results.append(measure("link.process_markdown", lambda: processor.process_markdown(post, props),
+                                   paragraphs=paragraphs, properties=properties, chars=len(post)))
+    return results
+
+
+def bench_generate_affiliate_url(quick: bool) -> List[Dict[str, Any]]:
+    processor = LinkProcessor("12345")
+    _, props = generate_post(seed=2, paragraphs=1, properties=100)
+
+    def run():
+        for prop in props:
+            processor.generate_affiliate_url(prop["name"], prop["location"])
+
+    return [measure("link.generate_affiliate_url", run, number=10, urls=len(props))]
+
+
+def bench_config_loading(quick: bool) -> List[Dict[str, Any]]:
+    results = [measure("config.load_defaults", lambda: Config(), number=100)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_file = Path(tmpdir) / "config.yaml"
+        config_file.write_text("affiliate:\n  id: 54321\nllm:\n  model: mock\n  type: mock\n")
+        results.append(measure("config.load_yaml", lambda: Config(str(config_file)), number=100))
+    return results
+
+
+def bench_cli_pipeline(quick: bool) -> List[Dict[str, Any]]:
+    from affiliate.cli import main
+
+    posts = 20 if quick else 200
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = generate_corpus(tmpdir, posts=posts, paragraphs=30, properties=5)
+
+        def run_single():
+            old_argv = sys.argv
+            sys.argv = ["cli.py", str(paths[0]), "--no-cache"]
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main()
+            finally:
+                sys.argv = old_argv
+
+        results.append(measure("cli.single_post", run_single, number=5))
+
+        def run_cold_start():
+            subprocess.run([sys.executable, "-m", "affiliate.cli", str(paths[0]), "--no-cache"],
+                           cwd=REPO_ROOT, check=True, capture_output=True)
+
+        results.append(measure("cli.cold_start", run_cold_start, repeat=3))
+
+        def run_batch():
+            subprocess.run([sys.executable, "-m", "affiliate.cli", tmpdir, "--no-cache", "--workers", "2"],
+                           cwd=REPO_ROOT, check=True, capture_output=True)
+
+        result = measure("cli.batch", run_batch, repeat=3, posts=posts, workers=2)
+        result["posts_per_s"] = posts / result["median_s"]
+        results.append(result)
+    return results
+
+
+BENCHMARKS = {
+    "process_markdown": bench_process_markdown,
+    "generate_affiliate_url": bench_generate_affiliate_url,
+    "config": bench_config_loading,
+    "cli": bench_cli_pipeline,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the affiliate link tool benchmark suite.")
+    parser.add_argument("--output", "-o", default="benchmark_results.json", help="Path of the JSON results file")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs for a fast smoke run")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.only or BENCHMARKS:
+        results.extend(BENCHMARKS[name](args.quick))
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""extraction_helpers.py
+
+Text handling of `llm_extractor.py` that needs no model: splitting long texts
+into overlapping chunks and merging their results, grouping prompts into
+length buckets, estimating generation budgets and parsing the streamed JSON
+output. Importing it does not import torch, transformers or LangChain.
+"""
+
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from affiliate.markdown import paragraph_spans
+from affiliate.prefilter import KEYWORD_PATTERN, STAY_PATTERN
+
+
+DEFAULT_CHUNK_TOKENS = 1024
+DEFAULT_CHUNK_OVERLAP = 64
+DEFAULT_BATCH_SIZE = 4
+# Padded tokens (prompt + generation budget) per batch when bucketing by length
+DEFAULT_BATCH_TOKENS = 8192
+# Generation budget per request: the array brackets plus one JSON object per candidate mention
+MIN_NEW_TOKENS = 24
+TOKENS_PER_ACCOMMODATION = 40
+
+
+def estimate_new_tokens(text: str, max_new_tokens: int) -> int:
+    """Estimate how many tokens the JSON output for `text` needs.
+
+    Every accommodation keyword ("hotel", "B&B", ...) and stay phrase ("stayed
+    at the Merrion") may be one JSON object in the output, so the estimate is
+    `MIN_NEW_TOKENS` plus `TOKENS_PER_ACCOMMODATION` per match, capped at
+    `max_new_tokens`. An underestimate is not fatal, a truncated output is
+    continued (see `is_truncated`).
+    """
+    candidates = sum(1 for _ in KEYWORD_PATTERN.finditer(text)) + sum(1 for _ in STAY_PATTERN.finditer(text))
+    return min(MIN_NEW_TOKENS + TOKENS_PER_ACCOMMODATION * candidates, max_new_tokens)
+
+
+def is_truncated(raw: str) -> bool:
+    """Return True if the output opened its JSON array (or object) but did not close it."""
+    stream = JsonArrayStream()
+    stream.feed(raw)
+    return stream.started and not stream.done
+
+
+def new_usage() -> Dict[str, int]:
+    """Return an empty per-text token ledger.
+
+    prompt_tokens and completion_tokens count every request, including
+    continuations, whose prompts repeat the output so far. retries counts the
+    continuations and max_new_tokens the generation budget granted in total.
+    """
+    return {"prompt_tokens": 0, "completion_tokens": 0, "retries": 0, "max_new_tokens": 0}
+
+
+def bucket_by_length(lengths: List[int], max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                     max_batch_size: int = DEFAULT_BATCH_SIZE) -> List[List[int]]:
+    """Group prompt indices into batches of similar token length.
+
+    Prompts are sorted longest first and taken in order, so a batch is padded to
+    the length of its first prompt. A batch is closed when it reaches
+    `max_batch_size` prompts or when one more would take its padded size over
+    `max_batch_tokens`. A prompt longer than the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * lengths[current[0]] > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_into_chunks(text: str, count_tokens: Callable[[str], int], max_tokens: int = DEFAULT_CHUNK_TOKENS,
+                      overlap_tokens: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping chunks of at most `max_tokens` tokens.
+
+    Chunks break on paragraph boundaries. Paragraphs longer than the budget are
+    broken on sentence boundaries instead. The trailing paragraphs/sentences of
+    each chunk, up to `overlap_tokens`, are repeated at the start of the next
+    chunk so a mention near a boundary keeps its context.
+    """
+    return ["\n\n".join(text[start:end] for start, end in chunk)
+            for chunk in split_into_chunk_spans(text, count_tokens, max_tokens, overlap_tokens)]
+
+
+def split_into_chunk_spans(text: str, count_tokens: Callable[[str], int], max_tokens: int = DEFAULT_CHUNK_TOKENS,
+                           overlap_tokens: int = DEFAULT_CHUNK_OVERLAP) -> List[List[Tuple[int, int]]]:
+    """Like `split_into_chunks`, but return each chunk as the (start, end) offsets of its units in text."""
+    units = []
+    for start, end in paragraph_spans(text):
+        size = count_tokens(text[start:end])
+        if size <= max_tokens:
+            units.append(((start, end), size))
+            continue
+        for match in re.finditer(r"\S.*?(?:[.!?](?=\s)|$)", text[start:end], flags=re.DOTALL):
+            # A single sentence over budget is sent on its own rather than cut mid-sentence
+            units.append(((start + match.start(), start + match.end()), count_tokens(match.group())))
+
+    chunks = []
+    current: List[tuple] = []
+    current_size = 0
+    for unit, size in units:
+        if current and current_size + size > max_tokens:
+            chunks.append([u for u, _ in current])
+            # Carry the tail of the previous chunk over as overlap
+            overlap: List[tuple] = []
+            overlap_size = 0
+            for prev, prev_size in reversed(current):
+                if overlap_size + prev_size > overlap_tokens or overlap_size + prev_size + size > max_tokens:
+                    break
+                overlap.insert(0, (prev, prev_size))
+                overlap_size += prev_size
+            current, current_size = overlap, overlap_size
+        current.append((unit, size))
+        current_size += size
+    if current:
+        chunks.append([u for u, _ in current])
+    return chunks
+
+
+def locate_mentions(text: str, units: List[Tuple[int, int]], name: str) -> List[List[int]]:
+    """Find the [start, end] offsets of `name` in the given units of text, case-insensitive and word-bounded."""
+    pattern = re.compile(r"\b" + re.escape(name.strip()) + r"\b", flags=re.IGNORECASE)
+    return [[match.start(), match.end()] for start, end in units for match in pattern.finditer(text, start, end)]
+
+
+def _normalise(value: Any) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def merge_accommodations(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge per-chunk results, de-duplicating by name and location.
+
+    Entries with the same name are merged when their place and country agree or
+    one of them is empty, the merged entry keeps the most complete location.
+    """
+    merged: List[Dict[str, Any]] = []
+    for item in results:
+        if not isinstance(item, dict) or not _normalise(item.get("name")):
+            continue
+        for existing in merged:
+            if _normalise(existing.get("name")) != _normalise(item.get("name")):
+                continue
+            if all(not _normalise(existing.get(f)) or not _normalise(item.get(f))
+                   or _normalise(existing.get(f)) == _normalise(item.get(f)) for f in ("place", "country")):
+                for field in ("place", "country"):
+                    if not existing.get(field) and item.get(field):
+                        existing[field] = item[field]
+                if item.get("mentions"):
+                    # Overlapping chunks report the same mention twice
+                    mentions = {tuple(m) for m in existing.get("mentions", []) + item["mentions"]}
+                    existing["mentions"] = [list(m) for m in sorted(mentions)]
+                break
+        else:
+            merged.append(dict(item))
+    return merged
+
+
+class JsonArrayStream:
+    """Incrementally parse a JSON array of objects from streamed model output.
+
+    Text is fed in as it is generated. Each object in the top-level array is
+    returned as soon as its closing brace arrives and `done` is set once the
+    array closes, so generation can stop there. Leading text such as a code
+    fence is skipped, a bare top-level object is treated as a one-item array.
+    Brackets in prose before the JSON are skipped too.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_item = False
+        self.current: List[str] = []
+        self.objects: List[Any] = []
+        self._single_object = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume the next piece of text and return any objects completed by it."""
+        completed = []
+        for char in chunk:
+            if self.done:
+                break
+            if self.expect_item and not char.isspace():
+                self.expect_item = False
+                # "[" must open an array of objects and "{" an object with a key,
+                # otherwise it was prose ("Here is {the} list: [...]"), keep looking
+                if char not in ('"}' if self._single_object else "{]"):
+                    self.started = self._single_object = False
+                    self.current = []
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                    self.depth = 1
+                    self.expect_item = True
+                elif char == "{":
+                    self.started = self._single_object = True
+                    self.depth = 1
+                    self.expect_item = True
+                    self.current = [char]
+                continue
+            if self.depth > 1 or self._single_object or char == "{":
+                self.current.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "[{":
+                self.depth += 1
+            elif char in "]}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+                    if self._single_object:
+                        completed.extend(self._parse_current())
+                elif self.depth == 1 and char == "}" and not self._single_object:
+                    completed.extend(self._parse_current())
+        self.objects.extend(completed)
+        return completed
+
+    def _parse_current(self) -> List[Any]:
+        candidate = "".join(self.current)
+        self.current = []
+        try:
+            return [json.loads(candidate)]
+        except ValueError:
+            # Skip a malformed object rather than losing the rest of the array
+            return []
+
+
+def extract_json_from_text(text: str):
+    """Extract the JSON array (or object) from model output and parse it.
+
+    Uses a single linear scan with `JsonArrayStream`. If that finds no array
+    the text between the first '[' and last ']' is tried as a last resort.
+    """
+    stream = JsonArrayStream()
+    stream.feed(text)
+    if stream.started:
+        return stream.objects
+
+    start = text.find("[")
+    end = text.rfind("]")
+    if start != -1 and end != -1 and end > start:
+        candidate = text[start:end + 1]
+        return json.loads(candidate)
+
+    raise ValueError("No JSON found in model output")
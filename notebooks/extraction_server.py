@@ -0,0 +1,201 @@
+"""extraction_server.py
+
+Long-lived local extraction server. The Hugging Face pipeline is loaded once and
+kept in memory, clients send texts over a localhost TCP or Unix socket and
+requests that arrive close together are combined into one micro-batch.
+
+Usage examples:
+  python extraction_server.py
+  python extraction_server.py --listen 127.0.0.1:8765 --max-batch 8 --batch-window-ms 50
+  python extraction_server.py --listen unix:/tmp/affiliate-extractor.sock
+  python extraction_server.py --precision int8 --threads 4
+  python extraction_server.py --prefix-cache
+  python extraction_server.py --config ../affiliate/config
+
+Protocol: newline-delimited JSON. Each request is `{"text": "..."}` and each
+response is `{"accommodations": [{"name", "place", "country", "mentions"}, ...], "usage":
+{"prompt_tokens", "completion_tokens", "retries", "max_new_tokens"}, "model": "..."}` or `{"error": "..."}`,
+in request order per connection. `{"info": true}` is answered with `{"model": "..."}`, the
+model name and its precision if not fp32, which clients make part of their cache key.
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from llm_extractor import (
+    CandidateFilter,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_MODEL,
+    PRECISIONS,
+    build_pipeline,
+    extract_accommodations_batch,
+)
+
+
+DEFAULT_LISTEN = "127.0.0.1:8765"
+# Posts are sent whole on one line, so allow far more than asyncio's 64KiB default
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+class ExtractionServer:
+    """Serves extraction requests from one resident pipeline, micro-batching them."""
+
+    def __init__(self, llm: Any, model_name: str = DEFAULT_MODEL, max_batch: int = 8, batch_window: float = 0.05,
+                 max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_CHUNK_OVERLAP,
+                 candidate_filter: CandidateFilter = None, prefix_cache: bool = False,
+                 max_batch_tokens: int = DEFAULT_BATCH_TOKENS):
+        self.llm = llm
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_chunk_tokens = max_chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.candidate_filter = candidate_filter
+        self.prefix_cache = prefix_cache
+        self.max_batch_tokens = max_batch_tokens
+        self.queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        # One thread so the model only ever runs one batch at a time
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def extract_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Extract a batch of texts, returning one response body per text."""
+        usage: List[Dict[str, int]] = []
+        results = extract_accommodations_batch(self.llm, texts, max_chunk_tokens=self.max_chunk_tokens,
+                                               overlap_tokens=self.overlap_tokens,
+                                               candidate_filter=self.candidate_filter, usage=usage,
+                                               prefix_cache=self.prefix_cache,
+                                               max_batch_tokens=self.max_batch_tokens)
+        return [{"accommodations": result, "usage": text_usage} for result, text_usage in zip(results, usage)]
+
+    async def batch_loop(self) -> None:
+        """Collect requests for up to `batch_window` seconds and run them as one batch."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.extract_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request.get("info"):
+                        response = {"model": self.model_name}
+                    else:
+                        future = loop.create_future()
+                        await self.queue.put((request["text"], future))
+                        response = {**(await future), "model": self.model_name}
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, listen: str = DEFAULT_LISTEN) -> None:
+        if listen.startswith("unix:"):
+            path = listen[len("unix:"):]
+            if os.path.exists(path):
+                os.unlink(path)
+            server = await asyncio.start_unix_server(self.handle_client, path=path, limit=MAX_LINE_BYTES)
+        else:
+            host, _, port = listen.rpartition(":")
+            server = await asyncio.start_server(self.handle_client, host or "127.0.0.1", int(port),
+                                                limit=MAX_LINE_BYTES)
+        batcher = asyncio.create_task(self.batch_loop())
+        print(f"Extraction server listening on {listen}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve accommodation extraction from a resident LLM.")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help="host:port or unix:/path/to/socket")
+    parser.add_argument("--config", help="Affiliate tool config file, llm.model, llm.precision and llm.threads are used")
+    parser.add_argument("--model", "-m", default=None, help=f"Hugging Face model name (default: {DEFAULT_MODEL})")
+    parser.add_argument("--precision", choices=PRECISIONS, default=None, help="Model weight precision (default: fp32)")
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads (default: all cores)")
+    parser.add_argument("--max-tokens", type=int, default=256,
+                        help="Max new tokens per request, each request's budget is estimated up to this")
+    parser.add_argument("--temperature", type=float, default=0.2, help="Sampling temperature")
+    parser.add_argument("--device", type=int, default=-1, help="Device: -1 for CPU, 0 for first GPU, etc.")
+    parser.add_argument("--max-batch", type=int, default=8, help="Max requests combined into one micro-batch")
+    parser.add_argument("--batch-window-ms", type=float, default=50, help="How long to wait for requests to batch")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Max prompts generated per pipeline batch")
+    parser.add_argument("--max-batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS,
+                        help="Max padded tokens (prompt + generation) per pipeline batch")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="Max tokens of text per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP, help="Tokens of overlap between chunks")
+    parser.add_argument("--prefilter", action="store_true", help="Only send candidate paragraphs to the model")
+    parser.add_argument("--prefix-cache", action="store_true", help="Reuse the prefilled prompt instructions across texts")
+    args = parser.parse_args()
+
+    # Command-line options take precedence over the config file
+    model, precision, threads = args.model, args.precision, args.threads
+    if args.config:
+        from affiliate.config import Config
+        config = Config(args.config)
+        if config.get("llm.model", "mock") != "mock":
+            model = model or config.get("llm.model")
+        precision = precision or config.get("llm.precision")
+        threads = threads or config.get("llm.threads")
+    model = model or DEFAULT_MODEL
+    precision = precision or "fp32"
+
+    llm = build_pipeline(model_name=model, device=args.device, max_new_tokens=args.max_tokens,
+                         temperature=args.temperature, batch_size=args.batch_size, precision=precision,
+                         threads=threads)
+    # Results differ between precisions, so clients can tell them apart
+    model_name = model if precision == "fp32" else f"{model}:{precision}"
+
+    async def run():
+        server = ExtractionServer(llm, model_name, args.max_batch, args.batch_window_ms / 1000,
+                                  args.chunk_tokens, args.chunk_overlap,
+                                  CandidateFilter() if args.prefilter else None, args.prefix_cache,
+                                  args.max_batch_tokens)
+        await server.serve(args.listen)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
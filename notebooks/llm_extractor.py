@@ -7,31 +7,147 @@ transformers model wrapped by LangChain. The model used defaults to
 Usage examples:
   python llm_extractor.py --text "We stayed at Hotel Aurora, Rome, Italy." 
   python llm_extractor.py --file path/to/article.txt
+  python llm_extractor.py --file long_post.md --chunk-tokens 512 --batch-size 8
+  python llm_extractor.py --file path/to/article.txt --prefilter
+  python llm_extractor.py --file path/to/article.txt --precision int8 --threads 4
+  python llm_extractor.py --files posts/*.md --batch-size 16 --max-batch-tokens 16384
+
+Long texts are split on paragraph and sentence boundaries into overlapping
+chunks that fit the token budget. Chunks are generated in batches, each row
+stopping once its JSON array closes, and the results merged, de-duplicated by
+name and location. Shorter texts are streamed: each object is parsed as soon as
+it is generated and generation stops when the JSON array closes. With
+`--prefilter` only paragraphs that may mention accommodation are sent to the
+model.
+
+On CPU `--precision bf16` loads bfloat16 weights and `--precision int8` applies
+dynamic int8 quantization to the linear layers, both use a fraction of the
+memory of the fp32 default. `--threads` sets the torch intra-op thread count,
+set it to cores / workers when running several workers on one node.
+
+With `--prefix-cache` the key/values of the constant instructions at the start
+of the prompt are computed once per loaded model and reused for every text, so
+only the text itself is prefilled. Prompts are then generated one at a time
+instead of in padded batches.
+
+With `--files` many documents are extracted together. Their prompts are sorted
+by token length and grouped into buckets of similar length, so each padded
+batch wastes little compute on padding. Short prompts are batched up to
+`--batch-size` at a time, long ones fewer, keeping every batch within
+`--max-batch-tokens` padded tokens. Documents/sec and tokens/sec are reported
+to stderr.
+
+Each request gets its own generation budget, estimated from the candidate
+mentions in its text (see `estimate_new_tokens`) and capped by `--max-tokens`,
+so short texts do not decode a long fixed budget and texts with many
+properties are not cut off. If the JSON array is still open when the budget
+runs out, generation continues from the partial output instead of starting
+again. Input tokens, output tokens and continuations are tracked per text.
 
 The script prints a JSON array of objects with fields: name, place, country.
 """
 import argparse
+import copy
 import json
-import re
 import sys
-from typing import Any
-
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import torch
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    DynamicCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+    pipeline,
+)
 from langchain import PromptTemplate, LLMChain
 from langchain.llms import HuggingFacePipeline
 
+# The candidate prefilter is shared with the affiliate package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from affiliate.prefilter import CandidateFilter, FilterResult
+from extraction_helpers import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_TOKENS,
+    JsonArrayStream,
+    bucket_by_length,
+    estimate_new_tokens,
+    extract_json_from_text,
+    is_truncated,
+    locate_mentions,
+    merge_accommodations,
+    new_usage,
+    split_into_chunk_spans,
+)
+
 
 DEFAULT_MODEL = "google/gemma-3-4b-it"
+PRECISIONS = ("fp32", "bf16", "int8")
+# Times a truncated output is continued before it is parsed as it is
+MAX_CONTINUATIONS = 2
+
+
+def load_model(model_name: str, precision: str = "fp32", device: int = -1) -> Any:
+    """Load a causal LM in the given precision.
+
+    fp32 is the full precision default. bf16 loads bfloat16 weights, halving the
+    memory. int8 loads fp32 weights and replaces the linear layers with dynamically
+    quantized int8 versions, CPU only.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+    if precision == "int8" and device != -1:
+        raise ValueError("int8 dynamic quantization is only supported on CPU (device -1)")
+
+    dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+    # low_cpu_mem_usage loads weights shard by shard instead of building a random model first
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=dtype, low_cpu_mem_usage=True)
+    if precision == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model.eval()
+
+
+def set_cpu_threads(threads: Optional[int]) -> None:
+    """Set the torch intra-op thread count, with a single inter-op thread as generation is sequential."""
+    if not threads:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel operation
+        pass
 
 
-def build_pipeline(model_name: str = DEFAULT_MODEL, device: int = -1, max_new_tokens: int = 256, temperature: float = 0.2) -> Any:
+def build_pipeline(model_name: str = DEFAULT_MODEL, device: int = -1, max_new_tokens: int = 256, temperature: float = 0.2,
+                   batch_size: int = DEFAULT_BATCH_SIZE, precision: str = "fp32",
+                   threads: Optional[int] = None) -> Any:
     """Load tokenizer and model and return a LangChain `HuggingFacePipeline` LLM.
 
     device: -1 for CPU, or torch device id (0,1,...) for GPU if available.
+    batch_size: most prompts generated together, fewer for long prompts (see `bucket_by_length`).
+    precision: "fp32", "bf16" or "int8" (CPU only), see `load_model`.
+    threads: torch CPU threads, default leaves torch's choice (all cores).
     """
-    print(f"Loading model {model_name} (this may take a while)...")
+    print(f"Loading model {model_name} in {precision} (this may take a while)...")
+    set_cpu_threads(threads)
     tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForCausalLM.from_pretrained(model_name)
+    # Batched generation with a decoder-only model needs left padding
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    model = load_model(model_name, precision, device)
+    # Direct model.generate calls (streaming, prefix cache) use the same settings as the pipeline
+    model.generation_config.max_new_tokens = max_new_tokens
+    model.generation_config.temperature = temperature
 
     text_gen = pipeline(
         "text-generation",
@@ -42,7 +158,7 @@ def build_pipeline(model_name: str = DEFAULT_MODEL, device: int = -1, max_new_to
         device=device,
     )
 
-    hf_llm = HuggingFacePipeline(pipeline=text_gen)
+    hf_llm = HuggingFacePipeline(pipeline=text_gen, batch_size=batch_size)
     return hf_llm
 
 
@@ -58,40 +174,363 @@ PROMPT_TEMPLATE = (
 )
 
 
-def extract_accommodations(llm: Any, text: str, prompt_template: str = PROMPT_TEMPLATE) -> str:
+def apply_prefilter(text: str, candidate_filter: Optional[CandidateFilter]) -> str:
+    """Return only the candidate paragraphs of `text`, reporting the tokens dropped to stderr."""
+    result = select_candidates(text, candidate_filter)
+    return text if result is None else result.text
+
+
+def select_candidates(text: str, candidate_filter: Optional[CandidateFilter]) -> Optional[FilterResult]:
+    """Run the prefilter over `text` if there is one, reporting the tokens dropped to stderr."""
+    if candidate_filter is None:
+        return None
+    result = candidate_filter.select(text)
+    print(f"Prefilter dropped {result.dropped_tokens} of {result.input_tokens} tokens.", file=sys.stderr)
+    return result
+
+
+def extract_accommodations(llm: Any, text: str, prompt_template: str = PROMPT_TEMPLATE,
+                           candidate_filter: Optional[CandidateFilter] = None) -> str:
+    text = apply_prefilter(text, candidate_filter)
+    if not text:
+        return "[]"
     template = PromptTemplate(input_variables=["text"], template=prompt_template)
     chain = LLMChain(llm=llm, prompt=template)
     output = chain.run({"text": text})
     return output
 
 
-def extract_json_from_text(text: str):
-    """Attempt to extract JSON (array or object) from model output and parse it.
+# Prompt prefix caches per loaded model, dropped with the model
+_PREFIX_CACHES: "weakref.WeakKeyDictionary[Any, Dict[str, PrefixCache]]" = weakref.WeakKeyDictionary()
+
+
+class PrefixCache:
+    """Past key/values of the instructions before `{text}` in a prompt template.
+
+    The instructions are the same for every text, so they are prefilled once
+    and a copy of their cache is handed to `generate` for each prompt, which
+    then only has to prefill the text.
+    """
+
+    SENTINEL = "\x00TEXT\x00"
+
+    def __init__(self, model: Any, tokenizer: Any, prompt_template: str = PROMPT_TEMPLATE):
+        self.template = PromptTemplate(input_variables=["text"], template=prompt_template)
+        prefix = self.template.format(text=self.SENTINEL).split(self.SENTINEL)[0]
+        self.prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+        with torch.no_grad():
+            self.past_key_values = model(input_ids=self.prefix_ids, past_key_values=DynamicCache(),
+                                         use_cache=True).past_key_values
+
+    def prepare(self, tokenizer: Any, text: str, continuation: str = "") -> Dict[str, Any]:
+        """Return `generate` keyword arguments for the prompt of `text`, reusing the prefix cache.
+
+        `continuation` is output already generated for the prompt, which is
+        appended so generation carries on from it. If the prompt does not
+        tokenize to the cached prefix followed by the text (a token merged
+        across the boundary), it is generated without the cache.
+        """
+        input_ids = tokenizer(self.template.format(text=text) + continuation, return_tensors="pt").input_ids
+        input_ids = input_ids.to(self.prefix_ids.device)
+        kwargs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+        prefix_length = self.prefix_ids.shape[1]
+        if input_ids.shape[1] > prefix_length and torch.equal(input_ids[:, :prefix_length], self.prefix_ids):
+            # generate extends the cache in place, so each prompt gets its own copy
+            kwargs["past_key_values"] = copy.deepcopy(self.past_key_values)
+        return kwargs
+
+
+def get_prefix_cache(llm: Any, prompt_template: str = PROMPT_TEMPLATE) -> PrefixCache:
+    """Return the prefix cache of a prompt template for the pipeline's model, computing it on first use."""
+    hf_pipeline = llm.pipeline
+    caches = _PREFIX_CACHES.setdefault(hf_pipeline.model, {})
+    if prompt_template not in caches:
+        caches[prompt_template] = PrefixCache(hf_pipeline.model, hf_pipeline.tokenizer, prompt_template)
+    return caches[prompt_template]
+
+
+class StopWhenArraysClose(StoppingCriteria):
+    """Stop each row of a generate call once the JSON array in its output closes.
+
+    The newest token of every row is decoded and fed to that row's
+    `JsonArrayStream`, so a finished row stops decoding while the rest of the
+    batch carries on. `outputs` is the output already generated for each row
+    when a truncated output is continued.
+    """
+
+    def __init__(self, tokenizer: Any, outputs: List[str]):
+        self.tokenizer = tokenizer
+        self.streams = []
+        for output in outputs:
+            stream = JsonArrayStream()
+            stream.feed(output)
+            self.streams.append(stream)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        for stream, token in zip(self.streams, input_ids[:, -1].tolist()):
+            if not stream.done:
+                stream.feed(self.tokenizer.decode([token], skip_special_tokens=True))
+        return torch.tensor([stream.done for stream in self.streams], dtype=torch.bool, device=input_ids.device)
+
 
-    Tries several heuristics to locate the JSON payload.
+def generate_with_prefix_cache(llm: Any, text: str, prompt_template: str = PROMPT_TEMPLATE,
+                               max_new_tokens: Optional[int] = None, continuation: str = "") -> str:
+    """Generate the model output for one text, reusing the cached instruction prefix.
+
+    max_new_tokens: generation budget (default: the model's generation config).
+    continuation: output already generated for the text, generation carries on after it.
+    """
+    hf_pipeline = llm.pipeline
+    tokenizer, model = hf_pipeline.tokenizer, hf_pipeline.model
+    kwargs = get_prefix_cache(llm, prompt_template).prepare(tokenizer, text, continuation)
+    if max_new_tokens:
+        kwargs["max_new_tokens"] = max_new_tokens
+    kwargs["stopping_criteria"] = StoppingCriteriaList([StopWhenArraysClose(tokenizer, [continuation])])
+    with torch.no_grad():
+        output_ids = model.generate(**kwargs)
+    return tokenizer.decode(output_ids[0, kwargs["input_ids"].shape[1]:], skip_special_tokens=True)
+
+
+def max_new_tokens_of(llm: Any) -> int:
+    """Return the generation budget the pipeline was built with, the ceiling of every request's budget."""
+    return llm.pipeline.model.generation_config.max_new_tokens or 0
+
+
+def generate_bucketed(llm: Any, prompts: List[str], prompt_tokens: List[int],
+                      max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                      max_new_tokens: Optional[List[int]] = None,
+                      continuations: Optional[List[str]] = None) -> List[str]:
+    """Generate the outputs of many prompts in length-bucketed, padded batches.
+
+    The batches are formed by `bucket_by_length`, counting each prompt's length
+    plus its generation budget, with the LLM's batch size as the largest batch.
+    Each row of a batch stops once its JSON array closes (see
+    `StopWhenArraysClose`), the batch once every row has stopped.
+    max_new_tokens: budget of each prompt (default: the pipeline's for all), a
+    batch generates up to the largest budget in it.
+    continuations: output already generated at the end of each prompt, if the
+    prompts continue truncated outputs.
+    Returns the generated text (without the prompt) of every prompt, in input order.
+    """
+    hf_pipeline = llm.pipeline
+    budgets = max_new_tokens or [max_new_tokens_of(llm)] * len(prompts)
+    continuations = continuations or [""] * len(prompts)
+    lengths = [tokens + budget for tokens, budget in zip(prompt_tokens, budgets)]
+    outputs = [""] * len(prompts)
+    for batch in bucket_by_length(lengths, max_batch_tokens, getattr(llm, "batch_size", DEFAULT_BATCH_SIZE)):
+        # The pipeline pads each batch to its longest prompt (on the left, see build_pipeline)
+        stop = StopWhenArraysClose(hf_pipeline.tokenizer, [continuations[i] for i in batch])
+        generated = hf_pipeline([prompts[i] for i in batch], batch_size=len(batch), return_full_text=False,
+                                max_new_tokens=max(budgets[i] for i in batch),
+                                stopping_criteria=StoppingCriteriaList([stop]))
+        for index, output in zip(batch, generated):
+            outputs[index] = output[0]["generated_text"]
+    return outputs
+
+
+def make_token_counter(llm: Any) -> Callable[[str], int]:
+    """Return a function counting tokens with the pipeline's tokenizer.
+
+    Falls back to a words-based estimate if the LLM does not expose a tokenizer.
+    """
+    tokenizer = getattr(getattr(llm, "pipeline", None), "tokenizer", None)
+    if tokenizer is None:
+        return lambda text: int(len(text.split()) * 1.3) + 1
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def extract_accommodations_chunked(llm: Any, text: str, prompt_template: str = PROMPT_TEMPLATE,
+                                   max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                                   overlap_tokens: int = DEFAULT_CHUNK_OVERLAP,
+                                   candidate_filter: Optional[CandidateFilter] = None,
+                                   prefix_cache: bool = False,
+                                   usage: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """Extract accommodations from a text of any length.
+
+    The text is split into overlapping chunks, all chunks are sent through the
+    pipeline together (batched by the `HuggingFacePipeline` batch size) and the
+    parsed results merged. Chunks whose output cannot be parsed are skipped
+    with a warning rather than failing the whole text.
+
+    usage: if given, a ledger dict (see `new_usage`) updated with the tokens used.
     """
-    # Try to find a JSON array first
-    m = re.search(r"(\[\s*\{.*?\}\s*\])", text, re.S)
-    if m:
-        candidate = m.group(1)
-        return json.loads(candidate)
-
-    # Fall back to the first JSON object
-    m = re.search(r"(\{.*\})", text, re.S)
-    if m:
-        candidate = m.group(1)
-        parsed = json.loads(candidate)
-        # If single object, wrap in list for consistent output
-        return parsed if isinstance(parsed, list) else [parsed]
-
-    # As a last resort, attempt to locate the first '[' and last ']' and parse
-    start = text.find("[")
-    end = text.rfind("]")
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start:end + 1]
-        return json.loads(candidate)
-
-    raise ValueError("No JSON found in model output")
+    usages: List[Dict[str, int]] = []
+    result = extract_accommodations_batch(llm, [text], prompt_template, max_chunk_tokens, overlap_tokens,
+                                          candidate_filter, usages, prefix_cache=prefix_cache)[0]
+    if usage is not None:
+        for key, value in usages[0].items():
+            usage[key] = usage.get(key, 0) + value
+    return result
+
+
+def extract_accommodations_batch(llm: Any, texts: List[str], prompt_template: str = PROMPT_TEMPLATE,
+                                 max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                                 overlap_tokens: int = DEFAULT_CHUNK_OVERLAP,
+                                 candidate_filter: Optional[CandidateFilter] = None,
+                                 usage: Optional[List[Dict[str, int]]] = None,
+                                 prefix_cache: bool = False,
+                                 max_batch_tokens: int = DEFAULT_BATCH_TOKENS) -> List[List[Dict[str, Any]]]:
+    """Extract accommodations from several texts in one pass through the pipeline.
+
+    Every text is chunked, the chunks of all texts are generated together in
+    length-bucketed batches (see `generate_bucketed`) and the results mapped
+    back to the text they came from. Returns one merged
+    result list per input text, in input order. Each result carries the
+    "mentions" offsets of its name in the chunks the model found it in, as
+    offsets into the input text.
+
+    Each chunk's generation budget is estimated with `estimate_new_tokens`.
+    Chunks whose JSON is cut off by the budget are continued from their
+    partial output, all such chunks together, up to `MAX_CONTINUATIONS` times.
+
+    usage: if a list is given, one ledger dict per text (see `new_usage`) is
+    appended to it.
+    prefix_cache: generate each chunk on its own, reusing the cached key/values
+    of the prompt instructions (see `PrefixCache`) instead of batching.
+    max_batch_tokens: padded tokens per batch, see `bucket_by_length`.
+    """
+    count_tokens = make_token_counter(llm)
+    usage_for = [new_usage() for _ in texts]
+    if usage is not None:
+        usage.extend(usage_for)
+    owners = []
+    chunks = []
+    chunk_units = []
+    sources = []
+    for index, text in enumerate(texts):
+        filtered = select_candidates(text, candidate_filter)
+        source = text if filtered is None else filtered.text
+        sources.append((source, filtered))
+        for units in split_into_chunk_spans(source, count_tokens, max_chunk_tokens, overlap_tokens):
+            owners.append(index)
+            chunks.append("\n\n".join(source[start:end] for start, end in units))
+            chunk_units.append(units)
+
+    results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+    if not chunks:
+        return results
+
+    template = PromptTemplate(input_variables=["text"], template=prompt_template)
+    prompts = [template.format(text=chunk) for chunk in chunks]
+    ceiling = max_new_tokens_of(llm)
+    budgets = [estimate_new_tokens(chunk, ceiling) for chunk in chunks]
+    raws = [""] * len(chunks)
+    pending = list(range(len(chunks)))
+    for attempt in range(MAX_CONTINUATIONS + 1):
+        # Continuations repeat the output so far after the prompt and generate another budget
+        continued = [prompts[i] + raws[i] for i in pending]
+        prompt_tokens = [count_tokens(prompt) for prompt in continued]
+        if prefix_cache:
+            outputs = [generate_with_prefix_cache(llm, chunks[i], prompt_template, budgets[i], raws[i])
+                       for i in pending]
+        else:
+            outputs = generate_bucketed(llm, continued, prompt_tokens, max_batch_tokens,
+                                        [budgets[i] for i in pending], [raws[i] for i in pending])
+        for i, tokens, output in zip(pending, prompt_tokens, outputs):
+            ledger = usage_for[owners[i]]
+            ledger["prompt_tokens"] += tokens
+            ledger["completion_tokens"] += count_tokens(output)
+            ledger["max_new_tokens"] += budgets[i]
+            if attempt:
+                ledger["retries"] += 1
+            raws[i] += output
+        pending = [i for i in pending if is_truncated(raws[i])]
+        if not pending:
+            break
+
+    for i, (owner, raw) in enumerate(zip(owners, raws)):
+        try:
+            items = extract_json_from_text(raw)
+        except ValueError:
+            print(f"Failed to parse JSON from chunk {i + 1}/{len(chunks)}. Raw output below:", file=sys.stderr)
+            print(raw, file=sys.stderr)
+            continue
+        source, filtered = sources[owner]
+        for item in items:
+            if isinstance(item, dict) and item.get("name"):
+                mentions = locate_mentions(source, chunk_units[i], str(item["name"]))
+                if filtered is not None:
+                    mentions = [list(span) for span in (filtered.to_original(*m) for m in mentions) if span]
+                item["mentions"] = mentions
+        results[owner].extend(items)
+    return [merge_accommodations(result) for result in results]
+
+
+def extract_accommodations_streaming(llm: Any, text: str, prompt_template: str = PROMPT_TEMPLATE,
+                                     max_new_tokens: int = 256, temperature: float = 0.2,
+                                     candidate_filter: Optional[CandidateFilter] = None,
+                                     prefix_cache: bool = False,
+                                     usage: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Generate with streaming and yield each accommodation as soon as it is complete.
+
+    Generation runs in a background thread feeding a `TextIteratorStreamer`.
+    Once the top-level JSON array closes, a stopping criterion ends generation
+    instead of decoding on until the budget, which is estimated from the text
+    with `estimate_new_tokens`, up to `max_new_tokens`. If the budget runs out
+    with the array still open, generation continues from the output so far.
+    With `prefix_cache` the instruction prefix is not prefilled again, see
+    `PrefixCache`.
+
+    usage: if given, a ledger dict (see `new_usage`) updated with the tokens used.
+    """
+    text = apply_prefilter(text, candidate_filter)
+    if not text:
+        return
+
+    hf_pipeline = llm.pipeline
+    tokenizer, model = hf_pipeline.tokenizer, hf_pipeline.model
+    prompt = PromptTemplate(input_variables=["text"], template=prompt_template).format(text=text)
+    budget = estimate_new_tokens(text, max_new_tokens)
+    ledger = usage if usage is not None else new_usage()
+
+    stop = threading.Event()
+
+    class StopWhenArrayCloses(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), stop.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    stream = JsonArrayStream()
+    raw = []
+    for attempt in range(MAX_CONTINUATIONS + 1):
+        if prefix_cache:
+            inputs = get_prefix_cache(llm, prompt_template).prepare(tokenizer, text, "".join(raw))
+        else:
+            inputs = tokenizer(prompt + "".join(raw), return_tensors="pt").to(model.device)
+        ledger["prompt_tokens"] += inputs["input_ids"].shape[1]
+        ledger["max_new_tokens"] += budget
+        if attempt:
+            ledger["retries"] += 1
+
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        generation = threading.Thread(target=model.generate, kwargs=dict(
+            **inputs,
+            streamer=streamer,
+            max_new_tokens=budget,
+            temperature=temperature,
+            stopping_criteria=StoppingCriteriaList([StopWhenArrayCloses()]),
+        ))
+        generation.start()
+
+        generated = []
+        try:
+            for piece in streamer:
+                generated.append(piece)
+                for item in stream.feed(piece):
+                    yield item
+                if stream.done:
+                    break
+        finally:
+            stop.set()
+            generation.join()
+            stop.clear()
+        raw.extend(generated)
+        ledger["completion_tokens"] += len(tokenizer.encode("".join(generated), add_special_tokens=False))
+        # Stopped by the array closing, or by the model without ever opening one
+        if stream.done or not stream.started:
+            break
+
+    if not stream.started:
+        raise ValueError("No JSON found in model output:\n" + "".join(raw))
 
 
 def load_text_from_file(path: str) -> str:
@@ -102,29 +541,73 @@ def load_text_from_file(path: str) -> str:
 def main():
     parser = argparse.ArgumentParser(description="Extract accommodations and locations from text using an LLM.")
     parser.add_argument("--file", "-f", help="Path to a text file to process.")
+    parser.add_argument("--files", nargs="+", help="Several text files, extracted together in length-bucketed batches.")
     parser.add_argument("--text", "-t", help="Text to process directly.")
     parser.add_argument("--model", "-m", default=DEFAULT_MODEL, help="Hugging Face model name")
-    parser.add_argument("--max-tokens", type=int, default=256, help="Max new tokens for generation")
+    parser.add_argument("--max-tokens", type=int, default=256,
+                        help="Max new tokens per request, each request's budget is estimated up to this")
     parser.add_argument("--temperature", type=float, default=0.2, help="Sampling temperature")
     parser.add_argument("--device", type=int, default=-1, help="Device: -1 for CPU, 0 for first GPU, etc.")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32", help="Model weight precision")
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads (default: all cores)")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="Max tokens of text per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP, help="Tokens of overlap between chunks")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Max chunks generated per batch")
+    parser.add_argument("--max-batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS,
+                        help="Max padded tokens (prompt + generation) per batch")
+    parser.add_argument("--prefilter", action="store_true", help="Only send candidate paragraphs to the model")
+    parser.add_argument("--prefilter-context", type=int, default=0, help="Neighbouring paragraphs kept around candidates")
+    parser.add_argument("--prefix-cache", action="store_true", help="Reuse the prefilled prompt instructions across texts")
     args = parser.parse_args()
 
-    if not args.file and not args.text:
-        print("Provide either --file or --text.", file=sys.stderr)
+    if not args.file and not args.text and not args.files:
+        print("Provide either --file, --files or --text.", file=sys.stderr)
         parser.print_help()
         sys.exit(1)
 
-    text = load_text_from_file(args.file) if args.file else args.text
-
-    llm = build_pipeline(model_name=args.model, device=args.device, max_new_tokens=args.max_tokens, temperature=args.temperature)
+    llm = build_pipeline(model_name=args.model, device=args.device, max_new_tokens=args.max_tokens, temperature=args.temperature,
+                         batch_size=args.batch_size, precision=args.precision, threads=args.threads)
+
+    candidate_filter = CandidateFilter(context=args.prefilter_context) if args.prefilter else None
+    if args.files:
+        texts = [load_text_from_file(path) for path in args.files]
+        usage: List[Dict[str, int]] = []
+        start = time.perf_counter()
+        results = extract_accommodations_batch(llm, texts, max_chunk_tokens=args.chunk_tokens,
+                                               overlap_tokens=args.chunk_overlap, candidate_filter=candidate_filter,
+                                               usage=usage, prefix_cache=args.prefix_cache,
+                                               max_batch_tokens=args.max_batch_tokens)
+        elapsed = time.perf_counter() - start
+        prompt_tokens = sum(u["prompt_tokens"] for u in usage)
+        completion_tokens = sum(u["completion_tokens"] for u in usage)
+        print(f"Extracted {len(texts)} documents in {elapsed:.1f}s: {len(texts) / elapsed:.2f} documents/s, "
+              f"{prompt_tokens / elapsed:.1f} prompt tokens/s, {completion_tokens / elapsed:.1f} generated tokens/s",
+              file=sys.stderr)
+        for path, ledger in zip(args.files, usage):
+            print(f"{path}: {ledger['prompt_tokens']} prompt tokens, {ledger['completion_tokens']} of "
+                  f"{ledger['max_new_tokens']} budgeted tokens generated, {ledger['retries']} continuations",
+                  file=sys.stderr)
+        print(json.dumps(dict(zip(args.files, results)), ensure_ascii=False, indent=2))
+        return
 
-    raw = extract_accommodations(llm, text)
-    try:
-        data = extract_json_from_text(raw)
-    except Exception:
-        print("Failed to parse JSON from model output. Raw output below:", file=sys.stderr)
-        print(raw, file=sys.stderr)
-        raise
+    text = load_text_from_file(args.file) if args.file else args.text
+    count_tokens = make_token_counter(llm)
+    usage = new_usage()
+    if count_tokens(text) <= args.chunk_tokens:
+        try:
+            data = list(extract_accommodations_streaming(llm, text, max_new_tokens=args.max_tokens,
+                                                         temperature=args.temperature,
+                                                         candidate_filter=candidate_filter,
+                                                         prefix_cache=args.prefix_cache, usage=usage))
+        except ValueError as e:
+            print(f"Failed to parse JSON from model output. {e}", file=sys.stderr)
+            raise
+    else:
+        data = extract_accommodations_chunked(llm, text, max_chunk_tokens=args.chunk_tokens, overlap_tokens=args.chunk_overlap,
+                                              candidate_filter=candidate_filter, prefix_cache=args.prefix_cache,
+                                              usage=usage)
+    print(f"{usage['prompt_tokens']} prompt tokens, {usage['completion_tokens']} of {usage['max_new_tokens']} "
+          f"budgeted tokens generated, {usage['retries']} continuations", file=sys.stderr)
 
     print(json.dumps(data, ensure_ascii=False, indent=2))
 
@@ -1,6 +1,8 @@
 """tests for the affiliate link tool."""
 
+import os
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 import tempfile
 
@@ -12,6 +14,20 @@ from affiliate.link import LinkProcessor
 from affiliate.config import Config
 
 
+@contextmanager
+def temporary_cache(directory):
+    """Point the CLI's default extraction cache into `directory`, away from the user's cache."""
+    old_path = os.environ.get("AFFILIATE_CACHE_PATH")
+    os.environ["AFFILIATE_CACHE_PATH"] = str(Path(directory) / "extractions.sqlite")
+    try:
+        yield
+    finally:
+        if old_path is None:
+            del os.environ["AFFILIATE_CACHE_PATH"]
+        else:
+            os.environ["AFFILIATE_CACHE_PATH"] = old_path
+
+
 def test_property_extraction():
     """Test that the property extractor finds properties in blog content."""
     extractor = AccommodationExtractor()
@@ -76,7 +92,7 @@ def test_configuration_loading():
 
 def test_end_to_end():
     """Test the full end-to-end workflow."""
-    with tempfile.TemporaryDirectory() as tmpdir:
+    with tempfile.TemporaryDirectory() as tmpdir, temporary_cache(tmpdir):
         tmpdir = Path(tmpdir)
         
         # Create a test blog file
@@ -107,10 +123,967 @@ I visited the Central Hotel in Donegal.
             sys.argv = old_argv
 
 
+def test_single_pass_linking():
+    """Test that each property is linked once, longest name first, in one scan."""
+    processor = LinkProcessor("12345")
+
+    blog_content = """We stayed at harvey's point hotel first.
+    The Central Hotel bar is great, Harvey's Point Hotel too.
+    The Central Hotelier is not a match.
+    """
+    properties = [
+        {"name": "Central Hotel", "location": "Donegal, Ireland"},
+        {"name": "Harvey's Point", "location": "Donegal, Ireland"},
+        {"name": "Harvey's Point Hotel", "location": "Donegal, Ireland"},
+        {"name": "central hotel", "location": "Duplicate"},
+    ]
+
+    spans = processor.find_links(blog_content, properties)
+    assert [s.name for s in spans] == ["Harvey's Point Hotel", "Central Hotel"]
+
+    result = processor.process_markdown(blog_content, properties)
+    assert result.count("[harvey's point hotel](") == 1
+    assert result.count("[Central Hotel](") == 1
+    assert "Duplicate" not in result
+    assert "[Central Hotelier]" not in result
+    print("6. Single pass linking test passed")
+
+
+def test_batch_mode():
+    """Test that a directory of posts is processed across a worker pool."""
+    from affiliate.batch import iter_posts, run_batch
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        (tmpdir / "nested").mkdir()
+        for name in ["one.md", "two.md", "nested/three.md", "old_linked.md"]:
+            (tmpdir / name).write_text("I visited the Central Hotel in Donegal.\n")
+        (tmpdir / "notes.txt").write_text("not a post")
+
+        paths = list(iter_posts(str(tmpdir)))
+        assert sorted(p.name for p in paths) == ["one.md", "three.md", "two.md"]
+
+        manifest = tmpdir / "posts.txt"
+        manifest.write_text("one.md\n# comment\nmissing.md\n")
+        manifest_paths = list(iter_posts(manifest=str(manifest)))
+        assert manifest_paths == [tmpdir / "one.md", tmpdir / "missing.md"]
+
+        summary = run_batch(paths + manifest_paths[1:], workers=2,
+                            overrides={"affiliate.id": "999", "cache.path": str(tmpdir / "cache.sqlite")})
+        assert summary.succeeded == 3
+        assert [p.name for p, _ in summary.failures] == ["missing.md"]
+        assert "aid=999" in (tmpdir / "nested" / "three_linked.md").read_text()
+
+        # Setup failures are reported once as an error, before or while starting the workers
+        (tmpdir / "file").write_text("")
+        for workers in (1, 2):
+            for overrides in ({"llm.type": "bogus"}, {"cache.path": str(tmpdir / "file" / "cache.sqlite")}):
+                try:
+                    run_batch(paths, overrides=overrides, workers=workers)
+                    assert False, "Expected a setup error"
+                except (ValueError, RuntimeError) as e:
+                    assert "llm.type" in str(e) or "set up the extractor" in str(e)
+
+        import contextlib
+        import io
+        from affiliate.cli import main
+        old_argv = sys.argv
+        sys.argv = ["cli.py", str(tmpdir), "--workers", "2", "--llm-type", "bogus"]
+        stderr = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(stderr):
+                main()
+            assert False, "Expected exit code 1"
+        except SystemExit as e:
+            assert e.code == 1
+        finally:
+            sys.argv = old_argv
+        assert stderr.getvalue().startswith("Error: Unknown llm.type: bogus")
+        print("7. Batch mode test passed")
+
+
+def test_extraction_cache():
+    """Test that extraction results are cached by content, model and prompt version."""
+    from affiliate.cache import CachedExtractor, ExtractionCache
+
+    class CountingExtractor(AccommodationExtractor):
+        calls = 0
+
+        def extract_accommodations(self, text):
+            self.calls += 1
+            return super().extract_accommodations(text)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ExtractionCache(str(Path(tmpdir) / "cache.sqlite"))
+        inner = CountingExtractor()
+        extractor = CachedExtractor(inner, cache, model="mock")
+
+        first = extractor.extract_accommodations("post one")
+        assert extractor.extract_accommodations("post one") == first
+        assert extractor.last_hit and inner.calls == 1
+
+        CachedExtractor(inner, cache, model="other").extract_accommodations("post one")
+        assert inner.calls == 2
+
+        CachedExtractor(inner, cache, model="mock", refresh=True).extract_accommodations("post one")
+        assert inner.calls == 3
+        assert (cache.hits, cache.misses) == (1, 3)
+
+        # Age and size based eviction
+        cache.max_age = -1
+        assert cache.evict() == 2
+        cache.max_age = 60
+        for i in range(5):
+            cache.put(str(i), first)
+        cache.max_bytes = 300
+        cache.evict()
+        assert cache.get("4") == first and cache.get("0") is None
+        cache.close()
+
+        # Quantized models are cached separately from full precision
+        from affiliate.batch import build_config, build_extractor
+        config = build_config(overrides={"cache.path": str(Path(tmpdir) / "q.sqlite"), "llm.precision": "int8"})
+        quantized = build_extractor(config)
+        assert quantized.model == "mock/mock:int8"
+        quantized.cache.close()
+
+        # Changing only the backend misses the cache
+        config = build_config(overrides={"cache.path": str(Path(tmpdir) / "b.sqlite")})
+        mock = build_extractor(config)
+        mock.extract_accommodations("I stayed at the Central Hotel.")
+        mock.cache.close()
+        config = build_config(overrides={"cache.path": str(Path(tmpdir) / "b.sqlite"), "llm.type": "daemon",
+                                         "llm.server": "127.0.0.1:1", "llm.timeout": 1})
+        from affiliate.llm import DaemonExtractor
+        assert DaemonExtractor.prompt_version != mock.prompt_version
+        try:
+            build_extractor(config)
+            assert False, "Expected a connection error instead of the mock's cached results"
+        except ConnectionError:
+            pass
+    print("8. Extraction cache test passed")
+
+
+def test_daemon_extractor():
+    """Test that the daemon backend talks to an extraction server over one connection."""
+    import json
+    import socketserver
+    import threading
+    from affiliate.llm import DaemonExtractor
+
+    connections = []
+    served_model = ["gemma:int8"]
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            connections.append(self.client_address)
+            for line in self.rfile:
+                request = json.loads(line)
+                response = {"accommodations": [{"name": "Central Hotel", "place": "Donegal", "country": "Ireland"}],
+                            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "retries": 1},
+                            "model": served_model[0]}
+                if request.get("info"):
+                    response = {"model": served_model[0]}
+                elif not request["text"]:
+                    response = {"error": "empty text"}
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+    with socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        extractor = DaemonExtractor(f"127.0.0.1:{server.server_address[1]}", timeout=5)
+        try:
+            for _ in range(2):
+                properties = extractor.extract_accommodations("I stayed at the Central Hotel.")
+                assert properties == [{"name": "Central Hotel", "location": "Donegal, Ireland"}]
+            try:
+                extractor.extract_accommodations("")
+                assert False, "Expected a server error"
+            except RuntimeError as e:
+                assert "empty text" in str(e)
+            assert len(connections) == 1
+
+            # Concurrent async requests each get their own connection
+            import asyncio
+            results = asyncio.run(extractor.aextract_batch(["Central Hotel"] * 3))
+            assert results == [[{"name": "Central Hotel", "location": "Donegal, Ireland"}]] * 3
+            assert len(connections) == 4 and extractor.prompt_tokens == 50
+
+            # Continuations of truncated outputs reported by the server are counted
+            from affiliate.metrics import extractor_counters
+            assert extractor_counters(extractor)["llm_generation_retries"] == 5
+
+            # The model the server reports is part of the cache key, so a new model misses the cache
+            from affiliate.batch import build_config, build_extractor
+            with tempfile.TemporaryDirectory() as tmpdir:
+                config = build_config(overrides={"cache.path": str(Path(tmpdir) / "cache.sqlite"), "llm.type": "daemon",
+                                                 "llm.server": f"127.0.0.1:{server.server_address[1]}"})
+                cached = build_extractor(config)
+                assert cached.model == "daemon/gemma:int8"
+                cached.extract_accommodations("I stayed at the Central Hotel.")
+                served_model[0] = "gemma"
+                try:
+                    cached.extract_accommodations("We stayed at the Merrion.")
+                    assert False, "Expected an error once the server runs another model"
+                except RuntimeError as e:
+                    assert "gemma instead of gemma:int8" in str(e)
+                cached.extractor.close()
+                cached.cache.close()
+
+                rebuilt = build_extractor(config)
+                assert rebuilt.model == "daemon/gemma"
+                rebuilt.extract_accommodations("I stayed at the Central Hotel.")
+                assert not rebuilt.last_hit
+                rebuilt.extractor.close()
+                rebuilt.cache.close()
+        finally:
+            extractor.close()
+            server.shutdown()
+    print("9. Daemon extractor test passed")
+
+
+def test_incremental_extraction():
+    """Test that only new or edited paragraphs are sent to the extractor."""
+    from affiliate.cache import ExtractionCache
+    from affiliate.incremental import IncrementalExtractor
+    import re
+
+    class EchoExtractor:
+        def __init__(self):
+            self.calls = []
+
+        def extract_accommodations(self, text):
+            self.calls.append(text)
+            return [{"name": name, "location": ""} for name in re.findall(r"[A-Z]\w+ Hotel", text)]
+
+    post = "# Trip\n\nWe stayed at Central Hotel.\n\nThen Abbey Hotel in Donegal.\n\nBack to central hotel."
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ExtractionCache(str(Path(tmpdir) / "cache.sqlite"))
+        inner = EchoExtractor()
+        extractor = IncrementalExtractor(inner, cache)
+
+        first = extractor.extract_accommodations(post)
+        assert [p["name"] for p in first] == ["Central Hotel", "Abbey Hotel"]
+        assert len(inner.calls) == 4
+
+        edited = post.replace("Then Abbey", "Later the Abbey")
+        assert extractor.extract_accommodations(edited) == first
+        assert inner.calls[4:] == ["Later the Abbey Hotel in Donegal."]
+        assert not extractor.last_hit
+
+        extractor.extract_accommodations(edited + "\n\n")
+        assert extractor.last_hit and len(inner.calls) == 5
+        cache.close()
+
+    # Incremental extraction, the prefilter and the cascade share one paragraph splitter
+    from affiliate.markdown import paragraph_spans
+    from affiliate.prefilter import CandidateFilter
+    text = "\n  First line\n  second line  \n \n\nStayed at Central Hotel.\n\n   \n"
+    assert [text[start:end] for start, end in paragraph_spans(text)] == \
+        ["First line\n  second line", "Stayed at Central Hotel."]
+    assert CandidateFilter(context=0).select(text).spans == [paragraph_spans(text)[1]]
+
+    # With the prefilter the whole post is filtered first, each candidate keeps its heading
+    class LocatingExtractor(EchoExtractor):
+        def extract_accommodations(self, text):
+            heading = re.match(r"# (\w+)", text)
+            return [dict(p, location=heading.group(1) if heading else "")
+                    for p in super().extract_accommodations(text)]
+
+    post = ("# Donegal\n\nWe stayed at Central Hotel.\n\nThe beach was lovely.\n\n"
+            "# Sligo\n\nNothing to report.\n\nThen Abbey Hotel by the sea.")
+    windows = CandidateFilter(context=0).select_windows(post)
+    assert [w.text for w in windows] == ["# Donegal\n\nWe stayed at Central Hotel.",
+                                         "# Sligo\n\nThen Abbey Hotel by the sea."]
+    assert post[slice(*windows[1].to_original(9, 19))] == "Then Abbey"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ExtractionCache(str(Path(tmpdir) / "cache.sqlite"))
+        inner = LocatingExtractor()
+        extractor = IncrementalExtractor(inner, cache, candidate_filter=CandidateFilter(context=0))
+        assert extractor.prompt_version == "1+prefilter@0"
+
+        first = extractor.extract_accommodations(post)
+        assert [(p["name"], p["location"]) for p in first] == [("Central Hotel", "Donegal"), ("Abbey Hotel", "Sligo")]
+        assert inner.calls == [w.text for w in windows]
+        assert extractor.dropped_tokens > 0
+
+        edited = post.replace("Then Abbey", "Later the Abbey")
+        assert [(p["name"], p["location"]) for p in extractor.extract_accommodations(edited)] == \
+            [("Central Hotel", "Donegal"), ("Abbey Hotel", "Sligo")]
+        assert inner.calls[2:] == ["# Sligo\n\nLater the Abbey Hotel by the sea."]
+        cache.close()
+    print("10. Incremental extraction test passed")
+
+
+def test_candidate_prefilter():
+    """Test that the prefilter drops non-candidate paragraphs without losing labelled mentions."""
+    import json
+    from affiliate.prefilter import CandidateFilter, PrefilteredExtractor, evaluate_recall
+
+    post = "# Donegal\n\nThe cliffs are wild.\n\nWe stayed at the Central Hotel.\n\nThe pub was lively."
+    result = CandidateFilter().select(post)
+    assert result.text == "# Donegal\n\nWe stayed at the Central Hotel."
+    assert result.spans[1] == (post.index("We"), post.index("Hotel.") + len("Hotel."))
+    assert result.dropped_tokens > 0
+
+    extractor = PrefilteredExtractor(AccommodationExtractor())
+    assert extractor.extract_accommodations("No places to sleep mentioned here.") == []
+    assert extractor.extract_accommodations(post)
+
+    # Results with and without the prefilter, or with other context, are cached apart
+    versions = {AccommodationExtractor.prompt_version, extractor.prompt_version,
+                PrefilteredExtractor(AccommodationExtractor(), CandidateFilter(context=1)).prompt_version}
+    assert len(versions) == 3
+
+    with open(Path(__file__).parent / "fixtures" / "labelled_paragraphs.json", encoding="utf-8") as f:
+        labelled = json.load(f)
+    scores = evaluate_recall(CandidateFilter(), labelled)
+    assert scores["recall"] >= 0.9, scores
+    assert scores["drop_rate"] >= 0.3, scores
+    print(f"11. Candidate prefilter test passed (recall: {scores['recall']:.0%})")
+
+
+def test_cli_startup_budget():
+    """Test that a mock CLI run imports no heavy modules and stays within the startup budget."""
+    import subprocess
+
+    budget_ms = 200
+    heavy_modules = {"yaml", "sqlite3", "socket", "concurrent.futures", "multiprocessing",
+                     "torch", "transformers", "langchain"}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        test_blog = Path(tmpdir) / "test_blog.md"
+        test_blog.write_text("I visited the Central Hotel in Donegal.\n")
+
+        for args in (["--help"], [str(test_blog), "--no-cache"]):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-m", "affiliate.cli", *args],
+                cwd=Path(__file__).parent.parent, capture_output=True, text=True,
+            )
+            assert result.returncode == 0, result.stderr
+
+            imported = set()
+            total_us = 0
+            for line in result.stderr.splitlines():
+                if not line.startswith("import time:") or "self [us]" in line:
+                    continue
+                _, cumulative, name = line[len("import time:"):].split("|")
+                imported.add(name.strip())
+                # Top-level imports are not indented, their cumulative times add up to the total
+                if not name.startswith("  "):
+                    total_us += int(cumulative)
+
+            assert not heavy_modules & imported, heavy_modules & imported
+            assert total_us / 1000 < budget_ms, f"Startup took {total_us / 1000:.0f}ms, budget is {budget_ms}ms"
+    print("12. CLI startup budget test passed")
+
+
+def test_metrics():
+    """Test per-stage timings and counters written as JSON lines and a Prometheus textfile."""
+    from affiliate.batch import run_batch
+    import json
+    from affiliate.metrics import MetricsWriter
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        paths = []
+        for name in ["one.md", "two.md"]:
+            paths.append(tmpdir / name)
+            paths[-1].write_text("I visited the Central Hotel in Donegal.\n")
+
+        jsonl_path = tmpdir / "metrics.jsonl"
+        writer = MetricsWriter(str(jsonl_path))
+        run_batch(paths, overrides={"cache.enabled": False}, workers=1, metrics_writer=writer)
+        writer.close()
+        records = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+        assert [r["type"] for r in records] == ["post", "post", "summary"]
+        assert set(records[0]["stages"]) == {"read", "extract", "link", "write"}
+        assert records[0]["counters"]["links_inserted"] == 1
+        assert records[-1]["posts"] == 2
+        assert records[-1]["counters"]["bytes_read"] == 2 * paths[0].stat().st_size
+
+        prom_path = tmpdir / "metrics.prom"
+        writer = MetricsWriter(str(prom_path))
+        run_batch(paths, overrides={"cache.enabled": False}, workers=2, metrics_writer=writer)
+        writer.close()
+        prom = prom_path.read_text()
+        assert "affiliate_posts_total 2" in prom
+        assert 'affiliate_stage_seconds_total{stage="extract"}' in prom
+        assert "affiliate_links_inserted_total 2" in prom
+
+    # A stage's CPU time excludes the work of other threads running meanwhile
+    import threading
+    import time
+    from affiliate.metrics import Metrics
+    metrics = Metrics()
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    spinner = threading.Thread(target=spin)
+    spinner.start()
+    try:
+        with metrics.stage("wait"):
+            time.sleep(0.2)
+    finally:
+        stop.set()
+        spinner.join()
+    assert metrics.stages["wait"]["wall_s"] >= 0.2 and metrics.stages["wait"]["cpu_s"] < 0.05
+    print("13. Metrics test passed")
+
+
+def test_offset_linking():
+    """Test that mention offsets from the extractor are linked without searching, falling back when stale."""
+    from affiliate.incremental import IncrementalExtractor
+    from affiliate.cache import ExtractionCache
+    from affiliate.prefilter import PrefilteredExtractor
+
+    blog_content = "Skip the central hotel.\n\nWe loved the Central Hotel in Donegal and Harvey's Point Hotel.\n"
+    second = blog_content.index("Central Hotel")
+    properties = [
+        {"name": "Central Hotel", "location": "Donegal, Ireland", "mentions": [[second, second + 13]]},
+        # Stale offsets are ignored and the name is searched for instead
+        {"name": "Harvey's Point Hotel", "location": "Donegal, Ireland", "mentions": [[0, 20]]},
+    ]
+    processor = LinkProcessor("12345")
+    assert processor.spans_from_mentions(blog_content, properties) == [
+        (second, second + 13, "Central Hotel", "Donegal, Ireland")]
+    result, spans = processor.link_markdown(blog_content, properties)
+    assert result.startswith("Skip the central hotel.")
+    assert "[Central Hotel](" in result and "[Harvey's Point Hotel](" in result
+    assert [s.name for s in spans] == ["Central Hotel", "Harvey's Point Hotel"]
+
+    # Offsets survive the prefilter and paragraph wrappers
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ExtractionCache(str(Path(tmpdir) / "cache.sqlite"))
+        for extractor in [PrefilteredExtractor(AccommodationExtractor()),
+                          IncrementalExtractor(AccommodationExtractor(), cache)]:
+            found = {p["name"]: p["mentions"] for p in extractor.extract_accommodations(blog_content)}
+            assert found["Central Hotel"] == [[9, 22], [second, second + 13]]
+        cache.close()
+    print("14. Offset linking test passed")
+
+
+def test_protected_markdown():
+    """Test that names in front matter, headings, code, links and images are not linked."""
+    from affiliate.markdown import SpanIndex, protected_spans
+
+    blog_content = """---
+title: Central Hotel
+---
+# Central Hotel review
+
+Try `Central Hotel` or ![Central Hotel](pool.png) or [Central Hotel](https://example.com/central).
+
+```
+Central Hotel
+```
+
+We loved the Central Hotel.
+"""
+    properties = [{"name": "Central Hotel", "location": "Donegal, Ireland"}]
+    result = LinkProcessor("12345").process_markdown(blog_content, properties)
+    assert result.count("booking.com") == 1
+    assert "We loved the [Central Hotel](https://booking.com/" in result
+
+    # Offsets inside a protected region are ignored too
+    in_code = blog_content.index("Central Hotel\n```")
+    properties[0]["mentions"] = [[in_code, in_code + 13]]
+    assert LinkProcessor("12345").spans_from_mentions(blog_content, properties) == []
+
+    index = SpanIndex(protected_spans(blog_content))
+    assert index.overlaps(in_code, in_code + 13)
+    assert not index.overlaps(blog_content.index("loved"), blog_content.index("loved") + 5)
+
+    # Unclosed comments and HTML links do not protect the rest of the post, and are scanned in linear time
+    import time
+    unclosed = "<!-- draft\n\n<a href='x'>\n\nWe loved the Central Hotel.\n"
+    result = LinkProcessor("12345").process_markdown(unclosed, [{"name": "Central Hotel", "location": ""}])
+    assert "We loved the [Central Hotel](" in result
+    assert protected_spans(unclosed) == [(unclosed.index("<a"), unclosed.index(">\n\nWe") + 1)]
+    start = time.perf_counter()
+    protected_spans("<a href=x> " * 20000 + "<!-- " * 20000)
+    assert time.perf_counter() - start < 1, "Unclosed tags should not be rescanned"
+    print("15. Protected markdown test passed")
+
+
+def test_site_manifest_relink():
+    """Test that outputs are rebuilt from the site manifest with a new affiliate id and no extraction."""
+    from affiliate.batch import build_config, run_batch, run_relink
+    from affiliate.manifest import SiteManifest
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        for name in ["one.md", "two.md"]:
+            (tmpdir / name).write_text("I visited the Central Hotel in Donegal.\n")
+        manifest = SiteManifest(str(tmpdir / "site.json"))
+        run_batch([tmpdir / "one.md", tmpdir / "two.md"], overrides={"cache.enabled": False}, workers=1,
+                  manifest=manifest)
+        manifest.save()
+
+        manifest = SiteManifest(str(tmpdir / "site.json"))
+        assert sorted(manifest.posts) == ["one.md", "two.md"]
+        assert manifest.posts["one.md"]["links"] == [[14, 27, "Central Hotel", "Donegal, Ireland"]]
+
+        (tmpdir / "two.md").write_text("New intro.\n\nI visited the Central Hotel in Donegal.\n")
+        # An unknown backend would fail if relinking tried to extract
+        config = build_config(overrides={"affiliate.id": "777", "llm.type": "unknown"})
+        summary = run_relink(manifest, config)
+        assert summary.succeeded == 2 and summary.changed == 1
+        assert "aid=777" in (tmpdir / "one_linked.md").read_text()
+        assert "New intro.\n\nI visited the [Central Hotel](" in (tmpdir / "two_linked.md").read_text()
+        assert manifest.posts["two.md"]["links"][0][:2] == [26, 39]
+    print("16. Site manifest relink test passed")
+
+
+def test_cascade_extraction():
+    """Test the tagger/LLM cascade against the labelled fixtures with a stand-in tagger."""
+    import json
+    import re
+    from affiliate.cascade import CascadeExtractor, evaluate_extractor
+
+    with open(Path(__file__).parent / "fixtures" / "labelled_paragraphs.json", encoding="utf-8") as f:
+        labelled = json.load(f)
+
+    # Stand-in for an NER model: capitalised names ending in an accommodation word are organisations
+    name_pattern = re.compile(r"(?:[A-Z][\w'&]*\s+)+(?:Hotel|Hostel|B&B|Apartments)\b")
+
+    def tagger(sentences):
+        return [[{"entity_group": "ORG", "score": 0.97, "word": m.group(), "start": m.start(), "end": m.end()}
+                 for m in name_pattern.finditer(sentence)] for sentence in sentences]
+
+    # Stand-in for the generative LLM, blind to the labels: the capitalised words after "at" or "into"
+    stay_pattern = re.compile(r"\b(?:at|into)\s+(?:the\s+)?([A-Z][\w'&]*(?:\s+[A-Z][\w'&]*)*)")
+
+    class FallbackExtractor:
+        def __init__(self):
+            self.texts = []
+
+        def extract_accommodations(self, text):
+            self.texts.append(text)
+            return [{"name": m.group(1), "location": "", "mentions": [[m.start(1), m.end(1)]]}
+                    for m in stay_pattern.finditer(text)]
+
+    fallback = FallbackExtractor()
+    cascade = CascadeExtractor(tagger, fallback)
+    scores = evaluate_extractor(cascade, labelled)
+    # Only "the Twelve" is missed, neither tier finds it
+    assert scores == {"precision": 1.0, "recall": 13 / 14}, scores
+    fractions = cascade.tier_fractions()
+    assert fractions["tagger"] > 0 and fractions["llm"] > 0
+    assert abs(sum(fractions.values()) - 1) < 1e-9
+    assert sum(len(text) for text in fallback.texts) < sum(len(entry["text"]) for entry in labelled) / 2
+
+    # Each sentence goes to exactly one tier, and mentions from both tiers refer to the original text
+    text = "We took a boat trip.\n\nThe Central Hotel in Donegal was great. We also stayed at the Merrion hotel."
+    fallback = FallbackExtractor()
+    cascade = CascadeExtractor(tagger, fallback)
+    found = {p["name"]: p["mentions"] for p in cascade.extract_accommodations(text)}
+    assert (cascade.tagger_sentences, cascade.llm_sentences, cascade.skipped_sentences) == (1, 1, 1)
+    assert fallback.texts == ["We also stayed at the Merrion hotel."]
+    assert sorted(found) == ["Central Hotel", "Merrion"]
+    for name in ["Central Hotel", "Merrion"]:
+        start, end = found[name][0]
+        assert text[start:end] == name
+    print("17. Cascade extraction test passed")
+
+
+def test_watch_mode():
+    """Test that watch mode debounces saves, skips unchanged posts and writes outputs atomically."""
+    import os
+    import time
+    from affiliate.watch import Debouncer, PollingSource, PostWatcher
+
+    debouncer = Debouncer(0.5)
+    debouncer.add(Path("post.md"), 0.0)
+    debouncer.add(Path("post.md"), 0.3)
+    assert debouncer.due(0.6) == [] and debouncer.due(0.8) == [Path("post.md")]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        post = tmpdir / "post.md"
+        post.write_text("I visited the Central Hotel in Donegal.\n")
+        watcher = PostWatcher(str(tmpdir), overrides={"cache.enabled": False, "watch.debounce": 0.2}, workers=1,
+                              source=PollingSource(str(tmpdir), interval=0.05))
+
+        def wait_for(condition):
+            deadline = time.monotonic() + 30
+            while not condition():
+                assert time.monotonic() < deadline
+                watcher.step(0.05)
+
+        try:
+            # Posts without an output are linked on start
+            wait_for(lambda: watcher.summary.succeeded == 1)
+            assert "[Central Hotel](" in (tmpdir / "post_linked.md").read_text()
+
+            # Saving the same content again is skipped
+            stat = post.stat()
+            os.utime(post, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            wait_for(lambda: watcher.summary.unchanged == 1)
+
+            # A burst of saves is linked once
+            for word in ["loved", "liked", "enjoyed"]:
+                post.write_text(f"I {word} the Central Hotel in Donegal.\n")
+            wait_for(lambda: watcher.summary.succeeded == 2)
+            for _ in range(5):
+                watcher.step(0.05)
+        finally:
+            summary = watcher.close()
+        assert summary.succeeded == 2 and not summary.failures
+        assert "I enjoyed the [Central Hotel](" in (tmpdir / "post_linked.md").read_text()
+        assert sorted(p.name for p in tmpdir.iterdir()) == ["post.md", "post_linked.md"]
+    print("18. Watch mode test passed")
+
+
+def test_async_pipeline():
+    """Test that the asyncio pipeline links every post with bounded memory and concurrent extraction."""
+    import asyncio
+    import threading
+    import time
+    from affiliate.batch import build_config
+    from affiliate.manifest import SiteManifest
+    from affiliate.pipeline import run_pipeline_async
+
+    class SlowExtractor:
+        active = 0
+        most_active = 0
+        lock = threading.Lock()
+
+        def extract_accommodations(self, text):
+            with self.lock:
+                SlowExtractor.active += 1
+                SlowExtractor.most_active = max(SlowExtractor.most_active, SlowExtractor.active)
+            time.sleep(0.01)
+            with self.lock:
+                SlowExtractor.active -= 1
+            if "broken" in text:
+                raise RuntimeError("extraction failed")
+            return [{"name": "Central Hotel", "location": "Donegal, Ireland"}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        for i in range(40):
+            (tmpdir / f"post{i}.md").write_text("I visited the Central Hotel in Donegal.\n")
+        (tmpdir / "post7.md").write_text("This one is broken.\n")
+
+        # Track how far the reader runs ahead of the writer
+        pulled = []
+
+        def paths():
+            for i in range(40):
+                pulled.append(len(list(tmpdir.glob("*_linked.md"))))
+                yield tmpdir / f"post{i}.md"
+
+        manifest = SiteManifest(str(tmpdir / "site.json"))
+        summary = asyncio.run(run_pipeline_async(paths(), build_config(overrides={"affiliate.id": "777"}),
+                                                 extract_concurrency=3, queue_size=2, manifest=manifest,
+                                                 extractor_factory=SlowExtractor))
+        assert summary.succeeded == 39 and len(summary.failures) == 1
+        assert summary.failures[0][0].name == "post7.md"
+        assert "[Central Hotel](" in (tmpdir / "post0_linked.md").read_text()
+        assert "aid=777" in (tmpdir / "post39_linked.md").read_text()
+        assert len(manifest) == 39
+        assert SlowExtractor.most_active == 3
+        # Three queues of 2, 3 extraction slots and one post in each other stage
+        assert max(i - written for i, written in enumerate(pulled)) <= 3 * 2 + 3 + 3
+
+        # A backend that cannot be built fails the run before any post is read
+        from affiliate.pipeline import run_pipeline
+
+        def broken_factory():
+            raise OSError("model not found")
+
+        pulled.clear()
+        try:
+            asyncio.run(run_pipeline_async(paths(), build_config(), extractor_factory=broken_factory))
+            assert False, "Expected a setup error"
+        except RuntimeError as e:
+            assert str(e) == "Could not set up the extractor: OSError: model not found"
+        assert pulled == []
+        try:
+            run_pipeline([tmpdir / "post0.md"], overrides={"llm.type": "bogus"})
+            assert False, "Expected a setup error"
+        except ValueError as e:
+            assert "Unknown llm.type: bogus" in str(e)
+    print("19. Async pipeline test passed")
+
+
+def test_simulated_backend():
+    """Test the backend registry and the latency-simulating stand-in backend."""
+    import asyncio
+    import time
+    from affiliate.backend import ExtractorBackend
+    from affiliate.batch import build_config
+    from affiliate.llm import create_extractor
+    from affiliate.simulated import SimulatedBackend
+
+    for llm_type in ["mock", "simulated"]:
+        assert isinstance(create_extractor(build_config(overrides={"llm.type": llm_type})), ExtractorBackend)
+    try:
+        create_extractor(build_config(overrides={"llm.type": "unknown"}))
+        assert False, "Expected an unknown backend error"
+    except ValueError as e:
+        assert "simulated" in str(e)
+
+    text = "We stayed at the Merrion in Dublin. Then Harvey's Point Hotel. The hotel was lovely, as was Harvey's Point Hotel."
+    backend = create_extractor(build_config(overrides={
+        "llm.type": "simulated", "llm.simulated": {"token_latency_ms": 0, "prefill_latency_ms": 0}}))
+    found = {p["name"]: p for p in backend.extract_accommodations(text)}
+    assert sorted(found) == ["Harvey's Point Hotel", "Merrion"]
+    assert found["Merrion"]["location"] == "Dublin"
+    assert [text[start:end] for start, end in found["Harvey's Point Hotel"]["mentions"]] == ["Harvey's Point Hotel"] * 2
+    assert backend.prompt_tokens > 0 and backend.completion_tokens > 0
+
+    # Latency is per token, concurrent async requests overlap
+    backend = SimulatedBackend(token_latency=0.002, prefill_latency=0.0, jitter=0.0)
+    start = time.perf_counter()
+    backend.extract_accommodations(text)
+    single = time.perf_counter() - start
+    assert single >= 0.02
+    start = time.perf_counter()
+    results = asyncio.run(backend.aextract_batch([text] * 10))
+    assert len(results) == 10 and time.perf_counter() - start < single * 5
+
+    # Failures are raised at the configured rate
+    backend = SimulatedBackend(token_latency=0.0, prefill_latency=0.0, failure_rate=0.5, seed=1)
+    failures = 0
+    for _ in range(100):
+        try:
+            backend.extract_accommodations(text)
+        except RuntimeError:
+            failures += 1
+    assert 30 < failures < 70 and backend.failures == failures
+    print("20. Simulated backend test passed")
+
+
+def test_name_variants():
+    """Test that normalised name variants and aliases are linked and ambiguous variants are not."""
+    from affiliate.aliases import AliasIndex, normalize_key
+
+    assert normalize_key("The Harvey’s  Point Hotel") == normalize_key("harveys point hotel")
+    assert normalize_key("Ｈôtel Café") == ("hotel", "cafe")
+    # An article is kept if only generic words would be left
+    assert normalize_key("The Hotel") == ("the", "hotel")
+
+    blog_content = """We loved the Harveys Point and the CENTRAL hotel.
+Central is the main street, breakfast at Slieve League was great.
+Try **Castle** Lodge, the Hôtel Café Royal or the Old Mill.
+"""
+    properties = [
+        {"name": "Harvey’s Point Hotel", "location": "Donegal, Ireland"},
+        {"name": "The Central Hotel", "location": "Donegal, Ireland"},
+        # "Slieve League" is a variant of both, so it is not linked
+        {"name": "Slieve League B&B", "location": "Donegal, Ireland"},
+        {"name": "Slieve League Lodge", "location": "Donegal, Ireland"},
+        # Words split by markdown emphasis are not one mention
+        {"name": "Castle Lodge", "location": "Donegal, Ireland"},
+        {"name": "Hotel Cafe Royal", "location": "Dublin, Ireland"},
+        {"name": "Mill House Inn", "location": "Donegal, Ireland", "aliases": ["The Old Mill"]},
+    ]
+    processor = LinkProcessor("12345")
+    spans = processor.find_links(blog_content, properties)
+    assert [(blog_content[s.start:s.end], s.name) for s in spans] == [
+        ("Harveys Point", "Harvey’s Point Hotel"),
+        ("the CENTRAL hotel", "The Central Hotel"),
+        ("Hôtel Café Royal", "Hotel Cafe Royal"),
+        ("the Old Mill", "Mill House Inn"),
+    ]
+
+    # A sentence boundary splits a name, an abbreviation does not
+    sentences = "We walked to Central. Hotel prices were high. The Grand. Hotels nearby. St. Anne's Inn was full."
+    names = [{"name": "Central Hotel", "location": ""}, {"name": "Grand Hotel", "location": ""},
+             {"name": "St. Anne's Inn", "location": ""}]
+    assert [sentences[s.start:s.end] for s in processor.find_links(sentences, names)] == ["St. Anne's Inn"]
+
+    # A name with periods is linked where the text repeats it
+    dotted = ["Mr. Smith Hotel", "No. 1 Hotel", "J.W. Marriott", "Hotel Mrs. Brown", "Jr. Suites Inn", "C.H. Hotel"]
+    text = " ".join(f"We loved {name} again." for name in dotted)
+    spans = processor.find_links(text, [{"name": name, "location": ""} for name in dotted])
+    assert [text[s.start:s.end] for s in spans] == dotted
+
+    # The article of a name stays in the link, an underscore joins words
+    result = processor.process_markdown("An Óige hostel, the Merrion and The Point_bar.", [
+        {"name": "An Óige hostel", "location": ""}, {"name": "The Merrion", "location": ""},
+        {"name": "The Point", "location": ""}])
+    assert result.startswith("[An Óige hostel](") and ", [the Merrion](" in result and "[The Point" not in result
+    result = processor.process_markdown("We stayed at the Merrion.", [{"name": "Merrion", "location": ""}])
+    assert "the [Merrion](" in result
+    assert processor.spans_from_mentions("We stayed at the Merrion.", [
+        {"name": "The Merrion", "location": "", "mentions": [[17, 24]]}]) == [(13, 24, "The Merrion", "")]
+
+    # A possessive ending is not part of the mention
+    result = processor.process_markdown("We loved the Central Hotel's bar and Harvey’s Point’s pool.", properties)
+    assert "[the Central Hotel](" in result and ")'s bar" in result
+    assert "[Harvey’s Point](" in result and ")’s pool" in result
+
+    # A name starting inside a variant wins over the variant
+    index = AliasIndex([{"name": "Castle Oak Lodge"}, {"name": "Oak Castle Hotel"}])
+    assert [prop["name"] for _, _, prop in index.scan("castle Oak Castle Hotel")] == ["Oak Castle Hotel"]
+
+    # Extractor offsets of a variant are accepted
+    start = blog_content.index("Harveys Point")
+    properties[0]["mentions"] = [[start, start + 13]]
+    assert processor.spans_from_mentions(blog_content, properties[:1]) == [
+        (start, start + 13, "Harvey’s Point Hotel", "Donegal, Ireland")]
+    print("21. Name variants test passed")
+
+
+def test_chunked_extraction():
+    """Test that long texts are split into overlapping chunks and their results merged."""
+    from notebooks.extraction_helpers import locate_mentions, merge_accommodations, split_into_chunk_spans, \
+        split_into_chunks
+
+    def count_words(text):
+        return len(text.split())
+
+    text = "One two three.\n\nWe stayed at Abbey Hotel.\n\nFive six seven eight.\n\nNine ten."
+    chunks = split_into_chunks(text, count_words, max_tokens=9, overlap_tokens=5)
+    assert chunks == ["One two three.\n\nWe stayed at Abbey Hotel.",
+                      "We stayed at Abbey Hotel.\n\nFive six seven eight.",
+                      "Five six seven eight.\n\nNine ten."]
+
+    # A paragraph over budget is split on sentences, the spans point into the original text
+    long_paragraph = "First sentence here. Second one here. Third."
+    spans = split_into_chunk_spans(long_paragraph, count_words, max_tokens=4, overlap_tokens=0)
+    assert [[long_paragraph[start:end] for start, end in chunk] for chunk in spans] == \
+        [["First sentence here."], ["Second one here.", "Third."]]
+
+    # A mention in the overlap is found by both chunks and reported once
+    spans = split_into_chunk_spans(text, count_words, max_tokens=9, overlap_tokens=5)
+    start = text.index("Abbey Hotel")
+    assert locate_mentions(text, spans[0], "abbey hotel") == [[start, start + 11]]
+    results = [{"name": "Abbey Hotel", "place": "", "country": "Ireland",
+                "mentions": locate_mentions(text, chunk, "Abbey Hotel")} for chunk in spans[:2]]
+    results.append({"name": "abbey  hotel", "place": "Donegal", "country": ""})
+    results.append({"name": "Abbey Hotel", "place": "Galway", "country": "Ireland"})
+    results.append({"name": "", "place": "Nowhere"})
+    assert merge_accommodations(results) == [
+        {"name": "Abbey Hotel", "place": "Donegal", "country": "Ireland", "mentions": [[start, start + 11]]},
+        {"name": "Abbey Hotel", "place": "Galway", "country": "Ireland"},
+    ]
+    print("22. Chunked extraction test passed")
+
+
+def test_length_buckets():
+    """Test that prompts are batched by similar length within the padded token budget."""
+    from notebooks.extraction_helpers import bucket_by_length
+
+    lengths = [10, 300, 40, 290, 5000, 20]
+    batches = bucket_by_length(lengths, max_batch_tokens=1000, max_batch_size=3)
+    # Longest first, a prompt over the budget alone, then up to three prompts per batch
+    assert batches == [[4], [1, 3, 2], [5, 0]]
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches[1:]:
+        assert len(batch) * lengths[batch[0]] <= 1000
+
+    # The padded size closes a batch before the batch size does
+    assert bucket_by_length([400, 400, 400, 10], max_batch_tokens=1000, max_batch_size=4) == [[0, 1], [2, 3]]
+    assert bucket_by_length([10] * 5, max_batch_tokens=10000, max_batch_size=2) == [[0, 1], [2, 3], [4]]
+    assert bucket_by_length([]) == []
+    print("23. Length buckets test passed")
+
+
+def test_generation_budget():
+    """Test the per-request generation budget and the detection of truncated output."""
+    from notebooks.extraction_helpers import MIN_NEW_TOKENS, TOKENS_PER_ACCOMMODATION, estimate_new_tokens, \
+        is_truncated
+
+    assert estimate_new_tokens("We walked the cliffs all day.", 256) == MIN_NEW_TOKENS
+    # A stay phrase, a keyword and a plural keyword are three candidates
+    text = "We stayed at the Merrion, a hotel. Then two B&Bs."
+    assert estimate_new_tokens(text, 256) == MIN_NEW_TOKENS + 3 * TOKENS_PER_ACCOMMODATION
+    assert estimate_new_tokens("hotel " * 20, 256) == 256
+
+    # Truncated only if the JSON was opened and not closed, brackets in strings do not count
+    assert is_truncated('[{"name": "Abbey Hotel"}')
+    assert is_truncated('```json\n[')
+    assert is_truncated('{"name": "Abbey Hotel"')
+    assert is_truncated('[{"name": "Abbey, ]"}')
+    assert not is_truncated('[{"name": "Abbey Hotel"}]')
+    assert not is_truncated("No accommodation is mentioned.")
+    print("24. Generation budget test passed")
+
+
+def test_json_stream():
+    """Test that the JSON array in model output is parsed incrementally and prose brackets are skipped."""
+    from notebooks.extraction_helpers import JsonArrayStream, extract_json_from_text
+
+    stream = JsonArrayStream()
+    pieces = ["Sure: ```json\n[", '{"name": "Abbey', ' Hotel"}', ', {"name"', ': "B] {"}]', ' [{"name": "C"}]']
+    assert [stream.feed(piece) for piece in pieces] == [
+        [], [], [{"name": "Abbey Hotel"}], [], [{"name": "B] {"}], []]
+    assert stream.started and stream.done
+
+    # Braces and brackets in prose before the JSON are not taken for it
+    assert extract_json_from_text('Here is {the} list: [{"name": "Abbey Hotel"}]') == [{"name": "Abbey Hotel"}]
+    assert extract_json_from_text('[see below] [{"name": "A"}, {bad}, {"name": "B"}]') == [{"name": "A"}, {"name": "B"}]
+    assert extract_json_from_text('{"name": "Abbey Hotel"}') == [{"name": "Abbey Hotel"}]
+    assert extract_json_from_text("[]") == []
+    try:
+        extract_json_from_text("No {accommodation} here.")
+        assert False, "Expected no JSON to be found"
+    except ValueError:
+        pass
+    print("25. JSON stream test passed")
+
+
+def test_cli_cache():
+    """Test that the CLI caches extractions at the configured path and reuses them for an unchanged post."""
+    import io
+    from contextlib import redirect_stdout
+    from affiliate.cli import main
+
+    with tempfile.TemporaryDirectory() as tmpdir, temporary_cache(tmpdir):
+        tmpdir = Path(tmpdir)
+        test_blog = tmpdir / "test_blog.md"
+        test_blog.write_text("I visited the Central Hotel in Donegal.\n")
+
+        def run(*options):
+            old_argv = sys.argv
+            sys.argv = ["cli.py", str(test_blog), *options]
+            try:
+                with redirect_stdout(io.StringIO()) as output:
+                    main()
+            finally:
+                sys.argv = old_argv
+            return output.getvalue()
+
+        assert "from cache" not in run()
+        assert (tmpdir / "extractions.sqlite").exists()
+        assert "Loaded extracted properties from cache." in run()
+        assert "from cache" not in run("--no-cache")
+        assert "from cache" not in run("--refresh-cache")
+        assert "[Central Hotel]" in (tmpdir / "test_blog_linked.md").read_text()
+    print("26. CLI cache test passed")
+
+
 if __name__ == "__main__":
     test_property_extraction()
     test_link_generation()
     test_markdown_processing()
     test_configuration_loading()
     test_end_to_end()
+    test_single_pass_linking()
+    test_batch_mode()
+    test_extraction_cache()
+    test_daemon_extractor()
+    test_incremental_extraction()
+    test_candidate_prefilter()
+    test_cli_startup_budget()
+    test_metrics()
+    test_offset_linking()
+    test_protected_markdown()
+    test_site_manifest_relink()
+    test_cascade_extraction()
+    test_watch_mode()
+    test_async_pipeline()
+    test_simulated_backend()
+    test_name_variants()
+    test_chunked_extraction()
+    test_length_buckets()
+    test_generation_budget()
+    test_json_stream()
+    test_cli_cache()
     print("\n All tests passed!")